@@ -0,0 +1,94 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Blocked execution
+
+The prototype selection heuristics reduce the distance matrix block by
+block of consecutive rows, e.g. to compute row sums or to score candidates.
+Blocks are independent of each other and NumPy releases the GIL for the
+heavy lifting, thus blocks can be processed by a pool of threads. Results
+are returned in block order, which makes parallel execution produce results
+identical to serial execution.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def effective_n_jobs(n_jobs):
+    '''Number of threads to use for a given n_jobs parameter.
+
+    Parameters
+    ----------
+    n_jobs: int
+        Number of parallel jobs. Negative values count backwards from the
+        number of CPUs, i.e. -1 uses all CPUs, -2 all but one, and so on.
+
+    Returns
+    -------
+    int
+        The number of threads, which is at least 1.
+
+    Raises
+    ------
+    ValueError
+        If n_jobs is 0.
+    '''
+    if n_jobs == 0:
+        raise ValueError("'n_jobs' must not be 0.")
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(1, n_jobs)
+
+
+def block_ranges(n, block_size):
+    '''Split n consecutive rows into blocks.
+
+    Parameters
+    ----------
+    n: int
+        Number of rows.
+    block_size: int
+        Maximal number of rows per block.
+
+    Returns
+    -------
+    list of (int, int)
+        Index of the first and one past the last row of each block.
+    '''
+    return [(start, min(start + block_size, n))
+            for start in range(0, n, block_size)]
+
+
+def map_blocks(func, n, block_size, n_jobs=1):
+    '''Apply a function to all blocks of n rows, possibly in parallel.
+
+    Parameters
+    ----------
+    func: callable
+        Called as func(start, stop) for every block of rows.
+    n: int
+        Number of rows.
+    block_size: int
+        Maximal number of rows per block.
+    n_jobs: int
+        Number of threads processing blocks in parallel. Default is 1, i.e.
+        serial execution. See effective_n_jobs for negative values.
+
+    Returns
+    -------
+    list
+        The results of func, in the order of the blocks.
+    '''
+    ranges = block_ranges(n, block_size)
+    n_jobs = min(effective_n_jobs(n_jobs), len(ranges))
+    if n_jobs <= 1:
+        return [func(start, stop) for start, stop in ranges]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(lambda r: func(*r), ranges))
@@ -0,0 +1,162 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Checkpoints of long-running prototype selections
+
+The greedy loops of genomesubsampler.prototypeSelection periodically store
+their state, i.e. the selected indices and their running score vectors, in a
+compact .npz file. A run that is resumed from a checkpoint continues exactly
+where the checkpoint was taken and produces output identical to an
+uninterrupted run. Checkpoints are written atomically, i.e. a job that is
+killed while writing leaves the previous checkpoint intact.
+"""
+
+import os
+import time
+import zlib
+
+import numpy as np
+
+# prefix of the arrays that hold the parameters of the interrupted run
+_PARAM = 'param_'
+
+
+def _fingerprint(dm):
+    '''Checksum of the element IDs, to detect checkpoints of other matrices.
+    '''
+    crc = 0
+    for id_ in dm.ids:
+        crc = zlib.crc32(id_.encode('utf-8') + b'\0', crc)
+    return np.array([dm.shape[0], crc], dtype=np.int64)
+
+
+def save_checkpoint(filepath, **arrays):
+    '''Atomically store arrays in a compressed .npz file.
+
+    Parameters
+    ----------
+    filepath: str
+        The checkpoint file.
+    arrays: np.ndarray
+        The arrays to store, by name.
+    '''
+    tmp_filepath = '%s.tmp' % filepath
+    with open(tmp_filepath, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filepath, filepath)
+
+
+def load_checkpoint(filepath):
+    '''Load all arrays of an .npz file.
+
+    Parameters
+    ----------
+    filepath: str
+        The checkpoint file.
+
+    Returns
+    -------
+    dict of str: np.ndarray
+        The stored arrays, by name.
+    '''
+    with np.load(filepath, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+class Checkpointer(object):
+    '''Periodically stores the state of a greedy loop.
+
+    Parameters
+    ----------
+    filepath: str
+        The checkpoint file.
+    algorithm: str
+        Name of the algorithm whose state is stored.
+    dm: skbio.stats.distance.DistanceMatrix
+        The distance matrix the algorithm runs on.
+    interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
+    resume: bool
+        If True, load returns the state of an existing checkpoint file.
+        Default is False, i.e. runs start from scratch.
+    params: dict of str: np.ndarray
+        Parameters the state depends on, e.g. the seeds. A checkpoint is only
+        resumed if its parameters are identical.
+    '''
+    def __init__(self, filepath, algorithm, dm, interval=60.0, resume=False,
+                 params=None):
+        self.filepath = filepath
+        self.algorithm = algorithm
+        self.interval = interval
+        self.resume = resume
+        self._params = {'algorithm': np.array(algorithm),
+                        'fingerprint': _fingerprint(dm)}
+        for name, value in (params or {}).items():
+            self._params[name] = np.asarray(value)
+        self._last_save = time.time()
+
+    def load(self):
+        '''Return the stored state to resume from.
+
+        Returns
+        -------
+        dict of str: np.ndarray or None
+            The stored state, or None if resume is False or there is no
+            checkpoint file.
+
+        Raises
+        ------
+        ValueError
+            If the checkpoint was taken by another algorithm, for another
+            distance matrix, or with other parameters.
+        '''
+        if not (self.resume and os.path.exists(self.filepath)):
+            return None
+        data = load_checkpoint(self.filepath)
+        stored_params = {name[len(_PARAM):] for name in data
+                         if name.startswith(_PARAM)}
+        for name in sorted(stored_params.union(self._params)):
+            value = self._params.get(name)
+            stored = data.get(_PARAM + name)
+            if (stored is None) or (value is None) or \
+               (stored.shape != value.shape) or np.any(stored != value):
+                raise ValueError("Checkpoint '%s' does not match the %s of "
+                                 "this run." % (self.filepath, name))
+        return {name: value for name, value in data.items()
+                if not name.startswith(_PARAM)}
+
+    def save(self, **state):
+        '''Store the state.'''
+        arrays = {_PARAM + name: value
+                  for name, value in self._params.items()}
+        arrays.update(state)
+        save_checkpoint(self.filepath, **arrays)
+        self._last_save = time.time()
+
+    def due(self):
+        '''Whether the interval passed since the last checkpoint.'''
+        return time.time() - self._last_save >= self.interval
+
+    def update(self, **state):
+        '''Store the state, if the interval passed since the last checkpoint.
+        '''
+        if self.due():
+            self.save(**state)
+
+
+def checkpointer(filepath, algorithm, dm, interval=60.0, resume=False,
+                 params=None):
+    '''Return a Checkpointer, or None if no checkpoint file is given.'''
+    if filepath is None:
+        if resume:
+            raise ValueError("'resume' requires a 'checkpoint' file.")
+        return None
+    return Checkpointer(filepath, algorithm, dm, interval, resume, params)
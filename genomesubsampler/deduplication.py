@@ -0,0 +1,223 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Deduplication of near-identical genomes
+
+Genome collections hold many genomes of the same species and many pairs of
+genomes with (near) zero distance. All prototype selection heuristics pay
+O(n^2) for these near-duplicates, although at most one of them is a useful
+prototype. deduplicate collapses genomes that are closer than a threshold,
+or belong to the same species, into single-linkage clusters, each
+represented by one genome. deduplicated_selection selects prototypes among
+the representatives only and maps every prototype back to the genomes of its
+cluster. The size of the clusters is carried as the weight of the
+representatives in the p-median model.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+from skbio.stats.distance import DistanceMatrix
+
+from genomesubsampler.distanceMatrix import SubsetDistanceMatrix
+from genomesubsampler.portfolio import ALGORITHMS
+from genomesubsampler.prototypeSelection import (_epsilon_neighbourhood,
+                                                 _seed_indices, _entries,
+                                                 _BLOCK_ELEMENTS)
+
+
+def _species_links(dm, species):
+    '''Links that chain all genomes of the same species.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances of the genomes, or any matrix adapter.
+    species: pd.Series
+        Species of the genomes, indexed by genome ID.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        Row indices of the linked pairs of genomes. Every genome is linked
+        to the next genome of the same species, genomes without species are
+        not linked.
+    '''
+    codes, _ = pd.factorize(pd.Series(species).reindex(list(dm.ids)))
+    order = np.argsort(codes, kind='stable')
+    same = (codes[order[1:]] == codes[order[:-1]]) & (codes[order[1:]] >= 0)
+    return order[:-1][same], order[1:][same]
+
+
+def _medoid(dm, members):
+    '''The member with the smallest sum of distances to all other members.
+    '''
+    if len(members) <= 2:
+        return members[0]
+    block_size = max(1, _BLOCK_ELEMENTS // len(members))
+    sums = np.concatenate([
+        _entries(dm, members[start:start + block_size, None],
+                 members[None, :]).sum(axis=1, dtype=np.float64)
+        for start in range(0, len(members), block_size)])
+    return members[int(sums.argmin())]
+
+
+def deduplicate(dm, threshold=None, species=None, seedset=None, n_jobs=1):
+    '''Collapse near-identical genomes into clusters.
+
+       Genomes are linked if their distance is at most threshold, or if they
+       belong to the same species. Clusters are the connected components of
+       the links, i.e. single-linkage clusters. A cluster is represented by
+       its medoid, i.e. the member with the smallest sum of distances to all
+       other members. Seeds always represent themselves, the other members
+       of a cluster with seeds are represented by its first seed.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances of the genomes, or any matrix adapter.
+    threshold: float
+        Maximal distance of linked genomes, e.g. 0 for identical genomes.
+        Default is None, i.e. genomes are not linked by distance.
+    species: pd.Series
+        Species of the genomes, indexed by genome ID, e.g. the
+        'species_taxid' column of the RepoPhlAn table. Genomes without
+        species are not linked by species. Default is None, i.e. genomes are
+        not linked by species.
+    seedset: iterable of str
+        IDs of genomes that must remain representatives. Default is None.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Default is 1.
+
+    Returns
+    -------
+    (list of str, dict of str: list of str)
+        The representatives, in the order of the distance matrix, and for
+        every representative the IDs of the genomes it represents, including
+        itself, in the order of the distance matrix.
+
+    Raises
+    ------
+    ValueError
+        If neither threshold nor species are given, the threshold is
+        negative, or the seedset is not a subset of the element IDs.
+
+    Notes
+    -----
+    The links by distance are the epsilon neighbourhood of protoclass, i.e.
+    memory is linear in the number of linked pairs, and computing them costs
+    a single pass over the matrix.
+    '''
+    if (threshold is None) and (species is None):
+        raise ValueError("Either 'threshold' or 'species' must be given.")
+    if (threshold is not None) and (threshold < 0):
+        raise ValueError("'threshold' must not be negative.")
+    n = dm.shape[0]
+
+    graph = csr_matrix((n, n), dtype=np.int8)
+    if threshold is not None:
+        # the neighbourhood holds distances strictly below epsilon, which is
+        # computed in the data type of the distances, e.g. float32, to which
+        # it is cast when compared
+        first = np.zeros(1, dtype=np.intp)
+        dtype = _entries(dm, first, first).dtype
+        epsilon = np.nextafter(dtype.type(threshold), dtype.type(np.infty))
+        indptr, indices = _epsilon_neighbourhood(dm, epsilon, n_jobs)
+        graph = csr_matrix((np.ones(len(indices), dtype=np.int8), indices,
+                            indptr), shape=(n, n))
+    if species is not None:
+        rows, cols = _species_links(dm, species)
+        graph = graph + coo_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, cols)),
+            shape=(n, n)).tocsr()
+    _, labels = connected_components(graph, directed=False)
+
+    representative = np.arange(n)
+    is_seed = np.zeros(n, dtype=bool)
+    if seedset is not None:
+        is_seed[_seed_indices(dm, seedset)] = True
+    # members of every cluster, in ascending order
+    order = np.argsort(labels, kind='stable')
+    for members in np.split(order, np.flatnonzero(np.diff(labels[order])) + 1):
+        if len(members) > 1:
+            seeds = members[is_seed[members]]
+            if len(seeds) > 0:
+                representative[members[~is_seed[members]]] = seeds[0]
+            else:
+                representative[members] = _medoid(dm, members)
+
+    clusters = {}
+    for idx in range(n):
+        clusters.setdefault(dm.ids[representative[idx]], []).append(
+            dm.ids[idx])
+    return [dm.ids[idx] for idx in np.unique(representative)], clusters
+
+
+def deduplicated_selection(dm, num_prototypes, threshold=None, species=None,
+                           algorithm='constructive_pMedian', seedset=None,
+                           n_jobs=1):
+    '''Select prototypes among the representatives of deduplicated genomes.
+
+       Genomes are deduplicated first, see deduplicate. The prototype
+       selection algorithm then only processes the distances of the
+       representatives. For the p-median model, every representative weighs
+       as many users as genomes it represents.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances of the genomes, or any matrix adapter.
+    num_prototypes: int
+        Number of prototypes to select, must be smaller than the number of
+        representatives.
+    threshold: float
+        Maximal distance of duplicate genomes. Default is None.
+    species: pd.Series
+        Species of the genomes, indexed by genome ID. Default is None.
+    algorithm: str
+        Name of the selection algorithm, see portfolio.ALGORITHMS. Default
+        is 'constructive_pMedian'.
+    seedset: iterable of str
+        A set of genome IDs that are pre-selected as prototypes.
+        Default is None.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Default is 1.
+
+    Returns
+    -------
+    (list of str, dict of str: list of str)
+        The prototypes, as returned by the algorithm, and for every
+        prototype the genomes it represents.
+
+    Raises
+    ------
+    ValueError
+        If the algorithm is unknown, the deduplication parameters are
+        invalid, see deduplicate, or the number of prototypes is invalid for
+        the representatives, see prototypeSelection._validate_parameters.
+    '''
+    if algorithm not in ALGORITHMS:
+        raise ValueError("Unknown algorithm '%s'. Choose from: %s."
+                         % (algorithm, ', '.join(sorted(ALGORITHMS))))
+    representatives, clusters = deduplicate(dm, threshold, species, seedset,
+                                            n_jobs)
+    if isinstance(dm, DistanceMatrix):
+        rdm = dm.filter(representatives)
+    else:
+        rdm = SubsetDistanceMatrix(dm, representatives)
+
+    kwargs = {}
+    if algorithm == 'constructive_pMedian':
+        kwargs['weights'] = [len(clusters[id_]) for id_ in representatives]
+    prototypes = list(ALGORITHMS[algorithm](rdm, num_prototypes,
+                                            seedset=seedset, **kwargs))
+    return prototypes, {id_: clusters[id_] for id_ in prototypes}
@@ -0,0 +1,571 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Distance matrix adapters
+
+The prototype selection heuristics in genomesubsampler.prototypeSelection
+accept, next to skbio's DistanceMatrix, light-weight adapters that provide
+the following interface:
+ - ids: tuple of str, the element IDs
+ - shape: (int, int), the dimensions of the matrix
+ - index(id): the row index of an element ID
+ - rows(indices): the distance rows for a slice or sequence of row indices
+ - entries(rows, cols): the distances between rows[i] and cols[i]
+
+The adapters of this module share ids, shape and index through _IDIndex.
+Adapters do not validate symmetry or hollowness of the distances, i.e. the
+caller is responsible for providing a proper distance matrix.
+
+MemmapDistanceMatrix reads precomputed distances from disk, while
+LazyDistanceMatrix computes rows on demand, e.g. with Mash, and keeps
+recently used rows in a memory-bounded cache. CompactDistanceMatrix holds
+distances in memory as float32 or as uint16 with a scale factor.
+SubsetDistanceMatrix restricts any matrix to a subset of its elements
+without copying the distances.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from skbio.stats.distance import DissimilarityMatrixError, MissingIDError
+
+from genomesubsampler.prototypeSelection import (_ids_to_indices, _rows,
+                                                 _entries, _BLOCK_ELEMENTS)
+
+
+class _IDIndex(object):
+    '''The element IDs of an adapter and their lookup table.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of the elements, in the order of the rows of the matrix.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are not unique.
+    '''
+    def __init__(self, ids):
+        self.ids = tuple(ids)
+        n = len(self.ids)
+        self.shape = (n, n)
+        self._id_index = {id_: idx for idx, id_ in enumerate(self.ids)}
+        if len(self._id_index) < n:
+            raise DissimilarityMatrixError("IDs must be unique.")
+
+    def index(self, lookup_id):
+        '''Return the row index of an element ID.
+
+        Raises
+        ------
+        skbio.stats.distance.MissingIDError
+            If the ID is not in the distance matrix.
+        '''
+        if lookup_id in self._id_index:
+            return self._id_index[lookup_id]
+        raise MissingIDError(lookup_id)
+
+
+class MemmapDistanceMatrix(_IDIndex):
+    '''Distance matrix whose data is memory-mapped from a file on disk.
+
+       Distances are stored either as a square matrix or in condensed form,
+       i.e. the upper triangle without diagonal in row-major order as used by
+       scipy.spatial.distance.squareform. Rows are only paged in from disk
+       when requested, thus the matrix does not need to fit in memory and
+       opening a matrix is near-instant. A row of the condensed form is read
+       as one consecutive run right of the diagonal, but its cells left of
+       the diagonal are scattered over the rows of the other elements, i.e.
+       the square form is faster for heuristics that stream rows.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of the elements, in the order of the rows of the matrix.
+    filepath: str
+        File holding the raw distances.
+    condensed: bool
+        True if the file holds the condensed form of the matrix. Default is
+        False, i.e. the file holds the square matrix.
+    dtype: np.dtype
+        Data type of the stored distances. Default is float32.
+    offset: int
+        Position of the first distance in the file in bytes. Default is 0.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are not unique.
+    '''
+    def __init__(self, ids, filepath, condensed=False, dtype=np.float32,
+                 offset=0):
+        super(MemmapDistanceMatrix, self).__init__(ids)
+        self.filepath = filepath
+        self.condensed = condensed
+        self.dtype = np.dtype(dtype)
+        self._column_offsets = None
+        n = self.shape[0]
+        if condensed:
+            shape = (n * (n - 1) // 2, )
+        else:
+            shape = self.shape
+        if shape[0] == 0:
+            # numpy refuses to map empty files
+            self._data = np.zeros(shape, dtype=self.dtype)
+        else:
+            self._data = np.memmap(filepath, dtype=self.dtype, mode='r',
+                                   offset=offset, shape=shape)
+
+    @classmethod
+    def write(cls, dm, filepath, condensed=False, dtype=np.float32):
+        '''Store a distance matrix as memory-mappable file.
+
+        Parameters
+        ----------
+        dm: skbio.stats.distance.DistanceMatrix
+            Pairwise distances to store.
+        filepath: str
+            File to write the raw distances to.
+        condensed: bool
+            Store the condensed instead of the square form of the matrix.
+            Default is False.
+        dtype: np.dtype
+            Data type of the stored distances. Default is float32.
+
+        Returns
+        -------
+        MemmapDistanceMatrix
+            The stored distance matrix, mapped from filepath.
+        '''
+        n = dm.shape[0]
+        with open(filepath, 'wb') as f:
+            for idx in range(n):
+                row = dm.data[idx, idx + 1:] if condensed else dm.data[idx]
+                f.write(np.ascontiguousarray(row, dtype=dtype).tobytes())
+        return cls(dm.ids, filepath, condensed=condensed, dtype=dtype)
+
+    def _positions(self, rows, cols):
+        '''Positions of cells (rows, cols) in the condensed form, where cells
+        on the diagonal are mapped to position 0.'''
+        n = self.shape[0]
+        lo, hi = np.minimum(rows, cols), np.maximum(rows, cols)
+        positions = n * lo - lo * (lo + 1) // 2 + hi - lo - 1
+        return np.where(lo == hi, 0, positions)
+
+    def rows(self, indices):
+        '''Return the distance rows of the given elements.
+
+        Parameters
+        ----------
+        indices: slice or sequence of int
+            Row indices of the elements.
+
+        Returns
+        -------
+        np.ndarray
+            A two dimensional array with one row per element.
+        '''
+        if not self.condensed:
+            return self._data[indices]
+        n = self.shape[0]
+        if self._column_offsets is None:
+            # cell (j, i) with j < i is at position offsets[j] + i
+            j = np.arange(n, dtype=np.int64)
+            self._column_offsets = n * j - j * (j + 1) // 2 - j - 1
+        offsets = self._column_offsets
+        if isinstance(indices, slice):
+            indices = range(*indices.indices(n))
+        rows = np.empty((len(indices), n), dtype=self.dtype)
+        for pos, i in enumerate(indices):
+            i = int(i)
+            # the cells right of the diagonal are stored consecutively, those
+            # left of it are gathered from the rows of the other elements
+            start = offsets[i] + i + 1
+            rows[pos, i + 1:] = self._data[start:start + n - i - 1]
+            rows[pos, :i] = self._data[offsets[:i] + i]
+            rows[pos, i] = 0
+        return rows
+
+    def entries(self, rows, cols):
+        '''Return the distances between elements rows[i] and cols[i].
+
+        Parameters
+        ----------
+        rows, cols: np.ndarray of int
+            Row and column indices, broadcast against each other.
+
+        Returns
+        -------
+        np.ndarray
+            The distances, in the broadcast shape of rows and cols.
+        '''
+        if not self.condensed:
+            return self._data[rows, cols]
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.int64),
+                                         np.asarray(cols, dtype=np.int64))
+        if self._data.shape[0] == 0:
+            return np.zeros(rows.shape, dtype=self.dtype)
+        distances = self._data[self._positions(rows, cols)]
+        distances[rows == cols] = 0
+        return distances
+
+
+class LazyDistanceMatrix(_IDIndex):
+    '''Distance matrix whose rows are computed on demand.
+
+       Rows are computed by a user-supplied function when first requested
+       and kept in a least-recently-used cache bounded by its size in bytes.
+       Rows evicted from the cache can be spilled to disk, such that they are
+       read back instead of being computed again. Thus, heuristics that only
+       touch a few rows, e.g. constructive maxdist with a seedset, only
+       compute those rows.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of the elements.
+    pairwise: callable
+        Called as pairwise(i, js) with a row index i and an array of column
+        indices js, returns the distances between element i and the elements
+        js.
+    cache_bytes: int
+        Maximal size of the cached rows in bytes. Default is 1 GiB.
+    spill_dir: str
+        Directory to store rows evicted from the cache in. Default is None,
+        i.e. evicted rows are discarded and computed again when needed.
+    dtype: np.dtype
+        Data type of the cached rows. Default is float64.
+
+    Attributes
+    ----------
+    num_evaluated: int
+        Number of distances computed by pairwise so far.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are not unique.
+    '''
+    def __init__(self, ids, pairwise, cache_bytes=2 ** 30, spill_dir=None,
+                 dtype=np.float64):
+        super(LazyDistanceMatrix, self).__init__(ids)
+        self.pairwise = pairwise
+        self.cache_bytes = cache_bytes
+        self.spill_dir = spill_dir
+        self.dtype = np.dtype(dtype)
+        self.num_evaluated = 0
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._spilled = set()
+        # heuristics may request rows from several threads
+        self._lock = threading.Lock()
+
+    def _spill_path(self, idx):
+        return os.path.join(self.spill_dir, 'row_%i.npy' % idx)
+
+    def _store(self, idx, row):
+        '''Add a row to the cache, evicting least recently used rows.'''
+        if (self.spill_dir is not None) and (row.nbytes > self.cache_bytes):
+            if idx not in self._spilled:
+                np.save(self._spill_path(idx), row)
+                self._spilled.add(idx)
+            return
+        while self._cache and \
+                (self._cached_bytes + row.nbytes > self.cache_bytes):
+            evicted, evicted_row = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted_row.nbytes
+            if (self.spill_dir is not None) and \
+               (evicted not in self._spilled):
+                np.save(self._spill_path(evicted), evicted_row)
+                self._spilled.add(evicted)
+        if row.nbytes <= self.cache_bytes:
+            self._cache[idx] = row
+            self._cached_bytes += row.nbytes
+
+    def _row(self, idx):
+        '''Return the row of an element from cache, disk, or pairwise.'''
+        idx = int(idx)
+        with self._lock:
+            if idx in self._cache:
+                self._cache.move_to_end(idx)
+                return self._cache[idx]
+            spilled = idx in self._spilled
+        if spilled:
+            row = np.load(self._spill_path(idx))
+        else:
+            row = np.asarray(self.pairwise(idx, np.arange(self.shape[0])),
+                             dtype=self.dtype)
+        with self._lock:
+            if not spilled:
+                self.num_evaluated += row.shape[0]
+            self._store(idx, row)
+        return row
+
+    def rows(self, indices):
+        '''Return the distance rows of the given elements.
+
+        Parameters
+        ----------
+        indices: slice or sequence of int
+            Row indices of the elements.
+
+        Returns
+        -------
+        np.ndarray
+            A two dimensional array with one row per element.
+        '''
+        if isinstance(indices, slice):
+            indices = range(*indices.indices(self.shape[0]))
+        return np.array([self._row(idx) for idx in indices],
+                        dtype=self.dtype).reshape(-1, self.shape[0])
+
+    def entries(self, rows, cols):
+        '''Return the distances between elements rows[i] and cols[i].
+
+        Parameters
+        ----------
+        rows, cols: np.ndarray of int
+            Row and column indices, broadcast against each other.
+
+        Returns
+        -------
+        np.ndarray
+            The distances, in the broadcast shape of rows and cols.
+        '''
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.int64),
+                                         np.asarray(cols, dtype=np.int64))
+        distances = np.zeros(rows.shape, dtype=self.dtype)
+        for idx in np.unique(rows):
+            mask = rows == idx
+            distances[mask] = self._row(idx)[cols[mask]]
+        return distances
+
+
+def _row_blocks(dm):
+    '''Yield consecutive blocks of rows of a distance matrix in float64.'''
+    n = dm.shape[0]
+    block_size = max(1, _BLOCK_ELEMENTS // max(1, n))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        yield start, stop, np.asarray(_rows(dm, slice(start, stop)),
+                                      dtype=np.float64)
+
+
+def _fixed_decimals(dm, max_decimals=6, atol=1e-6):
+    '''Smallest number of decimals that represents all distances exactly
+       as uint16 multiples of 10^-decimals, or None if there is none.'''
+    candidates = list(range(max_decimals + 1))
+    for _, _, block in _row_blocks(dm):
+        if block.size == 0:
+            continue
+        if block.min() < 0:
+            return None
+        candidates = [d for d in candidates
+                      if (block.max() * 10 ** d <= np.iinfo(np.uint16).max)
+                      and np.all(np.abs(block * 10 ** d -
+                                        np.rint(block * 10 ** d)) <= atol)]
+        if not candidates:
+            return None
+    return candidates[0]
+
+
+class CompactDistanceMatrix(_IDIndex):
+    '''Distance matrix held in memory in a compact data type.
+
+       Distances are stored either as float32, or quantised as uint16 values
+       that are multiplied by a scale factor when rows are read. Compared to
+       float64, this halves or quarters memory and bandwidth. Rows are
+       returned as float32, while the heuristics accumulate sums in float64.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of the elements.
+    data: np.ndarray
+        Square matrix of distances, or of quantised distances if scale is
+        given.
+    scale: float
+        Factor to convert quantised distances into distances. Default is
+        None, i.e. data holds the distances.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are not unique or do not match the shape of data.
+    '''
+    def __init__(self, ids, data, scale=None):
+        super(CompactDistanceMatrix, self).__init__(ids)
+        self._data = np.asarray(data)
+        if self._data.shape != self.shape:
+            raise DissimilarityMatrixError(
+                "Data must be a %ix%i matrix, found shape %s."
+                % (self.shape + (self._data.shape, )))
+        self.scale = scale
+        self.dtype = self._data.dtype
+
+    @classmethod
+    def from_distance_matrix(cls, dm, dtype='auto', max_decimals=6):
+        '''Convert a distance matrix into a compact one.
+
+        Parameters
+        ----------
+        dm: skbio.stats.distance.DistanceMatrix
+            Pairwise distances to convert, or any matrix adapter.
+        dtype: np.dtype or str
+            float32: store distances as float32.
+            uint16: quantise distances into 65536 equidistant levels between
+                    0 and the largest distance.
+            'auto': uint16 if all distances are non-negative multiples of
+                    10^-d for d <= max_decimals that fit into uint16, e.g.
+                    Mash distances with 4 decimals, which is lossless.
+                    Otherwise float32.
+            Default is 'auto'.
+        max_decimals: int
+            Maximal number of decimals for the 'auto' detection. Default is
+            6.
+
+        Returns
+        -------
+        CompactDistanceMatrix
+
+        Raises
+        ------
+        ValueError
+            If the dtype is neither float32, uint16 nor 'auto', or distances
+            to quantise are negative.
+        '''
+        scale = None
+        if isinstance(dtype, str) and (dtype == 'auto'):
+            decimals = _fixed_decimals(dm, max_decimals)
+            if decimals is None:
+                dtype = np.float32
+            else:
+                dtype, scale = np.uint16, 10.0 ** -decimals
+        elif np.dtype(dtype) == np.uint16:
+            min_val, max_val = np.infty, 0
+            for _, _, block in _row_blocks(dm):
+                if block.size > 0:
+                    min_val = min(min_val, block.min())
+                    max_val = max(max_val, block.max())
+            if min_val < 0:
+                raise ValueError("Negative distances cannot be quantised.")
+            scale = (max_val / np.iinfo(np.uint16).max) or 1.0
+        elif np.dtype(dtype) != np.float32:
+            raise ValueError("Unsupported dtype '%s'. Choose float32, uint16 "
+                             "or 'auto'." % dtype)
+
+        data = np.empty(dm.shape, dtype=dtype)
+        for start, stop, block in _row_blocks(dm):
+            if scale is None:
+                data[start:stop] = block
+            else:
+                data[start:stop] = np.rint(block / scale)
+        return cls(dm.ids, data, scale)
+
+    @property
+    def nbytes(self):
+        '''Memory held by the distances in bytes.'''
+        return self._data.nbytes
+
+    def _decode(self, values):
+        if self.scale is None:
+            return values
+        return values * np.float32(self.scale)
+
+    def rows(self, indices):
+        '''Return the distance rows of the given elements.
+
+        Parameters
+        ----------
+        indices: slice or sequence of int
+            Row indices of the elements.
+
+        Returns
+        -------
+        np.ndarray
+            A two dimensional float32 array with one row per element.
+        '''
+        return self._decode(self._data[indices])
+
+    def entries(self, rows, cols):
+        '''Return the distances between elements rows[i] and cols[i].
+
+        Parameters
+        ----------
+        rows, cols: np.ndarray of int
+            Row and column indices, broadcast against each other.
+
+        Returns
+        -------
+        np.ndarray
+            The float32 distances, in the broadcast shape of rows and cols.
+        '''
+        return self._decode(self._data[rows, cols])
+
+
+class SubsetDistanceMatrix(_IDIndex):
+    '''Distance matrix restricted to a subset of the elements of another.
+
+       Rows and entries are requested from the underlying matrix and then
+       restricted to the subset, i.e. memory-mapped or lazily computed
+       distances are not copied.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        The underlying distance matrix, or any matrix adapter.
+    ids: sequence of str
+        IDs of the elements of the subset, in the order of the rows of the
+        subset.
+
+    Raises
+    ------
+    skbio.stats.distance.MissingIDError
+        If an ID is not in dm.
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are empty or not unique.
+    '''
+    def __init__(self, dm, ids):
+        ids = tuple(ids)
+        self._indices = _ids_to_indices(ids, dm)
+        super(SubsetDistanceMatrix, self).__init__(ids)
+        self._dm = dm
+
+    def rows(self, indices):
+        '''Return the distance rows of the given elements.
+
+        Parameters
+        ----------
+        indices: slice or sequence of int
+            Row indices of the elements.
+
+        Returns
+        -------
+        np.ndarray
+            A two dimensional array with one row per element.
+        '''
+        return _rows(self._dm, self._indices[indices])[:, self._indices]
+
+    def entries(self, rows, cols):
+        '''Return the distances between elements rows[i] and cols[i].
+
+        Parameters
+        ----------
+        rows, cols: np.ndarray of int
+            Row and column indices, broadcast against each other.
+
+        Returns
+        -------
+        np.ndarray
+            The distances, in the broadcast shape of rows and cols.
+        '''
+        return _entries(self._dm, self._indices[rows], self._indices[cols])
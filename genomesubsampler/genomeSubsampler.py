@@ -12,14 +12,277 @@
 # main front-end of the genome-subsampler
 #
 
+import inspect
+import time
+from tempfile import TemporaryDirectory
+
 import click
+import numpy as np
+from skbio.stats.distance import DissimilarityMatrixError, DistanceMatrix
+
+from genomesubsampler.deduplication import deduplicate
+from genomesubsampler.distanceMatrix import SubsetDistanceMatrix
+from genomesubsampler.matrixIO import BACKENDS, load_distance_matrix
+from genomesubsampler.parseRepophlan import (SCORES, read_repophlan,
+                                             filter_genomes, genome_mask)
+from genomesubsampler.portfolio import ALGORITHMS
+from genomesubsampler.prototypeSelection import (distance_sum,
+                                                 prototype_selection_path,
+                                                 _PATH_ALGORITHMS)
+
+
+def read_seedset(seedset_fp):
+    """Read genome IDs, one per line.
+
+    Parameters
+    ----------
+    seedset_fp : str
+        File path to the list of IDs. Empty lines and lines starting with
+        '#' are ignored.
+
+    Returns
+    -------
+    list of str
+        The IDs, in the order of the file.
+    """
+    with open(seedset_fp, 'r') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def restrict_distance_matrix(dm, genomes, seedset=None):
+    """Restrict a distance matrix to the given genomes.
+
+    Parameters
+    ----------
+    dm : skbio.stats.distance.DistanceMatrix
+        Pairwise distances of all genomes, or any matrix adapter.
+    genomes : iterable of str
+        IDs of the genomes to keep, e.g. the genomes that pass the quality
+        filters. IDs that are not in dm are ignored.
+    seedset : iterable of str
+        IDs of pre-selected genomes, which are kept in any case. Default is
+        None.
+
+    Returns
+    -------
+    skbio.stats.distance.DistanceMatrix or SubsetDistanceMatrix
+        The distances of the kept genomes, in the order of dm.
+    """
+    mask = genome_mask(dm.ids, genomes) | genome_mask(dm.ids, seedset or [])
+    if mask.all():
+        return dm
+    ids = [dm.ids[idx] for idx in np.flatnonzero(mask)]
+    if isinstance(dm, DistanceMatrix):
+        return dm.filter(ids)
+    return SubsetDistanceMatrix(dm, ids)
+
+
+def subsample(dm, ks, algorithm='constructive_maxdist', seedset=None,
+              n_jobs=1, weights=None, max_nodes=None, time_limit=None):
+    """Select prototypes for one or several k.
+
+    Parameters
+    ----------
+    dm : skbio.stats.distance.DistanceMatrix
+        Pairwise distances of the genomes, or any matrix adapter.
+    ks : iterable of int
+        Numbers of prototypes to select.
+    algorithm : str
+        Name of the selection algorithm, see portfolio.ALGORITHMS. Default
+        is 'constructive_maxdist'.
+    seedset : iterable of str
+        IDs of pre-selected prototypes. Default is None.
+    n_jobs : int
+        Number of threads for algorithms that process the matrix in blocks.
+        Default is 1.
+    weights : sequence of float
+        Weight of every genome in the p-median model, e.g. the size of its
+        cluster after deduplication. Ignored by the other algorithms.
+        Default is None.
+    max_nodes : int
+        Maximal number of search nodes of the exhaustive search per k.
+        Ignored by the other algorithms. Default is None, i.e. no limit.
+    time_limit : float
+        Maximal runtime in seconds of the exhaustive search per k, which
+        then yields the best prototypes found so far. Ignored by the other
+        algorithms. Default is None, i.e. no limit.
+
+    Yields
+    ------
+    (int, list of str, float, float)
+        For every k in ascending order: k, the prototypes, their objective
+        and the runtime in seconds. The unweighted greedy heuristics, whose
+        selections are nested, select for all k in a single run, see
+        prototypeSelection.prototype_selection_path, whose total runtime is
+        reported for every k.
+
+    Raises
+    ------
+    ValueError
+        If the algorithm is unknown, or a k or the seedset are invalid.
+    skbio.stats.distance.DissimilarityMatrixError
+        If the algorithm selected an element twice, e.g. p-median on a
+        degenerate matrix.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError("Unknown algorithm '%s'. Choose from: %s."
+                         % (algorithm, ', '.join(sorted(ALGORITHMS))))
+    ks = sorted(set(ks))
+    kwargs = {}
+    if (weights is not None) and (algorithm == 'constructive_pMedian'):
+        kwargs['weights'] = weights
+    elif (algorithm in _PATH_ALGORITHMS) and (len(ks) > 1):
+        start = time.time()
+        subsets, _, objectives = prototype_selection_path(
+            dm, ks, algorithm, seedset=seedset, n_jobs=n_jobs)
+        seconds = time.time() - start
+        for k in ks:
+            yield k, subsets[k], objectives[k], seconds
+        return
+
+    func = ALGORITHMS[algorithm]
+    parameters = inspect.signature(func).parameters
+    for name, value in [('n_jobs', n_jobs), ('max_nodes', max_nodes),
+                        ('time_limit', time_limit)]:
+        if (name in parameters) and (value is not None):
+            kwargs[name] = value
+    for k in ks:
+        start = time.time()
+        prototypes = list(func(dm, k, seedset=seedset, **kwargs))
+        seconds = time.time() - start
+        yield k, prototypes, distance_sum(prototypes, dm), seconds
 
 
 @click.command()
-def _main():
+@click.option('--distance-matrix-fp', required=True,
+              type=click.Path(resolve_path=True, readable=True, exists=True,
+                              dir_okay=False),
+              help='Pairwise distances of the genomes, in the tab-separated '
+                   'text or the binary format')
+@click.option('--backend', type=click.Choice(BACKENDS), default='dense',
+              show_default=True,
+              help='Hold the distance matrix in memory (dense), compressed '
+                   'in memory (compact) or memory-mapped from disk (memmap)')
+@click.option('--repophlan-wscores-fp',
+              type=click.Path(resolve_path=True, readable=True, exists=True,
+                              dir_okay=False),
+              help='RepoPhlAn summary table with scores, to filter genomes by')
+@click.option('--cache-table', is_flag=True,
+              help='Cache the parsed RepoPhlAn table next to the table')
+@click.option('--min-score-faa', type=float,
+              help='Minimal score of the protein sequences')
+@click.option('--min-score-fna', type=float,
+              help='Minimal score of the genome sequence')
+@click.option('--min-score-rrna', type=float,
+              help='Minimal score of the rRNA genes')
+@click.option('--min-score-trna', type=float,
+              help='Minimal score of the tRNA genes')
+@click.option('--refseq-only', is_flag=True,
+              help='Keep RefSeq genomes only')
+@click.option('--assembly-level', multiple=True,
+              help='Keep genomes of this assembly level only, e.g. '
+                   '"Complete Genome", can be given multiple times')
+@click.option('--one-per-species', is_flag=True,
+              help='Keep only the genome with the best scores per species')
+@click.option('--dedup-threshold', type=float,
+              help='Collapse genomes up to this distance into one '
+                   'representative before selection')
+@click.option('--dedup-species', is_flag=True,
+              help='Collapse genomes of the same species into one '
+                   'representative before selection, requires the '
+                   'RepoPhlAn table')
+@click.option('--clusters-fp', type=click.File('w'),
+              help='Output table of the genomes of every representative, '
+                   'if genomes are collapsed')
+@click.option('--algorithm', type=click.Choice(sorted(ALGORITHMS)),
+              default='constructive_maxdist', show_default=True,
+              help='Prototype selection algorithm')
+@click.option('-k', '--num-prototypes', type=int, multiple=True,
+              required=True,
+              help='Number of genomes to select, can be given multiple times')
+@click.option('--seedset-fp',
+              type=click.Path(resolve_path=True, readable=True, exists=True,
+                              dir_okay=False),
+              help='Genomes to select in any case, one ID per line')
+@click.option('--max-nodes', type=int,
+              help='Maximal number of search nodes of the exhaustive '
+                   'algorithm per number of genomes')
+@click.option('--time-limit', type=float,
+              help='Maximal runtime in seconds of the exhaustive algorithm '
+                   'per number of genomes, reports the best genomes found '
+                   'so far if exceeded')
+@click.option('--n-jobs', type=int, default=1, show_default=True,
+              help='Number of threads processing the distance matrix')
+@click.option('--output-fp', type=click.File('w'), default='-',
+              help='Output table, one line per number of genomes  '
+                   '[default: stdout]')
+def _main(distance_matrix_fp, backend, repophlan_wscores_fp, cache_table,
+          min_score_faa, min_score_fna, min_score_rrna, min_score_trna,
+          refseq_only, assembly_level, one_per_species, dedup_threshold,
+          dedup_species, clusters_fp, algorithm, num_prototypes, seedset_fp,
+          max_nodes, time_limit, n_jobs, output_fp):
     """Main front-end of the genome-subsampler.
+
+    Selects representative genomes from the distance matrix, optionally
+    restricted to the genomes of the RepoPhlAn table that pass the quality
+    filters. Writes one tab-separated line per number of genomes, holding
+    the number, the algorithm, the objective, i.e. the sum of pairwise
+    distances of the selected genomes, the runtime in seconds and the
+    comma-separated IDs of the selected genomes. Genomes can be collapsed
+    into representatives first, in which case representatives are selected.
     """
-    click.echo('Task completed.')
+    if dedup_species and (repophlan_wscores_fp is None):
+        raise click.UsageError("'--dedup-species' requires "
+                               "'--repophlan-wscores-fp'.")
+    seedset = None
+    if seedset_fp is not None:
+        seedset = read_seedset(seedset_fp)
+
+    with TemporaryDirectory() as workdir:
+        dm = load_distance_matrix(distance_matrix_fp, backend, workdir)
+        click.echo('Genomes in distance matrix: %i.' % dm.shape[0], err=True)
+        if repophlan_wscores_fp is not None:
+            min_scores = dict(zip(SCORES, (min_score_faa, min_score_fna,
+                                           min_score_rrna, min_score_trna)))
+            df = read_repophlan(repophlan_wscores_fp, cache_table)
+            genomes = filter_genomes(df, min_scores, refseq_only,
+                                     assembly_level or None, one_per_species)
+            dm = restrict_distance_matrix(dm, genomes, seedset)
+            click.echo('Genomes passing filters: %i.' % dm.shape[0],
+                       err=True)
+
+        weights = None
+        if (dedup_threshold is not None) or dedup_species:
+            try:
+                representatives, clusters = deduplicate(
+                    dm, dedup_threshold,
+                    df['species_taxid'] if dedup_species else None, seedset,
+                    n_jobs)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            dm = restrict_distance_matrix(dm, representatives)
+            weights = [len(clusters[id_]) for id_ in dm.ids]
+            click.echo('Representatives after deduplication: %i.'
+                       % dm.shape[0], err=True)
+            if clusters_fp is not None:
+                clusters_fp.write('#representative\tgenome\n')
+                for id_ in dm.ids:
+                    for member in clusters[id_]:
+                        clusters_fp.write('%s\t%s\n' % (id_, member))
+
+        output_fp.write('#k\talgorithm\tobjective\tseconds\tgenomes\n')
+        try:
+            for k, prototypes, objective, seconds in subsample(
+                    dm, num_prototypes, algorithm, seedset, n_jobs,
+                    weights, max_nodes, time_limit):
+                output_fp.write('%i\t%s\t%s\t%.3f\t%s\n'
+                                % (k, algorithm, objective, seconds,
+                                   ','.join(prototypes)))
+                output_fp.flush()
+        except (ValueError, RuntimeError, DissimilarityMatrixError) as e:
+            raise click.ClickException(str(e))
+    click.echo('Task completed.', err=True)
 
 
 if __name__ == "__main__":
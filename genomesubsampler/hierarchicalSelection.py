@@ -0,0 +1,235 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Hierarchical prototype selection
+
+Instead of selecting prototypes from one all-vs-all distance matrix of all
+genomes, genomes are partitioned, e.g. by a taxonomic rank of the RepoPhlAn
+table, and prototypes are selected in every partition independently from a
+small distance block holding only the genomes of that partition. The number
+of prototypes per partition is allocated by a policy. Optionally, a global
+merge pass selects the final prototypes from the union of local prototypes.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from genomesubsampler.blockedExecution import effective_n_jobs
+from genomesubsampler.portfolio import ALGORITHMS
+from genomesubsampler.prototypeSelection import _row_sums
+
+# prefixes of the taxonomic ranks in RepoPhlAn's taxonomy column
+RANKS = ('k', 'p', 'c', 'o', 'f', 'g', 's', 't')
+
+
+def taxonomy_partitions(taxonomy, rank='p'):
+    '''Partition genomes by a taxonomic rank.
+
+    Parameters
+    ----------
+    taxonomy: pd.Series
+        Taxonomy strings like 'k__Bacteria|p__Firmicutes|...', indexed by
+        genome ID, e.g. the 'taxonomy' column of the RepoPhlAn table.
+    rank: str
+        Prefix of the rank to partition by, one of RANKS. Default is 'p',
+        i.e. phylum.
+
+    Returns
+    -------
+    dict of str: list of str
+        Genome IDs for every taxon, in the order of taxonomy. Genomes without
+        a name at the given rank are collected under the taxon '<rank>__'.
+
+    Raises
+    ------
+    ValueError
+        If the rank is unknown.
+    '''
+    if rank not in RANKS:
+        raise ValueError("Unknown rank '%s'. Choose from: %s."
+                         % (rank, ', '.join(RANKS)))
+    taxa = taxonomy.fillna('').str.extract(
+        r'(?:^|\|)(%s__[^|]*)' % rank, expand=False).fillna('%s__' % rank)
+    return {taxon: list(ids)
+            for taxon, ids in taxa.groupby(taxa, sort=True).groups.items()}
+
+
+def allocate_prototypes(sizes, num_prototypes, policy='proportional',
+                        minimum=None):
+    '''Distribute prototypes across partitions.
+
+       After every partition received its minimum, the remaining prototypes
+       are distributed by the policy. Fractional shares are rounded down and
+       left-over prototypes go to the partitions with the largest fractional
+       shares, ties broken by the order of partitions. No partition receives
+       more prototypes than elements.
+
+    Parameters
+    ----------
+    sizes: dict of str: int
+        Number of elements per partition.
+    num_prototypes: int
+        Total number of prototypes.
+    policy: str
+        'proportional': shares proportional to the partition sizes.
+        'equal': the same share for every partition.
+        Default is 'proportional'.
+    minimum: dict of str: int
+        Minimal number of prototypes per partition, e.g. the number of seeds
+        in the partition. Default is None, i.e. 0 for all partitions.
+
+    Returns
+    -------
+    dict of str: int
+        Number of prototypes per partition.
+
+    Raises
+    ------
+    ValueError
+        If the policy is unknown, there are more prototypes than elements, or
+        the minima exceed the number of prototypes.
+    '''
+    if policy not in ('proportional', 'equal'):
+        raise ValueError("Unknown policy '%s'. Choose 'proportional' or "
+                         "'equal'." % policy)
+    labels = list(sizes)
+    capacity = np.array([sizes[label] for label in labels], dtype=np.int64)
+    if num_prototypes > capacity.sum():
+        raise ValueError("'num_prototypes' must not exceed the number of "
+                         "elements in all partitions.")
+    if minimum is None:
+        minimum = {}
+    alloc = np.array([minimum.get(label, 0) for label in labels],
+                     dtype=np.int64)
+    if np.any(alloc > capacity) or (alloc.sum() > num_prototypes):
+        raise ValueError("The minimal numbers of prototypes exceed the "
+                         "partition sizes or 'num_prototypes'.")
+    if policy == 'proportional':
+        weights = capacity.astype(np.float64)
+    else:
+        weights = np.ones(len(labels))
+
+    remaining = num_prototypes - alloc.sum()
+    while remaining > 0:
+        open_weights = np.where(alloc < capacity, weights, 0)
+        shares = remaining * open_weights / open_weights.sum()
+        floor = np.floor(shares).astype(np.int64)
+        add = np.minimum(floor, capacity - alloc)
+        left = remaining - add.sum()
+        if np.all(add == floor) and (left > 0):
+            # largest remainder method, capped partitions are re-distributed
+            # in the next round instead
+            order = np.argsort(floor - shares, kind='mergesort')
+            order = order[alloc[order] + add[order] < capacity[order]]
+            add[order[:left]] += 1
+        alloc += add
+        remaining -= add.sum()
+    return {label: int(a) for label, a in zip(labels, alloc)}
+
+
+def _select_partition(ids, num_prototypes, distance_block, algorithm, seeds):
+    '''Select prototypes among the elements of a single partition.'''
+    if len(seeds) >= num_prototypes:
+        return list(seeds)
+    if num_prototypes >= len(ids):
+        return list(ids)
+    dm = distance_block(ids)
+    if num_prototypes == 1:
+        # a single prototype has no pairwise distances, thus pick the
+        # element with the smallest sum of distances to all others
+        return [ids[int(_row_sums(dm).argmin())]]
+    return list(ALGORITHMS[algorithm](dm, num_prototypes,
+                                      seedset=seeds or None))
+
+
+def hierarchical_selection(partitions, distance_block, num_prototypes,
+                           algorithm='constructive_maxdist',
+                           policy='proportional', seedset=None, merge=False,
+                           oversampling=2.0, n_jobs=-1):
+    '''Select prototypes partition by partition.
+
+    Parameters
+    ----------
+    partitions: dict of str: list of str
+        Element IDs per partition, e.g. from taxonomy_partitions.
+        Partitions must be disjoint.
+    distance_block: callable
+        Called with a list of element IDs, returns the distance matrix of
+        these elements, e.g. the filter method of a DistanceMatrix, or a
+        function computing the distances on demand.
+    num_prototypes: int
+        Total number of prototypes to select.
+    algorithm: str
+        Name of the prototype selection algorithm, see portfolio.ALGORITHMS.
+        Default is 'constructive_maxdist'.
+    policy: str
+        Policy to distribute prototypes across partitions, see
+        allocate_prototypes. Default is 'proportional'.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Every
+        partition receives at least its seeds as prototypes.
+    merge: bool
+        If True, oversampling times num_prototypes prototypes are selected
+        across partitions and the final prototypes are selected from the
+        union of local prototypes with the same algorithm. Default is False.
+    oversampling: float
+        Factor of local prototypes if merge is True. Default is 2.0.
+    n_jobs: int
+        Number of partitions processed in parallel, see
+        blockedExecution.effective_n_jobs. Default is -1, i.e. all CPUs.
+
+    Returns
+    -------
+    (list of str, dict of str: list of str)
+        The selected prototypes and the local prototypes of every partition.
+
+    Raises
+    ------
+    ValueError
+        If the algorithm is unknown, a seed is not in any partition, or the
+        number of prototypes cannot be allocated, see allocate_prototypes.
+    '''
+    if algorithm not in ALGORITHMS:
+        raise ValueError("Unknown algorithm '%s'. Choose from: %s."
+                         % (algorithm, ', '.join(sorted(ALGORITHMS))))
+    labels = list(partitions)
+    sizes = {label: len(partitions[label]) for label in labels}
+    seeds = {label: [] for label in labels}
+    if seedset is not None:
+        taxon = {id_: label for label in labels for id_ in partitions[label]}
+        for seed in seedset:
+            if seed not in taxon:
+                raise ValueError("Seed '%s' is not in any partition." % seed)
+            seeds[taxon[seed]].append(seed)
+
+    num_local = num_prototypes
+    if merge:
+        num_local = min(sum(sizes.values()),
+                        int(np.ceil(oversampling * num_prototypes)))
+    alloc = allocate_prototypes(
+        sizes, num_local, policy,
+        minimum={label: len(seeds[label]) for label in labels})
+
+    with ThreadPoolExecutor(
+            max_workers=min(effective_n_jobs(n_jobs),
+                            max(1, len(labels)))) as executor:
+        futures = [executor.submit(_select_partition, partitions[label],
+                                   alloc[label], distance_block, algorithm,
+                                   seeds[label])
+                   for label in labels]
+        local = {label: future.result()
+                 for label, future in zip(labels, futures)}
+
+    prototypes = [id_ for label in labels for id_ in local[label]]
+    if merge and (num_prototypes < len(prototypes)):
+        all_seeds = [id_ for label in labels for id_ in seeds[label]]
+        prototypes = _select_partition(prototypes, num_prototypes,
+                                       distance_block, algorithm, all_seeds)
+    return prototypes, local
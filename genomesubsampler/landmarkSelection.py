@@ -0,0 +1,197 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Landmark-based approximate prototype selection
+
+For very large genome collections, the full pairwise distance matrix cannot
+be computed. Instead, the distances of all n genomes to a small number of m
+landmark genomes are given as an n x m block, together with a callback that
+computes true distances on demand. The heuristics in this module only
+request the distance rows they actually need, e.g. the rows of selected
+prototypes, from an LRU-cached LazyDistanceMatrix, and report how many true
+distances were evaluated.
+
+Distances between genomes are no kernel, i.e. a Nystroem approximation of
+the full matrix from the landmark block does not apply. Instead, landmarks
+serve as reference points to pick the first prototype of maxdist and as the
+users of the p-median model.
+"""
+
+import numpy as np
+from skbio.stats.distance import DissimilarityMatrixError
+
+from genomesubsampler.distanceMatrix import LazyDistanceMatrix
+from genomesubsampler.prototypeSelection import (_validate_parameters,
+                                                 _rows, _BLOCK_ELEMENTS,
+                                                 _constructive_maxdist_order)
+
+
+class LandmarkDistanceMatrix(LazyDistanceMatrix):
+    '''Distances to landmarks plus true distances computed on demand.
+
+       True distance rows are computed by the pairwise callback when first
+       requested and cached, see distanceMatrix.LazyDistanceMatrix.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of all n elements.
+    landmarks: np.ndarray
+        The n x m distances of every element to the m landmarks.
+    pairwise: callable
+        Called as pairwise(i, js) with a row index i and an array of column
+        indices js, returns the true distances between element i and the
+        elements js.
+    cache_bytes: int
+        Maximal size of the cached rows in bytes. Default is 1 GiB.
+    spill_dir: str
+        Directory to spill rows evicted from the cache to. Default is None.
+
+    Attributes
+    ----------
+    num_evaluated: int
+        Number of true distances computed by pairwise so far.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If the IDs are not unique or do not match the landmark block.
+    '''
+    def __init__(self, ids, landmarks, pairwise, cache_bytes=2 ** 30,
+                 spill_dir=None):
+        super(LandmarkDistanceMatrix, self).__init__(
+            ids, pairwise, cache_bytes=cache_bytes, spill_dir=spill_dir)
+        self.landmarks = np.asarray(landmarks)
+        if (self.landmarks.ndim != 2) or \
+           (self.landmarks.shape[0] != self.shape[0]):
+            raise DissimilarityMatrixError(
+                "Landmark distances must have one row per ID.")
+
+
+def prototype_selection_landmark_maxdist(dm, num_prototypes, seedset=None):
+    '''Approximately select k prototypes with the constructive maxdist
+       heuristic.
+
+       The element that is most distant from any landmark and the element
+       most distant from it replace the globally most distant pair of
+       prototypeSelection.prototype_selection_constructive_maxdist, i.e. the
+       full matrix is never scanned. All further prototypes are selected as
+       in the exact heuristic, which only needs the rows of the prototypes.
+
+    Parameters
+    ----------
+    dm: LandmarkDistanceMatrix
+        Landmark distances and the callback for true distances.
+    num_prototypes: int
+        Number of prototypes to select for distance matrix.
+        Must be >= 2, since a single prototype is useless.
+        Must be smaller than the number of elements in the distance matrix,
+        otherwise no reduction is necessary.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Remaining
+        prototypes are then recruited with the prototype selection algorithm.
+        Warning: It will most likely violate the global objective function.
+
+    Returns
+    -------
+    (list of str, int)
+        The selected prototypes, in the order of the elements in the distance
+        matrix, and the number of true distances evaluated by this call.
+
+    Raises
+    ------
+    ValueError
+        If the number of prototypes or the seedset are invalid, see
+        prototypeSelection._validate_parameters.
+
+    Notes
+    -----
+    Evaluates k rows, i.e. O(k * n) true distances instead of O(n^2).
+    '''
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    num_evaluated = dm.num_evaluated
+
+    if seeds is None:
+        first = int(dm.landmarks.max(axis=1).argmax())
+        row = _rows(dm, [first])[0].copy()
+        row[first] = -1 * np.infty
+        second = int(row.argmax())
+        if row[second] > 0:
+            seeds = np.array([first, second])
+        else:
+            # all distances are zero, i.e. the maximum is on the diagonal
+            seeds = np.array([first])
+    # the pair starts the exact heuristic in place of the globally most
+    # distant pair
+    order = _constructive_maxdist_order(dm, num_prototypes, seeds)
+
+    return ([dm.ids[idx] for idx in sorted(order)],
+            dm.num_evaluated - num_evaluated)
+
+
+def prototype_selection_landmark_pMedian(dm, num_prototypes, seedset=None):
+    '''Approximately select k prototypes with the constructive p-median
+       heuristic.
+
+       As in prototypeSelection.prototype_selection_constructive_pMedian,
+       the prototype that minimizes the total distance of all users to their
+       closest prototype is added in every round, but users are the m
+       landmarks instead of all n elements. Thus, candidates are scored with
+       the landmark block only and no true distance is evaluated.
+
+    Parameters
+    ----------
+    dm: LandmarkDistanceMatrix
+        Landmark distances and the callback for true distances.
+    num_prototypes: int
+        Number of prototypes to select for distance matrix.
+        Must be >= 2, since a single prototype is useless.
+        Must be smaller than the number of elements in the distance matrix,
+        otherwise no reduction is necessary.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Remaining
+        prototypes are then recruited with the prototype selection algorithm.
+        Warning: It will most likely violate the global objective function.
+
+    Returns
+    -------
+    (list of str, int)
+        The selected prototypes, in the order of selection, and the number
+        of true distances evaluated by this call.
+
+    Raises
+    ------
+    ValueError
+        If the number of prototypes or the seedset are invalid, see
+        prototypeSelection._validate_parameters.
+    '''
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    num_evaluated = dm.num_evaluated
+    landmarks = dm.landmarks
+    block_size = max(1, _BLOCK_ELEMENTS // max(1, landmarks.shape[1]))
+
+    if seeds is not None:
+        prototypes = seeds.tolist()
+    else:
+        prototypes = [int(landmarks.sum(axis=1, dtype=np.float64).argmin())]
+    nearest = landmarks[prototypes].min(axis=0).astype(np.float64)
+
+    while len(prototypes) < num_prototypes:
+        scores = np.concatenate([
+            np.minimum(landmarks[start:start + block_size], nearest).sum(
+                axis=1, dtype=np.float64)
+            for start in range(0, landmarks.shape[0], block_size)])
+        # already selected prototypes cannot improve the score
+        scores[prototypes] = np.infty
+        idx = int(scores.argmin())
+        prototypes.append(idx)
+        np.minimum(nearest, landmarks[idx], out=nearest)
+
+    return ([dm.ids[idx] for idx in prototypes],
+            dm.num_evaluated - num_evaluated)
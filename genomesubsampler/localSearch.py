@@ -0,0 +1,143 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Local search refinement
+
+The greedy prototype selection heuristics stop at their first solution. The
+local search implemented here takes the prototypes of any heuristic and
+improves the objective function, i.e. the sum of pairwise distances of all
+prototypes, by swapping single prototypes with non-prototype elements until
+no swap improves the objective any further.
+"""
+
+import time
+
+import numpy as np
+
+from genomesubsampler.prototypeSelection import (_ids_to_indices, _rows,
+                                                 _BLOCK_ELEMENTS)
+
+
+def local_search_swap(dm, prototypes, seedset=None, strategy='best',
+                      max_iterations=None, time_limit=None, tol=1e-10):
+    '''Improve prototypes by swapping single prototypes with other elements.
+
+       For every element, the sum of distances to all current prototypes
+       (sums) is maintained. Swapping prototype p with element q changes the
+       objective by sums[q] - DM[p, q] - sums[p], i.e. the gain of every swap
+       is evaluated in constant time. After a swap, sums are updated with the
+       rows of p and q.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    prototypes: sequence of str
+        IDs of the initial prototypes, e.g. the result of a heuristic.
+    seedset: iterable of str
+        IDs of prototypes that must not be swapped out. Must be a subset of
+        prototypes.
+    strategy: str
+        'best': apply the swap with the largest gain among all swaps.
+        'first': scan prototypes in order and apply the best swap of the
+                 first prototype that can be improved.
+        Default is 'best'.
+    max_iterations: int
+        Maximal number of swaps. Default is None, i.e. no limit.
+    time_limit: float
+        Maximal wall-clock time in seconds. Default is None, i.e. no limit.
+    tol: float
+        Minimal gain of a swap to be applied. Default is 1e-10.
+
+    Returns
+    -------
+    (list of str, list of float)
+        The refined prototypes, in the order of the initial prototypes where
+        swapped prototypes are replaced, and the objective of the initial
+        prototypes followed by the objective after every swap.
+
+    Raises
+    ------
+    ValueError
+        If the strategy is unknown, or the seedset is not a subset of the
+        prototypes.
+    skbio.stats.distance.MissingIDError
+        If a prototype is not in the distance matrix.
+    skbio.stats.distance.DissimilarityMatrixError
+        If prototypes are empty or not unique.
+    '''
+    if strategy not in ('best', 'first'):
+        raise ValueError("Unknown strategy '%s'. Choose 'best' or 'first'."
+                         % strategy)
+    start_time = time.time()
+
+    selected = _ids_to_indices(prototypes, dm)
+    is_selected = np.zeros(dm.shape[0], dtype=bool)
+    is_selected[selected] = True
+    fixed = np.zeros(len(selected), dtype=bool)
+    if seedset is not None:
+        seeds = set(seedset)
+        if not seeds <= set(prototypes):
+            raise ValueError("'seedset' is not a subset of 'prototypes'.")
+        fixed = np.array([p in seeds for p in prototypes], dtype=bool)
+    # positions of the prototypes that might be swapped out
+    swappable = np.flatnonzero(~fixed)
+
+    sums = _rows(dm, selected).sum(axis=0, dtype=np.float64)
+    objective = sums[selected].sum() / 2
+    trajectory = [objective]
+    # number of prototype rows evaluated at once
+    block_size = max(1, _BLOCK_ELEMENTS // dm.shape[0])
+    # position in swappable where the 'first' strategy continues its scan
+    scan_pos = 0
+
+    while len(swappable) > 0:
+        if ((max_iterations is not None) and
+                (len(trajectory) - 1 >= max_iterations)) or \
+           ((time_limit is not None) and
+                (time.time() - start_time >= time_limit)):
+            break
+
+        best_gain, best_swap = tol, None
+        if strategy == 'best':
+            order = swappable
+        else:
+            order = np.roll(swappable, -scan_pos)
+        for start in range(0, len(order), block_size):
+            positions = order[start:start + block_size]
+            rows = _rows(dm, selected[positions])
+            gains = sums[None, :] - rows - sums[selected[positions], None]
+            gains[:, is_selected] = -1 * np.infty
+            pos, idx = np.unravel_index(gains.argmax(), gains.shape)
+            if gains[pos, idx] > best_gain:
+                best_gain, best_swap = gains[pos, idx], (positions[pos], idx)
+                if strategy == 'first':
+                    # the first improving prototype of the block
+                    improving = np.flatnonzero((gains > tol).any(axis=1))[0]
+                    idx = gains[improving].argmax()
+                    best_gain = gains[improving, idx]
+                    best_swap = (positions[improving], idx)
+                    scan_pos = (scan_pos + start + improving + 1) % \
+                        len(swappable)
+                    break
+        if best_swap is None:
+            # local optimum: no swap improves the objective
+            break
+
+        pos, idx = best_swap
+        old = selected[pos]
+        update = _rows(dm, [idx, old])
+        sums += update[0]
+        sums -= update[1]
+        selected[pos] = idx
+        is_selected[old], is_selected[idx] = False, True
+        objective += best_gain
+        trajectory.append(objective)
+
+    return [dm.ids[idx] for idx in selected], trajectory
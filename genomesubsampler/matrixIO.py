@@ -0,0 +1,307 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Binary distance matrix format
+
+Parsing large distance matrices in skbio's tab-separated text format takes
+longer than the prototype selection itself. This module implements a compact
+binary container, which can be memory-mapped without any parsing:
+
+ - prefix: magic bytes, format version, flags, CRC32 checksum of the payload,
+           length of the header and offset of the payload (little endian)
+ - header: UTF-8 encoded JSON holding the element IDs, the data type and the
+           shape of the matrix
+ - payload: the condensed form of the matrix, i.e. its upper triangle
+            without diagonal in row-major order, or, if flagged, the square
+            matrix, aligned to 64 bytes.
+
+The condensed form takes half the space, but the square form is faster to
+read row by row, as the heuristics do.
+
+Matrices are stored with write_binary or converted from text files with
+convert_tsv_to_binary, which never holds more than a single row in memory.
+read_binary returns a MemmapDistanceMatrix, which is a zero-copy view on the
+payload and can be used with all prototype selection functions.
+
+load_distance_matrix opens a matrix in either format with one of the
+BACKENDS, i.e. in memory, compact in memory or memory-mapped.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+from skbio.stats.distance import DistanceMatrix
+
+from genomesubsampler.distanceMatrix import (MemmapDistanceMatrix,
+                                             CompactDistanceMatrix)
+
+_MAGIC = b'GSDMBIN\x00'
+_VERSION = 1
+# magic, version, flags, checksum, header length, payload offset
+_PREFIX = struct.Struct('<8sHHIQQ')
+_FLAG_CHECKSUM = 1
+_FLAG_SQUARE = 2
+_ALIGNMENT = 64
+# number of bytes read at once when verifying checksums
+_CHUNK_SIZE = 2 ** 24
+
+# the ways to hold a distance matrix, see load_distance_matrix
+BACKENDS = ('dense', 'compact', 'memmap')
+
+
+def _write_binary_rows(filepath, ids, rows, dtype, checksum, square=False):
+    '''Write the binary container for a stream of distance rows.
+
+    Parameters
+    ----------
+    filepath: str
+        File to write the container to.
+    ids: sequence of str
+        IDs of the elements.
+    rows: iterable of np.ndarray
+        The distance rows, in the order of ids.
+    dtype: np.dtype
+        Data type of the stored distances.
+    checksum: bool
+        Store a CRC32 checksum of the payload.
+    square: bool
+        Store the complete rows instead of the upper triangle, i.e. the
+        values right of the diagonal. Default is False.
+
+    Raises
+    ------
+    ValueError
+        If the number of rows does not match the number of IDs.
+    '''
+    ids = list(ids)
+    n = len(ids)
+    dtype = np.dtype(dtype)
+    header = json.dumps({'ids': ids, 'dtype': dtype.str,
+                         'shape': [n, n]}).encode('utf-8')
+    payload_offset = _PREFIX.size + len(header)
+    payload_offset += -payload_offset % _ALIGNMENT
+
+    flags = _FLAG_SQUARE if square else 0
+    crc, num_rows = 0, 0
+    with open(filepath, 'wb') as f:
+        f.write(_PREFIX.pack(_MAGIC, _VERSION, flags, 0, len(header),
+                             payload_offset))
+        f.write(header)
+        f.write(b'\x00' * (payload_offset - _PREFIX.size - len(header)))
+        for idx, row in enumerate(rows):
+            if idx >= n:
+                raise ValueError("More distance rows than IDs.")
+            values = np.ascontiguousarray(row if square else row[idx + 1:],
+                                          dtype=dtype)
+            buffer = values.tobytes()
+            if checksum:
+                crc = zlib.crc32(buffer, crc)
+            f.write(buffer)
+            num_rows += 1
+        if num_rows < n:
+            raise ValueError("Fewer distance rows than IDs.")
+
+        # now that the payload is known, fill in the checksum
+        f.seek(0)
+        if checksum:
+            flags |= _FLAG_CHECKSUM
+        f.write(_PREFIX.pack(_MAGIC, _VERSION, flags, crc, len(header),
+                             payload_offset))
+
+
+def write_binary(dm, filepath, dtype=np.float32, checksum=True,
+                 square=False):
+    '''Store a distance matrix in the binary format.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances to store.
+    filepath: str
+        File to write the binary matrix to.
+    dtype: np.dtype
+        Data type of the stored distances. Default is float32.
+    checksum: bool
+        Store a CRC32 checksum of the distances. Default is True.
+    square: bool
+        Store the square instead of the condensed form of the matrix, which
+        is twice as large but faster to read row by row. Default is False.
+    '''
+    _write_binary_rows(filepath, dm.ids,
+                       (dm.data[idx] for idx in range(dm.shape[0])),
+                       dtype, checksum, square)
+
+
+def convert_tsv_to_binary(tsv_fp, filepath, dtype=np.float32, checksum=True,
+                          square=False):
+    '''Convert a distance matrix from skbio's text format to the binary format.
+
+       The text file is processed row by row, i.e. the full matrix is never
+       held in memory. Unless stored as square matrix, only the upper
+       triangle of the matrix is read, i.e. the matrix is assumed to be
+       symmetric and hollow.
+
+    Parameters
+    ----------
+    tsv_fp: str
+        Distance matrix in skbio's tab-separated "lsmat" format, i.e. a
+        header line with all element IDs, followed by one line per element,
+        holding its ID and the distances to all elements.
+    filepath: str
+        File to write the binary matrix to.
+    dtype: np.dtype
+        Data type of the stored distances. Default is float32.
+    checksum: bool
+        Store a CRC32 checksum of the distances. Default is True.
+    square: bool
+        Store the square instead of the condensed form of the matrix.
+        Default is False.
+
+    Raises
+    ------
+    ValueError
+        If the text file is empty, or a row does not match the header.
+    '''
+    with open(tsv_fp, 'r') as f:
+        lines = (line.rstrip('\r\n') for line in f)
+        lines = (line for line in lines if line.strip())
+        header = next(lines, None)
+        if header is None:
+            raise ValueError("Distance matrix file '%s' is empty." % tsv_fp)
+        ids = [id_.strip() for id_ in header.split('\t')[1:]]
+
+        def _rows():
+            for idx, line in enumerate(lines):
+                fields = line.split('\t')
+                if idx >= len(ids) or fields[0].strip() != ids[idx]:
+                    raise ValueError(
+                        "Row %i of '%s' does not match the IDs of the header."
+                        % (idx + 1, tsv_fp))
+                if len(fields) != len(ids) + 1:
+                    raise ValueError(
+                        "Row %i of '%s' holds %i instead of %i distances."
+                        % (idx + 1, tsv_fp, len(fields) - 1, len(ids)))
+                yield np.asarray(fields[1:], dtype=np.float64)
+
+        _write_binary_rows(filepath, ids, _rows(), dtype, checksum, square)
+
+
+def read_binary(filepath, verify_checksum=False):
+    '''Open a distance matrix in the binary format.
+
+    Parameters
+    ----------
+    filepath: str
+        File holding the binary matrix.
+    verify_checksum: bool
+        Compare the distances against the stored checksum, which requires
+        to read the complete file once. Default is False.
+
+    Returns
+    -------
+    MemmapDistanceMatrix
+        The distance matrix, memory-mapped from filepath.
+
+    Raises
+    ------
+    ValueError
+        If the file is not in the binary format, or the checksum does not
+        match.
+    '''
+    with open(filepath, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size or not prefix.startswith(_MAGIC):
+            raise ValueError("'%s' is not a binary distance matrix."
+                             % filepath)
+        _, version, flags, crc, header_length, payload_offset = \
+            _PREFIX.unpack(prefix)
+        if version > _VERSION:
+            raise ValueError("Unsupported version %i of binary distance "
+                             "matrix '%s'." % (version, filepath))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+        if verify_checksum and (flags & _FLAG_CHECKSUM):
+            f.seek(payload_offset)
+            observed = 0
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                observed = zlib.crc32(chunk, observed)
+            if observed != crc:
+                raise ValueError("Checksum mismatch for binary distance "
+                                 "matrix '%s'." % filepath)
+
+    return MemmapDistanceMatrix(header['ids'], filepath,
+                                condensed=not (flags & _FLAG_SQUARE),
+                                dtype=np.dtype(header['dtype']),
+                                offset=payload_offset)
+
+
+def is_binary(filepath):
+    '''Test if a file holds a distance matrix in the binary format.'''
+    with open(filepath, 'rb') as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+def load_distance_matrix(filepath, backend='dense', workdir=None):
+    '''Open a distance matrix in skbio's text or in the binary format.
+
+    Parameters
+    ----------
+    filepath: str
+        File holding the distance matrix. The format is detected from the
+        content of the file.
+    backend: str
+        'dense': an skbio DistanceMatrix, held in memory as float64.
+        'compact': a CompactDistanceMatrix, held in memory as float32 or
+                   uint16.
+        'memmap': a MemmapDistanceMatrix. A text file is converted to the
+                  binary format in workdir first, as a square matrix, which
+                  is faster to read row by row.
+        Default is 'dense'.
+    workdir: str
+        Directory for the binary file a text file is converted into for the
+        'memmap' backend. Default is None.
+
+    Returns
+    -------
+    skbio.stats.distance.DistanceMatrix, CompactDistanceMatrix or
+    MemmapDistanceMatrix
+
+    Raises
+    ------
+    ValueError
+        If the backend is unknown, or a text file shall be memory-mapped
+        without a workdir.
+    '''
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '%s'. Choose from: %s."
+                         % (backend, ', '.join(BACKENDS)))
+    binary = is_binary(filepath)
+    if backend == 'memmap':
+        if not binary:
+            if workdir is None:
+                raise ValueError("Memory-mapping a text file requires a "
+                                 "'workdir' to convert it to.")
+            binary_fp = os.path.join(
+                workdir, os.path.basename(filepath) + '.bin')
+            convert_tsv_to_binary(filepath, binary_fp, square=True)
+            filepath = binary_fp
+        return read_binary(filepath)
+
+    if binary:
+        dm = read_binary(filepath)
+        if backend == 'compact':
+            return CompactDistanceMatrix.from_distance_matrix(dm)
+        return DistanceMatrix(dm.rows(slice(None)), dm.ids)
+    dm = DistanceMatrix.read(filepath)
+    if backend == 'compact':
+        return CompactDistanceMatrix.from_distance_matrix(dm)
+    return dm
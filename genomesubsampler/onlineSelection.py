@@ -0,0 +1,219 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Online prototype selection
+
+New genomes arrive continuously. Instead of recomputing the full distance
+matrix and re-running a prototype selection heuristic for the whole
+collection, OnlinePrototypeSelector keeps a prototype set and decides for
+every new genome whether swapping it in for one of the prototypes increases
+the objective function, i.e. the sum of pairwise distances of all
+prototypes. Only the distances between prototypes are kept, thus the state
+is small and can be stored between runs.
+"""
+
+import numpy as np
+from skbio.stats.distance import DissimilarityMatrixError, MissingIDError
+
+from genomesubsampler.prototypeSelection import _ids_to_indices, _entries
+
+
+class OnlinePrototypeSelector(object):
+    '''Prototype set that is updated by genomes arriving one by one.
+
+       For every prototype p, the sum s[p] of distances to all other
+       prototypes is maintained. Replacing p by a new element x with
+       distances d to the prototypes changes the objective by
+       sum(d) - d[p] - s[p], thus every new element is tested against all
+       prototypes in O(k), and the best swap is applied if it improves the
+       objective.
+
+    Parameters
+    ----------
+    ids: sequence of str
+        IDs of the initial prototypes.
+    distances: np.ndarray
+        Square matrix of distances between the initial prototypes.
+    seedset: iterable of str
+        IDs of prototypes that must never be swapped out. Default is None.
+    tol: float
+        Minimal gain of a swap to be applied. Default is 1e-10.
+
+    Raises
+    ------
+    skbio.stats.distance.DissimilarityMatrixError
+        If IDs are not unique or do not match the shape of distances.
+    ValueError
+        If the seedset is not a subset of the prototypes.
+    '''
+    def __init__(self, ids, distances, seedset=None, tol=1e-10):
+        self.ids = list(ids)
+        self.distances = np.array(distances, dtype=np.float64)
+        k = len(self.ids)
+        if self.distances.shape != (k, k):
+            raise DissimilarityMatrixError(
+                "Distances must be a %ix%i matrix, found shape %s."
+                % (k, k, self.distances.shape))
+        self._id_index = {id_: idx for idx, id_ in enumerate(self.ids)}
+        if len(self._id_index) < k:
+            raise DissimilarityMatrixError("IDs must be unique.")
+        self.fixed = np.zeros(k, dtype=bool)
+        if seedset is not None:
+            seeds = set(seedset)
+            if not seeds <= set(self.ids):
+                raise ValueError("'seedset' is not a subset of the "
+                                 "prototypes.")
+            self.fixed = np.array([p in seeds for p in self.ids], dtype=bool)
+        self.tol = tol
+        self._sums = self.distances.sum(axis=1)
+        self.objective = self._sums.sum() / 2
+
+    @classmethod
+    def from_distance_matrix(cls, dm, prototypes, seedset=None, tol=1e-10):
+        '''Initialise the selector from prototypes of a distance matrix.
+
+        Parameters
+        ----------
+        dm: skbio.stats.distance.DistanceMatrix
+            Pairwise distances for all elements, e.g. the matrix the
+            prototypes have been selected from.
+        prototypes: sequence of str
+            IDs of the initial prototypes.
+        seedset: iterable of str
+            IDs of prototypes that must never be swapped out.
+        tol: float
+            Minimal gain of a swap to be applied.
+
+        Returns
+        -------
+        OnlinePrototypeSelector
+        '''
+        indices = _ids_to_indices(prototypes, dm)
+        distances = _entries(dm, indices[:, None], indices[None, :])
+        return cls(prototypes, distances, seedset=seedset, tol=tol)
+
+    def offer(self, new_id, distances):
+        '''Test if a new element should replace one of the prototypes.
+
+        Parameters
+        ----------
+        new_id: str
+            ID of the new element.
+        distances: np.ndarray
+            Distances of the new element to the prototypes, in the order of
+            ids.
+
+        Returns
+        -------
+        str or None
+            The ID of the replaced prototype, or None if the new element is
+            not swapped in.
+        '''
+        if new_id in self._id_index:
+            raise DissimilarityMatrixError(
+                "'%s' is already a prototype." % new_id)
+        distances = np.asarray(distances, dtype=np.float64)
+        gains = distances.sum() - distances - self._sums
+        gains[self.fixed] = -1 * np.infty
+        if len(gains) == 0:
+            return None
+        pos = gains.argmax()
+        if not gains[pos] > self.tol:
+            return None
+
+        replaced = self.ids[pos]
+        self._sums += distances - self.distances[pos]
+        self._sums[pos] = distances.sum() - distances[pos]
+        self.distances[pos, :] = distances
+        self.distances[:, pos] = distances
+        self.distances[pos, pos] = 0
+        self.objective += gains[pos]
+        del self._id_index[replaced]
+        self.ids[pos] = new_id
+        self._id_index[new_id] = pos
+        return replaced
+
+    def update(self, new_ids, distances, column_ids):
+        '''Offer a batch of new elements to the prototype set.
+
+           Elements are offered in order. Each row of distances must cover
+           the prototypes at the time the element is offered. If elements of
+           the batch shall be able to replace each other, e.g. because they
+           are very distant from the existing elements, the batch IDs must be
+           included in column_ids.
+
+        Parameters
+        ----------
+        new_ids: sequence of str
+            IDs of the new elements.
+        distances: np.ndarray
+            One row of distances per new element, against column_ids.
+        column_ids: sequence of str
+            IDs of the columns of distances, e.g. all existing elements.
+
+        Returns
+        -------
+        list of (str, str)
+            The applied swaps as pairs of new and replaced prototype ID.
+
+        Raises
+        ------
+        ValueError
+            If the shape of distances does not match new_ids and column_ids.
+        skbio.stats.distance.MissingIDError
+            If a prototype is missing from column_ids.
+        '''
+        distances = np.asarray(distances)
+        if distances.shape != (len(new_ids), len(column_ids)):
+            raise ValueError(
+                "Distances must be a %ix%i matrix, found shape %s."
+                % (len(new_ids), len(column_ids), distances.shape))
+        columns = {id_: idx for idx, id_ in enumerate(column_ids)}
+        swaps = []
+        for new_id, row in zip(new_ids, distances):
+            try:
+                cols = [columns[p] for p in self.ids]
+            except KeyError as e:
+                raise MissingIDError(e.args[0])
+            replaced = self.offer(new_id, row[cols])
+            if replaced is not None:
+                swaps.append((new_id, replaced))
+        return swaps
+
+    def save(self, filepath):
+        '''Store the state of the selector in a .npz file.
+
+        Parameters
+        ----------
+        filepath: str or file-like
+            The file to write to, see np.savez.
+        '''
+        np.savez(filepath, ids=np.array(self.ids, dtype=str),
+                 distances=self.distances, fixed=self.fixed,
+                 tol=np.float64(self.tol))
+
+    @classmethod
+    def load(cls, filepath):
+        '''Restore a selector stored with save.
+
+        Parameters
+        ----------
+        filepath: str or file-like
+            The file to read from, see np.load.
+
+        Returns
+        -------
+        OnlinePrototypeSelector
+        '''
+        with np.load(filepath, allow_pickle=False) as data:
+            ids = [str(id_) for id_ in data['ids']]
+            seedset = [id_ for id_, fixed in zip(ids, data['fixed'])
+                       if fixed]
+            return cls(ids, data['distances'], seedset=seedset,
+                       tol=float(data['tol']))
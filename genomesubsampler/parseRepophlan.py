@@ -12,24 +12,249 @@
 # parser for RepoPhlAn-downloaded genomes
 #
 
+import json
+import os
+import zlib
+
 import click
+import numpy as np
 import pandas as pd
 
+# quality scores of the genomes, between 0 and 1
+SCORES = ('score_faa', 'score_fna', 'score_rrna', 'score_trna')
+
+# the columns of the RepoPhlAn table read by read_repophlan and their types.
+# Columns with few distinct values are held as categoricals.
+COLUMNS = {'assembly_accession': str,
+           'assembly_level': 'category',
+           'refseq_category': 'category',
+           'genome_rep': 'category',
+           'faa_lname': str,
+           'ffn_lname': str,
+           'fna_lname': str,
+           'frn_lname': str,
+           'score_faa': 'float64',
+           'score_fna': 'float64',
+           'score_rrna': 'float64',
+           'score_trna': 'float64',
+           'species_taxid': 'Int64',
+           'taxonomy': str}
+
+# version of the cache format, increase to invalidate existing caches
+_CACHE_VERSION = 1
+# number of bytes read at once when computing checksums
+_CHUNK_SIZE = 2 ** 24
+
+
+def _checksum(filepath):
+    """CRC32 checksum of the content of a file."""
+    crc = 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _cache_paths(repophlan_wscores_fp):
+    """Files of the cached table, in the Feather format, and its metadata.
+    """
+    return ('%s.cache.feather' % repophlan_wscores_fp,
+            '%s.cache.json' % repophlan_wscores_fp)
+
+
+def _replace(filepath, write):
+    """Atomically create filepath with write(tmp_filepath)."""
+    tmp_filepath = '%s.tmp' % filepath
+    write(tmp_filepath)
+    os.replace(tmp_filepath, filepath)
+
+
+def _write_metadata(meta_fp, meta):
+    def _write(filepath):
+        with open(filepath, 'w') as f:
+            json.dump(meta, f)
+    _replace(meta_fp, _write)
+
+
+def _load_cache(repophlan_wscores_fp, stat):
+    """Return the cached table, or None if there is no valid cache.
+
+    The cache is valid if it was created from a table with the same size and
+    either the same modification time or, e.g. for a copied table, the same
+    checksum.
+    """
+    data_fp, meta_fp = _cache_paths(repophlan_wscores_fp)
+    try:
+        with open(meta_fp, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (meta.get('version') != _CACHE_VERSION) or \
+       (meta.get('columns') != sorted(COLUMNS)) or \
+       (meta.get('size') != stat.st_size) or \
+       not os.path.exists(data_fp):
+        return None
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        if meta.get('crc32') != _checksum(repophlan_wscores_fp):
+            return None
+        # unchanged content, skip the checksum next time
+        meta['mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_metadata(meta_fp, meta)
+        except OSError:
+            pass
+    df = pd.read_feather(data_fp)
+    return df.set_index(df.columns[0])
+
+
+def _store_cache(repophlan_wscores_fp, stat, df):
+    """Cache the table next to the RepoPhlAn table, if writable."""
+    data_fp, meta_fp = _cache_paths(repophlan_wscores_fp)
+    meta = {'version': _CACHE_VERSION, 'columns': sorted(COLUMNS),
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'crc32': _checksum(repophlan_wscores_fp)}
+    try:
+        _replace(data_fp, df.reset_index().to_feather)
+        _write_metadata(meta_fp, meta)
+    except OSError:
+        pass
+
+
+def read_repophlan(repophlan_wscores_fp, cache=False):
+    """Read the RepoPhlAn summary table with scores.
+
+    Only the columns in COLUMNS are parsed, with explicit types, which is
+    faster and takes a fraction of the memory of the full table.
+
+    Parameters
+    ----------
+    repophlan_wscores_fp : str
+        File path to RepoPhlAn summary table with scores.
+    cache : bool
+        Store the parsed table in a binary file next to the table, e.g.
+        'table.txt.cache.feather', and load it from there as long as the
+        table does not change. Default is False.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per genome, indexed by genome ID, holding those columns of
+        COLUMNS that are in the table.
+    """
+    if cache:
+        stat = os.stat(repophlan_wscores_fp)
+        df = _load_cache(repophlan_wscores_fp, stat)
+        if df is not None:
+            return df
+
+    with open(repophlan_wscores_fp, 'r') as f:
+        index_col = f.readline().rstrip('\r\n').split('\t')[0]
+    dtype = dict(COLUMNS)
+    dtype[index_col] = str
+    df = pd.read_table(repophlan_wscores_fp, index_col=0, header=0,
+                       usecols=lambda col: (col == index_col) or
+                       (col in COLUMNS),
+                       dtype=dtype)
+
+    if cache:
+        _store_cache(repophlan_wscores_fp, stat, df)
+    return df
+
+
+def filter_genomes(df, min_scores=None, refseq_only=False,
+                   assembly_levels=None, one_per_species=False):
+    """Select the genomes of sufficient quality.
+
+    All filters are evaluated as vectorised predicates on the columns of
+    the table.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        RepoPhlAn summary table, see read_repophlan.
+    min_scores : dict of str: float
+        Minimal value for score columns, e.g. {'score_fna': 0.9}. Genomes
+        without a score fail. Default is None, i.e. no minimum.
+    refseq_only : bool
+        Keep RefSeq genomes only, i.e. with a 'GCF_' assembly accession.
+        Default is False.
+    assembly_levels : iterable of str
+        Keep genomes of these assembly levels only, e.g. ['Complete Genome',
+        'Chromosome']. Default is None, i.e. all levels.
+    one_per_species : bool
+        Of the genomes that pass all other filters, keep only the one with
+        the largest sum of scores per species_taxid. Ties are broken by the
+        order of df. Genomes without species_taxid are kept. Default is
+        False.
+
+    Returns
+    -------
+    pd.Index
+        IDs of the genomes that pass all filters, in the order of df.
+
+    Raises
+    ------
+    ValueError
+        If a score column is unknown.
+    """
+    passed = np.ones(df.shape[0], dtype=bool)
+    for column, minimum in (min_scores or {}).items():
+        if column not in SCORES:
+            raise ValueError("Unknown score '%s'. Choose from: %s."
+                             % (column, ', '.join(SCORES)))
+        if minimum is not None:
+            passed &= (df[column] >= minimum).to_numpy(dtype=bool)
+    if refseq_only:
+        passed &= df['assembly_accession'].str.contains(
+            'GCF_', na=False).to_numpy(dtype=bool)
+    if assembly_levels is not None:
+        passed &= df['assembly_level'].isin(list(assembly_levels)) \
+            .to_numpy(dtype=bool)
+    if one_per_species:
+        candidates = np.flatnonzero(passed)
+        quality = df[list(SCORES)].iloc[candidates].sum(axis=1).to_numpy()
+        # candidates by decreasing quality, the first of a species is kept
+        order = candidates[np.argsort(-quality, kind='stable')]
+        taxids = df['species_taxid'].iloc[order]
+        passed[order[(taxids.duplicated() & taxids.notna()).to_numpy(
+            dtype=bool)]] = False
+    return df.index[passed]
+
+
+def genome_mask(ids, genomes):
+    """Mask of the genomes in a list of IDs, e.g. of a distance matrix.
+
+    Parameters
+    ----------
+    ids : sequence of str
+        IDs, e.g. of the rows of a distance matrix.
+    genomes : iterable of str
+        IDs of the genomes to select, e.g. as returned by filter_genomes.
+
+    Returns
+    -------
+    np.ndarray of bool
+        True for every ID in genomes, in the order of ids.
+    """
+    return pd.Index(ids).isin(list(genomes))
+
 
-def parse_repophlan(repophlan_wscores_fp):
+def parse_repophlan(repophlan_wscores_fp, cache=False):
     """Compute basic statistics of RepoPhlAn-downloaded genomes.
 
     Parameters
     ----------
     repophlan_wscores_fp : str
         File path to RepoPhlAn summary table with scores.
+    cache : bool
+        Cache the parsed table, see read_repophlan. Default is False.
 
     Returns
     -------
     list of str
         Human-readable report of basic statistics of genomes.
     """
-    df = pd.read_table(repophlan_wscores_fp, index_col=0, header=0)
+    df = read_repophlan(repophlan_wscores_fp, cache)
     out = []
     out.append('Total number of genomes: %s.' % df.shape[0])
     out.append('Number of RefSeq genomes: %s.'
@@ -48,10 +273,12 @@ def parse_repophlan(repophlan_wscores_fp):
               type=click.Path(resolve_path=True, readable=True, exists=True,
                               file_okay=True),
               help='RepoPhlAn summary table with scores')
-def _main(repophlan_wscores_fp):
+@click.option('--cache-table', is_flag=True,
+              help='Cache the parsed table next to the table')
+def _main(repophlan_wscores_fp, cache_table):
     """Parser for RepoPhlAn-downloaded genomes.
     """
-    out = parse_repophlan(repophlan_wscores_fp)
+    out = parse_repophlan(repophlan_wscores_fp, cache_table)
     click.echo('\n'.join(out))
     click.echo('Task completed.')
 
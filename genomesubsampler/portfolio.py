@@ -0,0 +1,220 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Portfolio of prototype selection heuristics
+
+There is no global winner among the prototype selection heuristics, thus the
+quality of their results must be compared by the objective function for
+every problem instance. select_prototypes runs a portfolio of heuristics
+concurrently on one shared distance matrix and returns the best result.
+"""
+
+import inspect
+import threading
+import time
+
+from skbio.stats.distance import DissimilarityMatrixError
+
+from genomesubsampler.prototypeSelection import (
+    MatrixSummary,
+    _validate_parameters,
+    distance_sum,
+    prototype_selection_exhaustive,
+    prototype_selection_constructive_maxdist,
+    prototype_selection_destructive_maxdist,
+    prototype_selection_constructive_protoclass,
+    prototype_selection_constructive_pMedian)
+
+# all prototype selection algorithms, by name
+ALGORITHMS = {
+    'constructive_maxdist': prototype_selection_constructive_maxdist,
+    'destructive_maxdist': prototype_selection_destructive_maxdist,
+    'constructive_protoclass': prototype_selection_constructive_protoclass,
+    'constructive_pMedian': prototype_selection_constructive_pMedian,
+    'exhaustive': prototype_selection_exhaustive,
+}
+
+# the heuristics, which run in polynomial time
+HEURISTICS = ['constructive_maxdist', 'destructive_maxdist',
+              'constructive_protoclass', 'constructive_pMedian']
+
+# the algorithms that accept a precomputed MatrixSummary
+SUMMARY_ALGORITHMS = {'constructive_maxdist', 'destructive_maxdist',
+                      'constructive_pMedian'}
+
+
+def _run_algorithm(name, dm, num_prototypes, seedset, summary=None,
+                   time_limit=None):
+    '''Run a single algorithm and score its result.
+
+    Returns
+    -------
+    dict
+        The selected prototypes, their objective, the runtime in seconds
+        and None as error, or no prototypes and the error message if the
+        algorithm failed.
+    '''
+    start = time.time()
+    kwargs = {}
+    if (summary is not None) and (name in SUMMARY_ALGORITHMS):
+        kwargs['summary'] = summary
+    if time_limit is not None:
+        kwargs['time_limit'] = time_limit
+    try:
+        prototypes = list(ALGORITHMS[name](dm, num_prototypes,
+                                           seedset=seedset, **kwargs))
+        # raises if an algorithm selected an element twice, e.g. p-median
+        # on a degenerate matrix
+        objective = distance_sum(prototypes, dm)
+    except (RuntimeError, ValueError, DissimilarityMatrixError) as e:
+        return {'prototypes': None, 'objective': None,
+                'seconds': time.time() - start, 'error': str(e)}
+    return {'prototypes': prototypes,
+            'objective': objective,
+            'seconds': time.time() - start,
+            'error': None}
+
+
+def select_prototypes(dm, num_prototypes, algorithms=None, seedset=None,
+                      time_budget=None, max_workers=None):
+    '''Select k prototypes with the best of several algorithms.
+
+       All algorithms run concurrently on the same distance matrix, the
+       result of every algorithm is scored by the objective function, i.e.
+       the sum of pairwise distances of the selected prototypes, and the
+       result with the largest objective is returned.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    num_prototypes: int
+        Number of prototypes to select for distance matrix.
+        Must be >= 2, since a single prototype is useless.
+        Must be smaller than the number of elements in the distance matrix,
+        otherwise no reduction is necessary.
+    algorithms: iterable of str
+        Names of the algorithms to run, see ALGORITHMS. Default is None, i.e.
+        all polynomial heuristics, see HEURISTICS.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Remaining
+        prototypes are then recruited with the prototype selection algorithm.
+        Warning: It will most likely violate the global objective function.
+    time_budget: float
+        Maximal wall-clock time in seconds to wait for the algorithms.
+        Algorithms that accept a time_limit, i.e. exhaustive, get the
+        remaining budget and return their best result so far, which may
+        take one more step of their search. Other algorithms that have not
+        finished by then are reported with an error and keep running in
+        daemon threads, which do not delay the exit of the interpreter.
+        Algorithms that have not started by then are not run.
+        Default is None, i.e. wait for all algorithms.
+    max_workers: int
+        Maximal number of algorithms to run at the same time. Default is
+        None, i.e. all algorithms run at the same time.
+
+    Returns
+    -------
+    (list of str, str, dict)
+        The prototypes with the largest objective, the name of the algorithm
+        that found them and, for every algorithm, a dict holding its
+        'prototypes', their 'objective', the runtime in 'seconds' and an
+        'error' message if the algorithm failed or did not finish in time,
+        None otherwise. Ties are broken by the order of algorithms.
+
+    Raises
+    ------
+    ValueError
+        If an algorithm is unknown, or the number of prototypes or seedset
+        are invalid, see _validate_parameters.
+    RuntimeError
+        If no algorithm found prototypes.
+    '''
+    if algorithms is None:
+        algorithms = HEURISTICS
+    algorithms = list(algorithms)
+    for name in algorithms:
+        if name not in ALGORITHMS:
+            raise ValueError("Unknown algorithm '%s'. Choose from: %s."
+                             % (name, ', '.join(sorted(ALGORITHMS))))
+    # validate once, such that invalid parameters are not reported as errors
+    # of the individual algorithms
+    _validate_parameters(dm, num_prototypes, seedset)
+
+    start = time.time()
+    # the O(n^2) passes shared by several heuristics are done only once
+    summary = None
+    if len(SUMMARY_ALGORITHMS.intersection(algorithms)) > 1:
+        summary = MatrixSummary(dm)
+    deadline = None
+    if time_budget is not None:
+        deadline = start + time_budget
+    if max_workers is None:
+        max_workers = len(algorithms)
+    slots = threading.Semaphore(max(1, max_workers))
+    # the algorithms that stop at the deadline by themselves
+    limited = {name for name in algorithms if 'time_limit' in
+               inspect.signature(ALGORITHMS[name]).parameters}
+    started = set()
+    # the result or exception of every finished algorithm
+    outcomes = {}
+
+    def _worker(name):
+        with slots:
+            time_limit = None
+            if deadline is not None:
+                time_limit = deadline - time.time()
+                if time_limit <= 0:
+                    return
+                started.add(name)
+            if name not in limited:
+                time_limit = None
+            try:
+                outcomes[name] = (_run_algorithm(name, dm, num_prototypes,
+                                                 seedset, summary,
+                                                 time_limit), None)
+            except Exception as e:
+                outcomes[name] = (None, e)
+
+    # threads that exceed the budget cannot be stopped, daemon threads at
+    # least do not block the exit of the interpreter
+    threads = [threading.Thread(target=_worker, args=(name,), daemon=True)
+               for name in algorithms]
+    for thread in threads:
+        thread.start()
+    for name, thread in zip(algorithms, threads):
+        timeout = None
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
+        thread.join(timeout)
+        # algorithms started before the deadline finish their last step
+        if (name in limited) and (name in started):
+            thread.join()
+
+    results = {}
+    for name in algorithms:
+        result, error = outcomes.get(name, (None, None))
+        if error is not None:
+            raise error
+        if result is None:
+            result = {'prototypes': None, 'objective': None,
+                      'seconds': time.time() - start,
+                      'error': 'Time budget of %s seconds exceeded.'
+                               % time_budget}
+        results[name] = result
+
+    best = None
+    for name in algorithms:
+        if results[name]['error'] is None:
+            if (best is None) or \
+               (results[name]['objective'] > results[best]['objective']):
+                best = name
+    if best is None:
+        raise RuntimeError("None of the algorithms found prototypes.")
+    return results[best]['prototypes'], best, results
@@ -26,6 +26,24 @@ winner. Currently implemented are:
  - prototype_selection_constructive_pMedian
 For completeness, the exact but exponential algorithm is implemented, too.
   "prototype_selection_exhaustive"
+It is backed by a branch and bound search, which can also be run with a node
+or time budget to report the best solution found together with its optimality
+gap:
+  "prototype_selection_branch_and_bound"
+
+Selections for several k are obtained with a single run of a greedy
+heuristic by "prototype_selection_path".
+
+The O(n^2) passes that start several heuristics, e.g. finding the globally
+most distant pair, can be shared across runs on the same matrix with a
+precomputed "MatrixSummary".
+
+The greedy loops can periodically store their state in a checkpoint file and
+resume from it, see genomesubsampler.checkpoint.
+
+Instead of an skbio distance matrix, all functions also accept the adapters
+of genomesubsampler.distanceMatrix, e.g. a MemmapDistanceMatrix whose rows
+are paged in from disk on demand.
 
 [1] Gamez, J. Esteban, François Modave, and Olga Kosheleva.
     "Selecting the most representative sample is NP-hard:
@@ -35,10 +53,28 @@ For completeness, the exact but exponential algorithm is implemented, too.
 
 # needed for signature type annotations, but only works for python >= 3.5
 # from typing import Sequence, Tuple
-from itertools import combinations
+import threading
+import time
 
 import numpy as np
 import scipy as sp
+from skbio.stats.distance import DissimilarityMatrixError, MissingIDError
+from skbio.util import find_duplicates
+
+from genomesubsampler.blockedExecution import map_blocks
+from genomesubsampler.checkpoint import checkpointer as _checkpointer
+
+# number of matrix cells that are processed at once by blocked computations
+_BLOCK_ELEMENTS = 2 ** 20
+
+# maximal number of radii that the epsilon search of protoclass holds
+_MAX_RADII = 2 ** 20
+
+# fraction of neighbouring pairs above which the epsilon neighbourhood of
+# protoclass is held as a boolean matrix instead of a sparse index. The
+# boolean matrix is faster to update, and above this density needs at most
+# five times the memory of the sparse index with 4 byte column indices.
+_DENSE_NEIGHBOURHOOD = 0.05
 
 
 def _validate_parameters(dm, num_prototypes, seedset=None):
@@ -58,6 +94,12 @@ def _validate_parameters(dm, num_prototypes, seedset=None):
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
 
+    Returns
+    -------
+    np.ndarray of int or None
+        The row indices of the seeds, in the order of the seedset, or None if
+        no seedset is given. See _seed_indices.
+
     Raises
     ------
     ValueError
@@ -76,16 +118,242 @@ def _validate_parameters(dm, num_prototypes, seedset=None):
         raise ValueError("'num_prototypes' must be smaller than the number of "
                          "elements in the distance matrix, otherwise no "
                          "reduction is necessary.")
-    if seedset is not None:
-        seeds = set(seedset)
-        if len(seeds) < len(seedset):
-            raise ValueError("There are duplicated IDs in 'seedset'.")
-        if not seeds < set(dm.ids):  # test if set A is a subset of set B
-            raise ValueError("'seedset' is not a subset of the element IDs in "
-                             "the distance matrix.")
-        if len(seeds) >= num_prototypes:
-            raise ValueError("Size of 'seedset' must be smaller than the "
-                             "number of prototypes to select.")
+    if seedset is None:
+        return None
+    seeds = _seed_indices(dm, seedset)
+    if len(np.unique(seeds)) < len(seeds):
+        raise ValueError("There are duplicated IDs in 'seedset'.")
+    if len(seeds) >= num_prototypes:
+        raise ValueError("Size of 'seedset' must be smaller than the "
+                         "number of prototypes to select.")
+    return seeds
+
+
+def _seed_indices(dm, seedset):
+    '''Resolve the IDs of a seedset to their row indices.
+
+       Every ID is looked up in the ID -> index table of the distance matrix,
+       i.e. resolving s seeds costs O(s), independent of the number of
+       elements in the distance matrix.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    seedset: iterable of str
+        IDs of the seeds.
+
+    Returns
+    -------
+    np.ndarray of int
+        The row index of every seed, in the order of the seedset.
+
+    Raises
+    ------
+    ValueError
+        If a seed is not in the distance matrix.
+    '''
+    seedset = list(seedset)
+    try:
+        return np.fromiter((dm.index(e) for e in seedset), dtype=np.intp,
+                           count=len(seedset))
+    except MissingIDError:
+        raise ValueError("'seedset' is not a subset of the element IDs in "
+                         "the distance matrix.")
+
+
+def _rows(dm, indices):
+    '''Return the distance rows of the given elements.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    indices: slice or sequence of int
+        Row indices of the elements.
+
+    Returns
+    -------
+    np.ndarray
+        A two dimensional array with one row per element.
+
+    Notes
+    -----
+    Matrix adapters, e.g. genomesubsampler.distanceMatrix.
+    MemmapDistanceMatrix, provide a rows() method which only pages in the
+    requested rows. skbio's DistanceMatrix holds its data in memory.
+    '''
+    rows = getattr(dm, 'rows', None)
+    if rows is None:
+        return dm.data[indices]
+    return rows(indices)
+
+
+def _entries(dm, rows, cols):
+    '''Return the distances between elements rows[i] and cols[i].
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    rows, cols: np.ndarray of int
+        Row and column indices, broadcast against each other.
+
+    Returns
+    -------
+    np.ndarray
+        The distances, in the broadcast shape of rows and cols.
+    '''
+    entries = getattr(dm, 'entries', None)
+    if entries is None:
+        return dm.data[rows, cols]
+    return entries(rows, cols)
+
+
+def _map_row_blocks(func, dm, n_jobs=1, block_size=None):
+    '''Apply a function to all blocks of consecutive rows of the matrix.
+
+    Parameters
+    ----------
+    func: callable
+        Called as func(start, stop, block) for every block of rows, where
+        start and stop are the index of the first and one past the last row
+        of the block.
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    block_size: int
+        Number of rows per block. Defaults to a size that keeps a block at
+        roughly _BLOCK_ELEMENTS values.
+
+    Returns
+    -------
+    list
+        The results of func, in the order of the blocks.
+    '''
+    n = dm.shape[0]
+    if block_size is None:
+        block_size = max(1, _BLOCK_ELEMENTS // n)
+    return map_blocks(
+        lambda start, stop: func(start, stop, _rows(dm, slice(start, stop))),
+        n, block_size, n_jobs)
+
+
+def _row_sums(dm, n_jobs=1):
+    '''Sum of distances of every element to all other elements.'''
+    sums = _map_row_blocks(
+        lambda start, stop, block: block.sum(axis=1, dtype=np.float64),
+        dm, n_jobs)
+    return np.concatenate(sums)
+
+
+class MatrixSummary(object):
+    '''Per-row statistics of a distance matrix, computed in a single pass.
+
+       Several heuristics start with an O(n^2) pass over the distance matrix,
+       e.g. to find the globally most distant pair or the row sums. A summary
+       computed once can be passed to all heuristics via their summary
+       parameter, such that repeated runs on the same matrix, e.g. for
+       different k, skip these passes.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+
+    Attributes
+    ----------
+    shape: (int, int)
+        The dimensions of the summarized matrix.
+    row_max: np.ndarray
+        For each element, the largest distance to any other element.
+    row_argmax: np.ndarray of int
+        For each element, the index of the first element with the largest
+        distance.
+    row_sums: np.ndarray
+        For each element, the sum of distances to all other elements, in
+        float64.
+    max_pair: (int, int)
+        Row and column index of the first maximal cell, in row-major order.
+    '''
+    def __init__(self, dm, n_jobs=1):
+        def _block_summary(start, stop, block):
+            return (block.max(axis=1), block.argmax(axis=1),
+                    block.sum(axis=1, dtype=np.float64))
+
+        blocks = _map_row_blocks(_block_summary, dm, n_jobs)
+        self.shape = dm.shape
+        self.row_max = np.concatenate([b[0] for b in blocks])
+        self.row_argmax = np.concatenate([b[1] for b in blocks])
+        self.row_sums = np.concatenate([b[2] for b in blocks])
+        row = int(self.row_max.argmax())
+        self.max_pair = (row, int(self.row_argmax[row]))
+
+
+def _summary(dm, summary, n_jobs=1):
+    '''Return the given matrix summary or compute it.
+
+    Raises
+    ------
+    ValueError
+        If the summary does not match the shape of the distance matrix.
+    '''
+    if summary is None:
+        return MatrixSummary(dm, n_jobs)
+    if tuple(summary.shape) != tuple(dm.shape):
+        raise ValueError("The summary of a %ix%i matrix does not match the "
+                         "%ix%i distance matrix."
+                         % (tuple(summary.shape) + tuple(dm.shape)))
+    return summary
+
+
+def _seed_checkpointer(checkpoint, algorithm, dm, seeds, interval, resume,
+                       **params):
+    '''Checkpointer for a greedy loop whose state depends on the seeds and
+       further params, or None if no checkpoint file is given.'''
+    if seeds is None:
+        # -1 is no valid index, i.e. distinguishes "no seedset" from others
+        seeds = np.array([-1], dtype=np.intp)
+    params['seeds'] = seeds
+    return _checkpointer(checkpoint, algorithm, dm, interval, resume, params)
+
+
+def _ids_to_indices(elements, dm):
+    '''Resolve element IDs to their row indices in the distance matrix.
+
+    Parameters
+    ----------
+    elements: sequence of str
+        List of element IDs.
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distance matrix.
+
+    Returns
+    -------
+    np.ndarray of int
+        The row index of every element.
+
+    Raises
+    ------
+    skbio.stats.distance.MissingIDError
+        If an ID is not in the distance matrix.
+    skbio.stats.distance.DissimilarityMatrixError
+        If no element is given or the IDs are not unique.
+    '''
+    elements = list(elements)
+    if len(elements) == 0:
+        raise DissimilarityMatrixError("Data must be at least 1x1 in size.")
+    # dm.index uses a pre-built ID -> index lookup table
+    indices = np.fromiter((dm.index(e) for e in elements), dtype=np.intp,
+                          count=len(elements))
+    if len(np.unique(indices)) < len(indices):
+        raise DissimilarityMatrixError(
+            "IDs must be unique. Found the following duplicate IDs: %s"
+            % ', '.join(repr(e) for e in sorted(find_duplicates(elements))))
+    return indices
 
 
 def distance_sum(elements, dm):
@@ -104,16 +372,132 @@ def distance_sum(elements, dm):
     float:
         The sum of all pairwise distances of dm for IDs in elements.
 
+    Raises
+    ------
+    skbio.stats.distance.MissingIDError
+        If an ID is not in the distance matrix.
+    skbio.stats.distance.DissimilarityMatrixError
+        If no element is given or the IDs are not unique.
+
     Notes
     -----
     function signature with type annotation for future use with python >= 3.5
     def distance_sum(elements: Sequence[str], dm: DistanceMatrix) -> float:
     '''
-    return np.tril(dm.filter(elements).data).sum()
+    indices = _ids_to_indices(elements, dm)
+    # the sub-matrix counts every pair twice
+    total = 0.0
+    for _, block in _sub_matrix_blocks(dm, indices):
+        total += block.sum(dtype=np.float64)
+    return total / 2
+
+
+def _sub_matrix_blocks(dm, indices):
+    '''Blocks of rows of the sub-matrix of the given elements.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    indices: np.ndarray of int
+        Indices of the elements, which may repeat.
+
+    Yields
+    ------
+    (int, np.ndarray)
+        The position of the first row of the block in indices, and the
+        distances of its elements to all elements of indices.
+    '''
+    if getattr(dm, 'rows', None) is None:
+        block_size = max(1, _BLOCK_ELEMENTS // len(indices))
+
+        def _block(rows):
+            return dm.data[np.ix_(rows, indices)]
+    else:
+        # adapters read complete rows
+        block_size = max(1, _BLOCK_ELEMENTS // dm.shape[0])
+
+        def _block(rows):
+            return _rows(dm, rows)[:, indices]
+    for start in range(0, len(indices), block_size):
+        yield start, _block(indices[start:start + block_size])
+
+
+def _prefix_distance_sums(dm, order):
+    '''Sums of pairwise distances of all prefixes of a selection order.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    order: sequence of int
+        Indices of the selected elements. Unlike distance_sum, elements may
+        repeat, as p-median does on degenerate matrices.
+
+    Returns
+    -------
+    np.ndarray of float
+        For every k, at position k-1, the sum of pairwise distances of the
+        first k elements of order.
+    '''
+    order = np.asarray(order, dtype=np.intp)
+    gains = np.empty(len(order), dtype=np.float64)
+    for start, block in _sub_matrix_blocks(dm, order):
+        # each element adds its distances to the elements before it
+        positions = start + np.arange(len(block))
+        before = np.arange(block.shape[1])[None, :] < positions[:, None]
+        gains[positions] = np.where(before, block, 0).sum(axis=1,
+                                                          dtype=np.float64)
+    return np.cumsum(gains)
+
+
+def distance_sums(subsets, dm):
+    '''Compute the sum of pairwise distances for many subsets of elements.
+
+    Parameters
+    ----------
+    subsets: iterable of sequences of str
+        Subsets of element IDs for which the sum of distances is computed.
+        Subsets of identical size are scored together in vectorized blocks.
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distance matrix.
+
+    Returns
+    -------
+    np.ndarray of float
+        For each subset, the sum of all pairwise distances of its elements,
+        i.e. the result of distance_sum for each subset.
+
+    Raises
+    ------
+    skbio.stats.distance.MissingIDError
+        If an ID is not in the distance matrix.
+    skbio.stats.distance.DissimilarityMatrixError
+        If a subset holds no element or its IDs are not unique.
+    '''
+    subsets = [_ids_to_indices(subset, dm) for subset in subsets]
+    sums = np.empty(len(subsets), dtype=np.float64)
+
+    # group subsets by size, such that each group can be stacked into an
+    # array of shape (number of subsets, size)
+    groups = {}
+    for pos, indices in enumerate(subsets):
+        groups.setdefault(len(indices), []).append(pos)
+    for size, positions in groups.items():
+        rows, cols = np.triu_indices(size, 1)
+        block_size = max(1, _BLOCK_ELEMENTS // max(1, len(rows)))
+        for start in range(0, len(positions), block_size):
+            block = positions[start:start + block_size]
+            indices = np.stack([subsets[pos] for pos in block])
+            sums[block] = _entries(dm, indices[:, rows],
+                                   indices[:, cols]).sum(axis=1,
+                                                         dtype=np.float64)
+    return sums
 
 
 def prototype_selection_exhaustive(dm, num_prototypes, seedset=None,
-                                   max_combinations_to_test=200000):
+                                   max_combinations_to_test=None,
+                                   max_nodes=None, time_limit=None):
     '''Select k prototypes for given distance matrix
 
     Parameters
@@ -131,13 +515,21 @@ def prototype_selection_exhaustive(dm, num_prototypes, seedset=None,
         Warning: It will most likely violate the global objective function.
     max_combinations_to_test: int
         The maximal number of combinations to test. If exceeding, the function
-        declines execution.
+        declines execution. Default is None, i.e. no limit.
+    max_nodes: int
+        Maximal number of search nodes to expand. Default is None, i.e. no
+        limit.
+    time_limit: float
+        Maximal wall-clock time for the search in seconds. Default is None,
+        i.e. no limit.
 
     Returns
     -------
     list of str
         A sequence holding selected prototypes, i.e. a sub-set of the
-        IDs of the elements in the distance matrix.
+        IDs of the elements in the distance matrix. If the search is stopped
+        by max_nodes or time_limit, the best prototypes found so far, which
+        are at least as good as those of the maxdist heuristics.
 
     Raises
     ------
@@ -154,50 +546,78 @@ def prototype_selection_exhaustive(dm, num_prototypes, seedset=None,
     Notes
     -----
     This is the reference implementation for an exact algorithm for the
-    prototype selection problem. It has an exponential runtime and will only
-    operate on small instances (< max_combinations_to_test).
-    Idea: test all (n over k) combinations of selecting k elements from n with-
-          out replacement. Compute the objective for each such combination and
-          report the combination with maximal value.
+    prototype selection problem. It has an exponential runtime in the worst
+    case, but the search is pruned with the bounds described in
+    prototype_selection_branch_and_bound.
 
     function signature with type annotation for future use with python >= 3.5:
     def prototype_selection_exhaustive(dm: DistanceMatrix, num_prototypes: int,
-    max_combinations_to_test: int=200000) -> List[str]:
+    max_combinations_to_test: int=None, max_nodes: int=None,
+    time_limit: float=None) -> List[str]:
     '''
     _validate_parameters(dm, num_prototypes, seedset)
 
-    ids = set(dm.ids)
-    if seedset is not None:
-        ids = ids - set(seedset)
-        num_prototypes = num_prototypes - len(seedset)
-        seedset = tuple(seedset)
-    else:
-        seedset = ()
-    num_combinations = sp.special.binom(len(ids), num_prototypes)
-    if num_combinations >= max_combinations_to_test:
-        raise RuntimeError(("Cowardly refuse to test %i combinations. Use a "
-                            "heuristic implementation for instances with more "
-                            "than %i combinations instead!")
-                           % (num_combinations, max_combinations_to_test))
-
-    max_dist, max_set = -1 * np.infty, None
-    for s in set(combinations(ids, num_prototypes)):
-        d = distance_sum(s + seedset, dm)
-        if d > max_dist:
-            max_dist, max_set = d, s
-    return list(seedset + max_set)
-
-
-def prototype_selection_constructive_maxdist(dm, num_prototypes, seedset=None):
-    '''Heuristically select k prototypes for given distance matrix.
+    if max_combinations_to_test is not None:
+        num_seeds = 0 if seedset is None else len(seedset)
+        num_combinations = sp.special.binom(dm.shape[0] - num_seeds,
+                                            num_prototypes - num_seeds)
+        if num_combinations >= max_combinations_to_test:
+            raise RuntimeError(("Cowardly refuse to test %i combinations. Use "
+                                "a heuristic implementation for instances "
+                                "with more than %i combinations instead!")
+                               % (num_combinations, max_combinations_to_test))
 
-       Prototype selection is NP-hard. This is an implementation of a greedy
-       correctness heuristic: Greedily grow the set of prototypes by adding the
-       element with the largest sum of distances to the non-prototype elements.
-       Start with the two elements that are globally most distant from each
-       other. The set of prototypes is then constructively grown by adding the
-       element showing largest sum of distances to all non-prototype elements
-       in the distance matrix in each iteration.
+    prototypes, _, _ = prototype_selection_branch_and_bound(
+        dm, num_prototypes, seedset, max_nodes=max_nodes,
+        time_limit=time_limit)
+    return prototypes
+
+
+def _branch_and_bound_node(dm, candidates, partial, num_missing):
+    '''Order the candidates of a search node by their optimistic gain.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    candidates: np.ndarray
+        Indices of the elements that might still be added to the prototypes.
+    partial: np.ndarray
+        For each element, the sum of distances to the current prototypes.
+    num_missing: int
+        Number of prototypes that still need to be added.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        The candidates, sorted by decreasing optimistic gain, and the
+        respective gains. Adding candidate j increases the objective by
+        partial[j] plus half of the distances to the other added candidates,
+        which is bound by half of the num_missing-1 largest distances of j to
+        any other candidate.
+    '''
+    gains = partial[candidates]
+    if num_missing > 1:
+        sub = _entries(dm, candidates[:, None], candidates[None, :])
+        kth = len(candidates) - num_missing + 1
+        gains = gains + np.partition(sub, kth, axis=1)[:, kth:].sum(axis=1) / 2
+    order = np.argsort(-gains, kind='stable')
+    return candidates[order], gains[order]
+
+
+def prototype_selection_branch_and_bound(dm, num_prototypes, seedset=None,
+                                         max_nodes=None, time_limit=None):
+    '''Select k prototypes for given distance matrix with a certified gap.
+
+       Depth first branch and bound search over all subsets of k elements.
+       The incumbent, i.e. the best solution so far, is initialized with the
+       results of the greedy heuristics constructive_maxdist and
+       destructive_maxdist. Every search node, i.e. a partial set of
+       prototypes, is bound by its objective plus the sum of the largest
+       optimistic gains of its candidates (see _branch_and_bound_node).
+       Candidates are branched on in the order of decreasing optimistic gain,
+       such that promising subsets are visited first. Nodes whose bound does
+       not exceed the incumbent are pruned.
 
     Parameters
     ----------
@@ -212,12 +632,22 @@ def prototype_selection_constructive_maxdist(dm, num_prototypes, seedset=None):
         A set of element IDs that are pre-selected as prototypes. Remaining
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
+    max_nodes: int
+        Maximal number of search nodes to expand. Default is None, i.e. no
+        limit.
+    time_limit: float
+        Maximal wall-clock time for the search in seconds. Default is None,
+        i.e. no limit.
 
     Returns
     -------
-    list of str
-        A sequence holding selected prototypes, i.e. a sub-set of the
-        IDs of the elements in the distance matrix.
+    (list of str, float, float)
+        A sequence holding selected prototypes, i.e. a sub-set of the IDs of
+        the elements in the distance matrix, the objective of this sub-set and
+        its optimality gap, i.e. the difference between an upper bound of the
+        optimal objective and the objective of the returned sub-set. A gap of
+        0 certifies that the returned prototypes are optimal, which is always
+        the case if the search is not stopped by max_nodes or time_limit.
 
     Raises
     ------
@@ -228,50 +658,411 @@ def prototype_selection_constructive_maxdist(dm, num_prototypes, seedset=None):
 
     Notes
     -----
-    Timing: %timeit -n 100 prototype_selection_constructive_maxdist(dm, 100)
-            100 loops, best of 3: 1.43 s per loop
-            where the dm holds 27,398 elements
     function signature with type annotation for future use with python >= 3.5:
-    def prototype_selection_constructive_maxdist(dm: DistanceMatrix,
-    num_prototypes: int, seedset: List[str]) -> List[str]:
+    def prototype_selection_branch_and_bound(dm: DistanceMatrix,
+    num_prototypes: int, seedset: List[str], max_nodes: int,
+    time_limit: float) -> Tuple[List[str], float, float]:
     '''
-    _validate_parameters(dm, num_prototypes, seedset)
+    seed_indices = _validate_parameters(dm, num_prototypes, seedset)
+    start_time = time.time()
 
+    seeds = []
+    if seed_indices is not None:
+        seeds = sorted(seed_indices.tolist())
+    num_missing = num_prototypes - len(seeds)
+
+    # the greedy heuristics provide good initial incumbents, which lets us
+    # prune large parts of the search space right away.
+    best_value, best_set = -1 * np.infty, None
+    summary = MatrixSummary(dm)
+    for heuristic in (prototype_selection_constructive_maxdist,
+                      prototype_selection_destructive_maxdist):
+        selection = _ids_to_indices(
+            heuristic(dm, num_prototypes, seedset, summary=summary), dm)
+        value = _entries(dm, selection[:, None],
+                         selection[None, :]).sum(dtype=np.float64) / 2
+        if value > best_value:
+            best_value, best_set = value, list(selection)
+
+    is_seed = np.zeros(dm.shape[0], dtype=bool)
+    is_seed[seeds] = True
+    partial = _rows(dm, seeds).sum(axis=0, dtype=np.float64)
+    candidates, gains = _branch_and_bound_node(
+        dm, np.flatnonzero(~is_seed), partial, num_missing)
+
+    # a stack of the open search nodes. Each node holds the selected non-seed
+    # prototypes, their objective, the distance sums to all prototypes, the
+    # ordered candidates with their optimistic gains and the position of the
+    # next candidate to branch on.
+    seeds_arr = np.asarray(seeds, dtype=np.intp)
+    value = _entries(dm, seeds_arr[:, None],
+                     seeds_arr[None, :]).sum(dtype=np.float64) / 2
+    stack = [[[], value, partial, candidates, gains, 0]]
+    num_nodes = 0
+    while stack:
+        node = stack[-1]
+        chosen, value, partial, candidates, gains, pos = node
+        missing = num_missing - len(chosen)
+        if (len(candidates) - pos < missing) or \
+           (value + gains[pos:pos + missing].sum() <= best_value):
+            stack.pop()
+            continue
+        if ((max_nodes is not None) and (num_nodes >= max_nodes)) or \
+           ((time_limit is not None) and
+                (time.time() - start_time >= time_limit)):
+            break
+
+        # branch on the next candidate, the node itself continues with all
+        # remaining candidates, excluding this one.
+        idx = candidates[pos]
+        node[5] += 1
+        num_nodes += 1
+        if missing == 1:
+            if value + partial[idx] > best_value:
+                best_value = value + partial[idx]
+                best_set = seeds + chosen + [idx]
+            continue
+        child_partial = partial + _rows(dm, [idx])[0]
+        child_candidates, child_gains = _branch_and_bound_node(
+            dm, candidates[pos + 1:], child_partial, missing - 1)
+        stack.append([chosen + [idx], value + partial[idx], child_partial,
+                      child_candidates, child_gains, 0])
+
+    # the optimum is either the incumbent or within one of the open nodes
+    upper_bound = best_value
+    for chosen, value, partial, candidates, gains, pos in stack:
+        missing = num_missing - len(chosen)
+        if len(candidates) - pos >= missing:
+            upper_bound = max(upper_bound,
+                              value + gains[pos:pos + missing].sum())
+
+    return ([dm.ids[idx] for idx in sorted(best_set)], best_value,
+            upper_bound - best_value)
+
+
+def _argmax_pair(dm, n_jobs=1):
+    '''Find the pair of elements with the globally largest distance.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+
+    Returns
+    -------
+    (int, int)
+        Row and column index of the first maximal cell, in row-major order.
+    '''
+    def _block_max(start, stop, block):
+        idx = block.argmax()
+        row, col = np.unravel_index(idx, block.shape)
+        return block.flat[idx], (start + row, col)
+
+    max_val, max_pair = -1 * np.infty, None
+    for val, pair in _map_row_blocks(_block_max, dm, n_jobs):
+        # strictly larger, to report the first occurrence
+        if val > max_val:
+            max_val, max_pair = val, pair
+    return max_pair
+
+
+def _constructive_maxdist_order(dm, num_prototypes, seeds=None, n_jobs=1,
+                                summary=None, checkpointer=None):
+    '''Order in which constructive maxdist selects prototypes.
+
+       The greedy selection does not depend on the number of prototypes, i.e.
+       the first k elements of the order are the prototypes for every k.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    num_prototypes: int
+        Number of prototypes to select.
+    seeds: np.ndarray of int
+        Row indices of pre-selected prototypes. Default is None.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm. Default is None.
+    checkpointer: checkpoint.Checkpointer
+        Stores the state of the loop and provides the state to resume from.
+        Default is None, i.e. no checkpoints.
+
+    Returns
+    -------
+    list of int
+        Row indices of the prototypes, in the order of selection, starting
+        with the sorted seeds or the globally most distant pair.
+    '''
     # initially mark all elements as uncovered, i.e. as not being a prototype
-    uncovered = np.asarray([np.True_] * dm.shape[0])
+    uncovered = np.ones(dm.shape[0], dtype=bool)
     res_set, num_found_prototypes = [], 0
 
-    if seedset is not None:
-        # mark elements in the seedset as found
-        seedset = set(seedset)
-        for idx, id_ in enumerate(dm.ids):
-            if id_ in seedset:
-                uncovered[idx] = np.False_
-                res_set.append(idx)
+    state = None if checkpointer is None else checkpointer.load()
+    if state is not None:
+        # continue with the prototypes and distance sums of the checkpoint.
+        # Selection does not depend on num_prototypes, i.e. a checkpoint with
+        # more prototypes holds the result.
+        res_set = state['order'].tolist()
+        if len(res_set) >= num_prototypes:
+            return res_set[:num_prototypes]
+        uncovered[res_set] = np.False_
+    elif seeds is not None:
+        # mark elements in the seedset as found. Seeds are sorted, such that
+        # distance sums are accumulated in the order of the matrix rows.
+        res_set = sorted(seeds.tolist())
+        uncovered[res_set] = np.False_
     else:
         # the first two prototypes are those elements that have the globally
         # maximal distance in the distance matrix. Mark those two elements as
         # being covered, i.e. prototypes
-        res_set = list(np.unravel_index(dm.data.argmax(), dm.data.shape))
+        if summary is None:
+            res_set = list(_argmax_pair(dm, n_jobs))
+        else:
+            res_set = list(_summary(dm, summary).max_pair)
+        if res_set[0] == res_set[1]:
+            # all distances are zero, i.e. the maximum is on the diagonal
+            res_set = res_set[:1]
         uncovered[res_set] = np.False_
 
     # counts the number of already found prototypes
     num_found_prototypes = len(res_set)
 
+    # for each element, the sum of distances to all prototypes found so far.
+    # It is updated with the row of each new prototype, instead of summing
+    # up the rows of all prototypes in every iteration.
+    # Note: a lazy-greedy priority queue does not apply here, since sums only
+    # grow with new prototypes, i.e. outdated sums are no upper bounds.
+    if state is not None:
+        dist_sums = state['dist_sums']
+    else:
+        dist_sums = _rows(dm, res_set).sum(axis=0, dtype=np.float64)
+
     # repeat until enough prototypes have been selected:
     # the new prototype is the element that has maximal distance sum to all
     # non-prototype elements in the distance matrix.
     while num_found_prototypes < num_prototypes:
-        max_elm_idx = (dm.data[res_set, :].sum(axis=0) * uncovered).argmax()
+        max_elm_idx = int(np.where(uncovered, dist_sums,
+                                   -1 * np.infty).argmax())
         uncovered[max_elm_idx] = np.False_
         num_found_prototypes += 1
         res_set.append(max_elm_idx)
+        dist_sums += _rows(dm, [max_elm_idx])[0]
+        if checkpointer is not None:
+            checkpointer.update(order=np.asarray(res_set),
+                                dist_sums=dist_sums)
+
+    if checkpointer is not None:
+        checkpointer.save(order=np.asarray(res_set), dist_sums=dist_sums)
+    return res_set
+
+
+def prototype_selection_constructive_maxdist(dm, num_prototypes, seedset=None,
+                                             n_jobs=1, summary=None,
+                                             checkpoint=None, resume=False,
+                                             checkpoint_interval=60.0):
+    '''Heuristically select k prototypes for given distance matrix.
 
+       Prototype selection is NP-hard. This is an implementation of a greedy
+       correctness heuristic: Greedily grow the set of prototypes by adding the
+       element with the largest sum of distances to the non-prototype elements.
+       Start with the two elements that are globally most distant from each
+       other. The set of prototypes is then constructively grown by adding the
+       element showing largest sum of distances to all non-prototype elements
+       in the distance matrix in each iteration.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    num_prototypes: int
+        Number of prototypes to select for distance matrix.
+        Must be >= 2, since a single prototype is useless.
+        Must be smaller than the number of elements in the distance matrix,
+        otherwise no reduction is necessary.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Remaining
+        prototypes are then recruited with the prototype selection algorithm.
+        Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm, whose most distant pair is used instead of
+        scanning the full matrix. Default is None.
+
+    checkpoint: str
+        File to periodically store the state of the selection in. Default is
+        None, i.e. no checkpoints.
+    resume: bool
+        Continue from the state stored in checkpoint, if the file exists.
+        The result is identical to an uninterrupted run. Default is False.
+    checkpoint_interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
+
+    Returns
+    -------
+    list of str
+        A sequence holding selected prototypes, i.e. a sub-set of the
+        IDs of the elements in the distance matrix.
+
+    Raises
+    ------
+    ValueError
+        The number of prototypes to be found should be at least 2 and at most
+        one element smaller than elements in the distance matrix. Otherwise, a
+        ValueError is raised.
+        If the summary does not match the distance matrix.
+
+    Notes
+    -----
+    Timing: %timeit -n 100 prototype_selection_constructive_maxdist(dm, 100)
+            100 loops, best of 3: 1.43 s per loop
+            where the dm holds 27,398 elements
+            (measured before distance sums were updated incrementally, which
+            reduced the work per iteration from O(k * n) to O(n))
+    function signature with type annotation for future use with python >= 3.5:
+    def prototype_selection_constructive_maxdist(dm: DistanceMatrix,
+    num_prototypes: int, seedset: List[str]) -> List[str]:
+    '''
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    order = _constructive_maxdist_order(
+        dm, num_prototypes, seeds, n_jobs, summary,
+        _seed_checkpointer(checkpoint, 'constructive_maxdist', dm, seeds,
+                           checkpoint_interval, resume))
     # return the ids of the selected prototype elements
-    return [dm.ids[idx] for idx, x in enumerate(uncovered) if not x]
+    return [dm.ids[idx] for idx in sorted(order)]
+
+
+def _neighbourhood_blocks(dm, epsilon, n_jobs=1, dense=True):
+    '''Blocks of rows of the epsilon neighbourhood, each in its cheaper
+       format.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    epsilon: float
+        Radius of the neighbourhood.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    dense: bool
+        Keep blocks whose density exceeds _DENSE_NEIGHBOURHOOD as boolean
+        masks. Default is True.
 
+    Returns
+    -------
+    list of (int, np.ndarray, np.ndarray)
+        For each block of rows: the index of its first row, the number of
+        neighbours of each row, and either the boolean mask of the block,
+        if it is dense, or the column indices of the neighbours, row by row
+        in ascending order.
+    '''
+    n = dm.shape[0]
+    index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+    def _block_neighbourhood(start, stop, block):
+        mask = block < epsilon
+        counts = mask.sum(axis=1)
+        if dense and (counts.sum() > _DENSE_NEIGHBOURHOOD * mask.size):
+            return start, counts, mask
+        return start, counts, np.nonzero(mask)[1].astype(index_dtype)
+
+    return _map_row_blocks(_block_neighbourhood, dm, n_jobs)
+
+
+def _epsilon_neighbourhood(dm, epsilon, n_jobs=1, blocks=None):
+    '''Index of all pairs of elements whose distance is below epsilon.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    epsilon: float
+        Radius of the neighbourhood.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    blocks: list
+        The neighbourhood as returned by _neighbourhood_blocks. Default is
+        None, i.e. it is computed.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        The neighbourhood graph in compressed sparse row (CSR) format: the
+        neighbours of element i are indices[indptr[i]:indptr[i+1]], in
+        ascending order. Memory is linear in the number of neighbouring pairs
+        instead of quadratic in the number of elements.
+    '''
+    n = dm.shape[0]
+    index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    if blocks is None:
+        blocks = _neighbourhood_blocks(dm, epsilon, n_jobs, dense=False)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.concatenate([counts for _, counts, _ in blocks]),
+              out=indptr[1:])
+    indices = [np.empty(0, dtype=index_dtype)]
+    for _, _, cols in blocks:
+        if cols.dtype == bool:
+            cols = np.nonzero(cols)[1].astype(index_dtype)
+        indices.append(cols)
+    return indptr, np.concatenate(indices)
+
+
+def _dense_neighbourhood(n, blocks):
+    '''Boolean matrix of the epsilon neighbourhood.
+
+    Parameters
+    ----------
+    n: int
+        Number of elements.
+    blocks: list
+        The neighbourhood as returned by _neighbourhood_blocks.
+
+    Returns
+    -------
+    np.ndarray of bool
+        The n x n matrix, whose cell i, j is True if the distance between
+        elements i and j is below epsilon.
+    '''
+    B = np.zeros((n, n), dtype=bool)
+    for start, counts, cols in blocks:
+        if cols.dtype == bool:
+            B[start:start + len(counts)] = cols
+        else:
+            B[np.repeat(np.arange(start, start + len(counts)), counts),
+              cols] = True
+    return B
+
+
+def _neighbours(indptr, indices, elements):
+    '''Concatenated neighbours of the given elements in a CSR index.
 
-def _protoclass(dm, epsilon, seedset=None):
+    Parameters
+    ----------
+    indptr, indices: np.ndarray
+        Neighbourhood graph, as returned by _epsilon_neighbourhood.
+    elements: np.ndarray of int
+        Elements whose neighbours are collected.
+
+    Returns
+    -------
+    np.ndarray
+        The neighbours of all elements, with repetitions.
+    '''
+    starts = indptr[elements]
+    counts = indptr[elements + 1] - starts
+    # position of the first neighbour of each element in the result
+    firsts = np.cumsum(counts) - counts
+    offsets = np.repeat(starts - firsts, counts) + np.arange(counts.sum())
+    return indices[offsets]
+
+
+def _protoclass(dm, epsilon, seedset=None, n_jobs=1):
     '''Heuristically select n prototypes for a fixed epsilon radius.
 
        A ball is drawn around every element in the distance matrix with radius
@@ -293,6 +1084,9 @@ def _protoclass(dm, epsilon, seedset=None):
         A set of element IDs that are pre-selected as prototypes. Remaining
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
 
     Returns
     -------
@@ -310,52 +1104,176 @@ def _protoclass(dm, epsilon, seedset=None):
         The Annals of Applied Statistics (2011): 2403-2424.
     '''
 
-    # is an element (column) covered by the epsilon ball of another element
-    # (row)
-    B = dm.data < epsilon
+    # for every element, the elements covered by its epsilon ball. Since
+    # distances are symmetric, those are also the elements whose balls cover
+    # it. Small radii are indexed sparsely, large radii, whose balls cover a
+    # large fraction of the matrix, as a boolean matrix.
+    blocks = _neighbourhood_blocks(dm, epsilon, n_jobs)
+    # score is the number of other elements that falls within the epsilon ball
+    scores = np.concatenate([counts for _, counts, _ in blocks])
+    if scores.sum() > _DENSE_NEIGHBOURHOOD * dm.shape[0] ** 2:
+        B = _dense_neighbourhood(dm.shape[0], blocks)
+    else:
+        B = None
+        indptr, indices = _epsilon_neighbourhood(dm, epsilon, blocks=blocks)
+    del blocks
     # tracks which elements are covered by prototypes
     covered = np.zeros(dm.shape[0], dtype=bool)
-    # score is the number of other elements that falls within the epsilon ball
-    scores = B.sum(axis=0)
     # found prototypes
     prototypes = []
 
-    # if we have a non empty seedset, we create a new list of those elements
-    # which is later consumed by the while loop.
+    # if we have a non empty seedset, we resolve those elements to their
+    # indices, which are later consumed by the while loop.
     seeds = []
     if seedset is not None:
-        seeds = list(seedset)
+        seeds = _seed_indices(dm, seedset)
+    num_seeds_used = 0
 
     while True:
         # candidate for a new prototype is the element whose epsilon ball
         # covers most other elements.
         idx_max = scores.argmax()
-        if (scores[idx_max] > 0) or (len(seeds) > 0):
-            if len(seeds) > 0:
+        if (scores[idx_max] > 0) or (num_seeds_used < len(seeds)):
+            if num_seeds_used < len(seeds):
                 # if a seedset is give, the best candidate is not the above,
                 # but an element of the seedset. This is repeated until all
                 # elements of the seedsets have been consumed. The loop then
                 # defaults to the normal routine, i.e. uses the scores.argmax()
                 # element as the next prototype
-                idx_max = dm.ids.index(seeds[0])
-                seeds = seeds[1:]
+                idx_max = seeds[num_seeds_used]
+                num_seeds_used += 1
             # candidate is new prototype, add it to the list
             prototypes.append(idx_max)
             # which elements have been just covered by the new prototype
-            justcovered = B[:, idx_max] & np.logical_not(covered)
+            if B is None:
+                ball = indices[indptr[idx_max]:indptr[idx_max + 1]]
+            else:
+                ball = np.flatnonzero(B[idx_max])
+            justcovered = ball[np.logical_not(covered[ball])]
             # update the global list of ever covered elements
-            covered += justcovered
+            covered[justcovered] = True
             # update the scores, i.e. which epsilon balls cover how many
-            # uncovered elements
-            scores -= B[justcovered, :].sum(axis=0)
+            # uncovered elements. Only balls around neighbours of the just
+            # covered elements are affected.
+            if B is None:
+                np.subtract.at(scores, _neighbours(indptr, indices,
+                                                   justcovered), 1)
+            else:
+                scores -= B[justcovered].sum(axis=0)
         else:
             # break if no epsilon balls cover other elements
             break
     return np.array(dm.ids)[prototypes]
 
 
+def _distinct_distances(dm, lo=-1 * np.infty, hi=np.infty, max_values=None,
+                        n_jobs=1):
+    '''Sorted distinct values of the condensed distance matrix in a range.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    lo, hi: float
+        Only distances d with lo <= d < hi are collected. Default is all
+        distances.
+    max_values: int
+        Maximal number of distinct distances to hold in memory. Default is
+        None, i.e. no limit.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+
+    Returns
+    -------
+    (np.ndarray or None, float, float)
+        All distinct distances in the range of the upper triangle of the
+        matrix including its diagonal, in ascending order, or None if there
+        are more than max_values of them. Followed by the smallest and the
+        largest distance in the range, which are inf and -inf if there is
+        none.
+    '''
+    lock = threading.Lock()
+    # distinct distances of the processed blocks, which are merged once they
+    # hold twice as many values as allowed
+    chunks, size, overflow = [], 0, False
+
+    def _block_distances(start, stop, block):
+        nonlocal chunks, size, overflow
+        rows = np.arange(start, stop)[:, None]
+        cols = np.arange(dm.shape[1])[None, :]
+        values = block[(cols >= rows) & (block >= lo) & (block < hi)]
+        if len(values) == 0:
+            return np.infty, -1 * np.infty
+        if overflow:
+            return values.min(), values.max()
+        values = np.unique(values)
+        with lock:
+            if not overflow:
+                chunks.append(values)
+                size += len(values)
+                if (max_values is not None) and (size > 2 * max_values):
+                    merged = np.unique(np.concatenate(chunks))
+                    overflow = len(merged) > max_values
+                    chunks = [] if overflow else [merged]
+                    size = len(merged)
+        return values[0], values[-1]
+
+    bounds = _map_row_blocks(_block_distances, dm, n_jobs)
+    smallest = min([np.infty] + [b[0] for b in bounds])
+    largest = max([-1 * np.infty] + [b[1] for b in bounds])
+    if overflow:
+        return None, smallest, largest
+    distances = np.unique(np.concatenate(chunks)) if chunks else np.empty(0)
+    if (max_values is not None) and (len(distances) > max_values):
+        return None, smallest, largest
+    return distances, smallest, largest
+
+
+def _protoclass_radii(dm, lo=-1 * np.infty, hi=np.infty, n_jobs=1):
+    '''Radii of protoclass to bisect over.
+
+       A ball whose radius is just above a distance covers all elements up
+       to this distance, i.e. balls only change when the radius passes one
+       of the distances in the matrix. If there are at most _MAX_RADII
+       distinct distances between lo and hi, the radii just above them are
+       returned. Otherwise, _MAX_RADII equally spaced radii narrow down the
+       range, such that the bisection can continue with the radii between
+       the two radii it ends up with.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    lo, hi: float
+        The range of radii. Default is all radii.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+
+    Returns
+    -------
+    (np.ndarray, bool)
+        The radii in ascending order, including lo and hi if they are
+        finite, and whether they hold all radii that change the balls.
+    '''
+    distances, smallest, largest = _distinct_distances(dm, lo, hi,
+                                                       _MAX_RADII, n_jobs)
+    # radii are computed in the data type of the distances, e.g. float32,
+    # to which they are cast when compared
+    if distances is None:
+        radii = np.unique(np.linspace(
+            np.nextafter(smallest, np.infty), np.nextafter(largest, np.infty),
+            _MAX_RADII).astype(np.asarray(smallest).dtype))
+    else:
+        radii = np.nextafter(distances, np.infty)
+    if np.isfinite(lo):
+        radii = np.union1d([lo, hi], radii)
+    return radii, distances is not None
+
+
 def prototype_selection_constructive_protoclass(dm, num_prototypes, steps=100,
-                                                seedset=None):
+                                                seedset=None, n_jobs=1,
+                                                checkpoint=None, resume=False,
+                                                checkpoint_interval=60.0):
     '''Heuristically select k prototypes for given distance matrix.
 
        Prototype selection is NP-hard. This is an implementation of a greedy
@@ -366,8 +1284,15 @@ def prototype_selection_constructive_protoclass(dm, num_prototypes, steps=100,
        until no balls cover more than its center element.
 
        Unfortunately, we need to vary epsilon such that the desired number of
-       prototypes is found. It is very likely that we cannot find the optimal
-       value for epsilon and we try at most <steps> times.
+       prototypes is found. Balls only change when epsilon passes one of the
+       distances in the matrix, thus we bisect over the sorted distinct
+       distances for the largest epsilon that results in at least the desired
+       number of prototypes. If there are more than _MAX_RADII distinct
+       distances, equally spaced radii first narrow down the range of
+       distances to bisect over, such that memory stays bounded for matrices
+       that do not fit into memory. The search stops early if exactly the
+       desired number of prototypes is found, otherwise the first k
+       prototypes, i.e. those whose balls cover most elements, are returned.
 
     Parameters
     ----------
@@ -379,11 +1304,27 @@ def prototype_selection_constructive_protoclass(dm, num_prototypes, steps=100,
         Must be smaller than the number of elements in the distance matrix,
         otherwise no reduction is necessary.
     steps: int
-        Maximal number of steps used to find a suitable epsilon.
+        Maximal number of epsilons to test. The bisection needs about
+        log2(number of distinct distances) + 1 steps, i.e. less than 70 for
+        matrices of up to 4 billion elements. If stopped early, the
+        prototypes of the largest epsilon tested so far that results in at
+        least k prototypes are returned.
     seedset: iterable of str
         A set of element IDs that are pre-selected as prototypes. Remaining
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
+
+    checkpoint: str
+        File to periodically store the state of the epsilon search in.
+        Default is None, i.e. no checkpoints.
+    resume: bool
+        Continue from the state stored in checkpoint, if the file exists.
+        The result is identical to an uninterrupted run. Default is False.
+    checkpoint_interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
 
     Returns
     -------
@@ -394,9 +1335,8 @@ def prototype_selection_constructive_protoclass(dm, num_prototypes, steps=100,
     Raises
     ------
     RuntimeError
-        There is a very naive optimization strategy in place to find a suitable
-        epsilon to find the desired number of prototypes. It will abort after
-        <steps> unsuccessful tries. Default is 100.
+        If even the smallest epsilon results in less than k prototypes, e.g.
+        because too many elements have a distance of 0 to each other.
     ValueError
         The number of prototypes to be found should be at least 2 and at most
         one element smaller than elements in the distance matrix. Otherwise, a
@@ -407,54 +1347,197 @@ def prototype_selection_constructive_protoclass(dm, num_prototypes, steps=100,
     Timing: %timeit -n 100 prototype_selection_constructive_protoclass(dm, 100)
             10 loops, best of 3: 32.8 s per loop
             where the dm holds 27,398 elements
+            (measured for the former, multiplicative search of epsilon)
     function signature with type annotation for future use with python >= 3.5:
     def prototype_selection_constructive_protoclass(dm: DistanceMatrix,
     num_prototypes: int, steps=100: int) -> List[str]:
     '''
-    _validate_parameters(dm, num_prototypes)
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    checkpointer = _seed_checkpointer(
+        checkpoint, 'constructive_protoclass', dm, seeds, checkpoint_interval,
+        resume, num_prototypes=num_prototypes)
 
     # this function is basically a search for a suitable epsilon and wraps
-    # the protoclass function
+    # the protoclass function. The number of prototypes decreases with the
+    # radius. The radii to bisect over are computed for a range of radii,
+    # which is narrowed down in rounds if there are too many distinct
+    # distances to hold in memory, see _protoclass_radii.
+    state = None if checkpointer is None else checkpointer.load()
+    if state is not None:
+        # continue the bisection with the range of the round and the bounds
+        # of the checkpoint
+        round_lo, round_hi, lo_radius, hi_radius = state['bounds']
+        radii, exact = _protoclass_radii(dm, round_lo, round_hi, n_jobs)
+        lo, hi = np.searchsorted(radii, [lo_radius, hi_radius])
+        first_step = int(state['step'])
+        prototypes = state['prototypes']
+    else:
+        round_lo, round_hi = -1 * np.infty, np.infty
+        radii, exact = _protoclass_radii(dm, n_jobs=n_jobs)
+        # the smallest radius only covers elements with the smallest
+        # distance, if that does not result in enough prototypes, no radius
+        # will.
+        lo, hi, first_step = 0, len(radii) - 1, 0
+        prototypes = _protoclass(dm, radii[lo], seedset, n_jobs)
+        if len(prototypes) < num_prototypes:
+            raise RuntimeError(("Even the smallest epsilon results in less "
+                                "than %i prototypes.") % num_prototypes)
+
+    # the largest radius covers all elements with the first prototype, i.e.
+    # results in less than num_prototypes, which are >= 2 and larger than the
+    # seedset. Invariant: radii[lo] results in >= num_prototypes, radii[hi]
+    # results in < num_prototypes
+    i = first_step
+    while (i < steps - 1) and (len(prototypes) != num_prototypes):
+        if hi - lo <= 1:
+            if exact:
+                break
+            # continue with the radii between the two bounds
+            round_lo, round_hi = radii[lo], radii[hi]
+            radii, exact = _protoclass_radii(dm, round_lo, round_hi, n_jobs)
+            lo, hi = 0, len(radii) - 1
+            continue
+        mid = (lo + hi) // 2
+        candidates = _protoclass(dm, radii[mid], seedset, n_jobs)
+        if len(candidates) >= num_prototypes:
+            lo, prototypes = mid, candidates
+        else:
+            hi = mid
+        i += 1
+        if checkpointer is not None:
+            checkpointer.update(
+                bounds=np.array([round_lo, round_hi, radii[lo], radii[hi]]),
+                step=i, prototypes=np.asarray(prototypes, dtype=str))
 
-    # initiate epsilon with a more or less arbitrary value
-    epsilon = dm.data.mean()
-    # define how much epsilon should be changes in an iteration
-    stepSize = 0.2
+    return list(prototypes[:num_prototypes])
 
-    # must epsilon be increased (+1) or decreased (-1). Initiallz no change
-    # take place, thus the direction is neutral.
-    direction = 0
-    # list of prototypes
-    prototypes = []
-    for i in range(steps):
-        oldDirection = direction
-
-        # increase the stepsize in each iteration to converge faster
-        stepSize *= 1.1
-        # call the protoclass with a defined epsilon
-        prototypes = _protoclass(dm, epsilon, seedset)
-        # check if direction of epsilon changes has changed
-        if len(prototypes) > num_prototypes:
-            direction = +1
-        elif len(prototypes) < num_prototypes:
-            direction = -1
-
-        #  make smaller steps on epsilion whenever the direction changed
-        if direction != oldDirection:
-            stepSize /= 10
-        epsilon += direction * stepSize
-
-        # end iteration when the desired number of prototypes have been found
-        if len(prototypes) == num_prototypes:
-            break
-    if len(prototypes) < num_prototypes:
-        raise RuntimeError(("Number of iterations exceeded before the desired"
-                            " number of prototypes could be found."))
 
-    return list(prototypes[:num_prototypes])
+def _pMedian_scores(dm, nearest, block_size=None, n_jobs=1, weights=None):
+    '''Score all candidates for the next p-median prototype.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix or MemmapDistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    nearest: np.ndarray
+        For each element, the distance to its closest prototype so far.
+    block_size: int
+        Number of candidate rows scored at once. Defaults to a size that
+        keeps the temporary block at roughly _BLOCK_ELEMENTS values.
+    n_jobs: int
+        Number of threads that score blocks in parallel. Default is 1.
+    weights: np.ndarray
+        Weight of every element in the sum. Default is None, i.e. 1.
+
+    Returns
+    -------
+    np.ndarray
+        For each candidate i, the (weighted) sum over all elements of the
+        distance to their closest prototype, if i were added as a prototype.
+    '''
+    if weights is None:
+        def _block_scores(start, stop, block):
+            return np.minimum(block, nearest).sum(axis=1)
+    else:
+        # multiply and sum instead of a dot product, whose summation order
+        # differs, such that unit weights reproduce the unweighted scores
+        def _block_scores(start, stop, block):
+            return (np.minimum(block, nearest) * weights).sum(axis=1)
+    scores = _map_row_blocks(_block_scores, dm, n_jobs, block_size)
+    return np.concatenate(scores)
 
 
-def prototype_selection_constructive_pMedian(dm, num_prototypes, seedset=None):
+def _constructive_pMedian_order(dm, num_prototypes, seeds=None, n_jobs=1,
+                                summary=None, checkpointer=None,
+                                weights=None):
+    '''Order in which constructive p-median selects prototypes.
+
+       The greedy selection does not depend on the number of prototypes, i.e.
+       the first k elements of the order are the prototypes for every k.
+
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    num_prototypes: int
+        Number of prototypes to select.
+    seeds: np.ndarray of int
+        Row indices of pre-selected prototypes. Default is None.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm. Default is None.
+    checkpointer: checkpoint.Checkpointer
+        Stores the state of the loop and provides the state to resume from.
+        Default is None, i.e. no checkpoints.
+    weights: np.ndarray of float
+        Weight of every element as a user. Default is None, i.e. 1.
+
+    Returns
+    -------
+    list of int
+        Row indices of the prototypes, in the order of selection, starting
+        with the seeds in the order of the seedset.
+    '''
+    # start with an empty list of prototypes
+    prototypes = []
+
+    state = None if checkpointer is None else checkpointer.load()
+    if state is not None:
+        # continue with the prototypes of the checkpoint. Selection does not
+        # depend on num_prototypes, i.e. a checkpoint with more prototypes
+        # holds the result.
+        prototypes = state['order'].tolist()
+        if len(prototypes) >= num_prototypes:
+            return prototypes[:num_prototypes]
+    elif seeds is not None:
+        # pre-populate the prototype list with seeds
+        prototypes = seeds.tolist()
+    else:
+        # add the one element whose distance is smallest to all other elements
+        # as the first prototype.
+        if weights is not None:
+            row_sums = np.concatenate(_map_row_blocks(
+                lambda start, stop, block: (block * weights).sum(
+                    axis=1, dtype=np.float64), dm, n_jobs))
+        elif summary is None:
+            row_sums = _row_sums(dm, n_jobs)
+        else:
+            row_sums = _summary(dm, summary).row_sums
+        prototypes.append(int(np.argmin(row_sums)))
+
+    # for each element, the distance to its closest prototype found so far.
+    # Keeping this vector up to date avoids re-computing the minimum over all
+    # prototype rows for every candidate in every round.
+    if state is not None:
+        nearest = state['nearest']
+    else:
+        nearest = _rows(dm, prototypes).min(axis=0).astype(np.float64)
+
+    # repeat adding prototypes until the desired number is found.
+    while len(prototypes) < num_prototypes:
+        # for each element, we compute the smallest distance sum to each
+        # previously found prototype ...
+        scores = _pMedian_scores(dm, nearest, n_jobs=n_jobs, weights=weights)
+        # ... and add the element which overall has the smallest distance sum
+        # as the next prototype.
+        idx_min = int(scores.argmin())
+        prototypes.append(idx_min)
+        np.minimum(nearest, _rows(dm, [idx_min])[0], out=nearest)
+        if checkpointer is not None:
+            checkpointer.update(order=np.asarray(prototypes),
+                                nearest=nearest)
+
+    if checkpointer is not None:
+        checkpointer.save(order=np.asarray(prototypes), nearest=nearest)
+    return prototypes
+
+
+def prototype_selection_constructive_pMedian(dm, num_prototypes, seedset=None,
+                                             n_jobs=1, summary=None,
+                                             checkpoint=None, resume=False,
+                                             checkpoint_interval=60.0,
+                                             weights=None):
     '''Heuristically select k prototypes for given distance matrix.
 
        Prototype selection is NP-hard. This is an implementation of a greedy
@@ -479,6 +1562,25 @@ def prototype_selection_constructive_pMedian(dm, num_prototypes, seedset=None):
         A set of element IDs that are pre-selected as prototypes. Remaining
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm, whose row sums are used to find the first
+        prototype, unless weights are given. Default is None.
+
+    checkpoint: str
+        File to periodically store the state of the selection in. Default is
+        None, i.e. no checkpoints.
+    resume: bool
+        Continue from the state stored in checkpoint, if the file exists.
+        The result is identical to an uninterrupted run. Default is False.
+    checkpoint_interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
+    weights: sequence of float
+        Weight of every element as a user, in the order of the distance
+        matrix, e.g. the number of genomes an element represents after
+        deduplication. Default is None, i.e. all users weigh 1.
 
     Returns
     -------
@@ -492,50 +1594,149 @@ def prototype_selection_constructive_pMedian(dm, num_prototypes, seedset=None):
         The number of prototypes to be found should be at least 2 and at most
         one element smaller than elements in the distance matrix. Otherwise, a
         ValueError is raised.
+        If the summary does not match the distance matrix.
+        If the weights do not match the distance matrix or are negative.
 
     Notes
     -----
-    Timing: %timeit -n 100 prototype_selection_constructive_protoclass(dm, 100)
-            10 loops, best of 3: TO BE DETERMINED per loop
-            where the dm holds 27,398 elements
+    Complexity: O(k * n^2) time and O(n) additional memory, since every
+    round scores all n candidates against a running vector of distances to
+    the closest prototype, instead of re-computing the minimum over all
+    previously found prototypes for each candidate.
     function signature with type annotation for future use with python >= 3.5:
-    def prototype_selection_constructive_protoclass(dm: DistanceMatrix,
+    def prototype_selection_constructive_pMedian(dm: DistanceMatrix,
     num_prototypes: int, seedset: List[str]) -> List[str]:
 
     [1] Desire L. Massart, Frank Plastria and Leonard Kaufman.
         "Non-hierarchical clustering with MASLOC"
         Pattern Recognition, 1983, Vol. 16, No. 5, pp. 507-516
     '''
-    _validate_parameters(dm, num_prototypes, seedset)
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    params = {}
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (dm.shape[0], ):
+            raise ValueError("'weights' must hold one value per element, "
+                             "found %i for %i elements."
+                             % (weights.size, dm.shape[0]))
+        if np.any(weights < 0):
+            raise ValueError("'weights' must not be negative.")
+        params['weights'] = weights
+    order = _constructive_pMedian_order(
+        dm, num_prototypes, seeds, n_jobs, summary,
+        _seed_checkpointer(checkpoint, 'constructive_pMedian', dm, seeds,
+                           checkpoint_interval, resume, **params),
+        weights)
+    return [dm.ids[idx] for idx in order]
+
+
+def _destructive_maxdist_order(dm, num_prototypes, seeds=None, n_jobs=1,
+                               summary=None, checkpointer=None):
+    '''Order in which destructive maxdist removes elements.
+
+       The removal does not depend on the number of prototypes, i.e. the
+       prototypes for every larger k are the survivors plus the last removed
+       elements.
 
-    # start with an empty list of prototypes
-    prototypes = []
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    num_prototypes: int
+        Number of prototypes to select.
+    seeds: np.ndarray of int
+        Row indices of pre-selected prototypes. Default is None.
+    n_jobs: int
+        Number of threads that process blocks in parallel. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm. Default is None.
+    checkpointer: checkpoint.Checkpointer
+        Stores the state of the loop and provides the state to resume from.
+        Default is None, i.e. no checkpoints.
 
-    if seedset is not None:
-        # pre-populate the prototype list with seeds
-        prototypes = [(dm.ids).index(x) for x in seedset]
-        seedset = set(seedset)
+    Returns
+    -------
+    (list of int, np.ndarray of int)
+        Row indices of the removed elements, in the order of removal, and of
+        the surviving elements, i.e. the prototypes, in ascending order.
+    '''
+    # clever bookkeeping allows for significant speed-ups! Seeds are never
+    # candidates for removal and thus survive.
+    is_candidate = np.ones(dm.shape[0], dtype=bool)
+    if seeds is not None:
+        is_candidate[seeds] = False
+
+    state = None if checkpointer is None else checkpointer.load()
+    if state is not None:
+        # continue with the removals and distance sums of the checkpoint.
+        # Removal does not depend on num_prototypes, i.e. a checkpoint with
+        # more removed elements holds the result.
+        removed = state['removed'].tolist()
+        dist_sums = state['dist_sums']
+        is_candidate[removed] = False
     else:
-        # add the one element whose distance is smallest to all other elements
-        # as the first prototype.
-        prototypes.append(np.argmin(dm.data.sum(axis=1)))
-
-    # repeat adding prototypes until the desired number is found.
-    while len(prototypes) < num_prototypes:
-        # for each element, we compute the smallest distance sum to each
-        # previously found prototype ...
-        minVals = []
-        for i in range(0, dm.shape[0]):
-            m = (dm.data[prototypes+[i], :].min(axis=0)).sum()
-            minVals.append(m)
-        # ... and add the element which overall has the smallest distance sum
-        # as the next prototype.
-        prototypes.append(np.asarray(minVals).argmin())
-
-    return [dm.ids[idx] for idx in prototypes]
-
+        removed = []
+        # distances from each element to all others
+        if summary is None:
+            dist_sums = _row_sums(dm, n_jobs)
+        else:
+            # the summary is shared, thus work on a copy
+            dist_sums = _summary(dm, summary).row_sums.copy()
+    num_removals = dm.shape[0] - num_prototypes
+    if len(removed) >= num_removals:
+        removed = removed[:num_removals]
+        survivors = np.ones(dm.shape[0], dtype=bool)
+        survivors[removed] = False
+        return removed, np.flatnonzero(survivors)
+
+    # the distance sums of the elements in active, of which alive marks the
+    # remaining candidates. Initially, these are all elements, such that
+    # whole rows are subtracted. Once half of them are removed, the arrays
+    # are compacted to the remaining candidates. Sums of elements that are
+    # no candidates are infinite, i.e. never minimal.
+    active = np.arange(dm.shape[0])
+    sums = dist_sums
+    alive = is_candidate
+    num_alive = int(alive.sum())
+    sums[~alive] = np.inf
 
-def prototype_selection_destructive_maxdist(dm, num_prototypes, seedset=None):
+    # continue until only num_prototype elements are left
+    while len(removed) < num_removals:
+        if 2 * num_alive <= len(active):
+            active, sums, alive = (active[alive], sums[alive],
+                                   np.ones(num_alive, dtype=bool))
+        if len(removed) > 0:
+            # substract the distance to the last removed element for all
+            # remaining elements
+            row = _rows(dm, slice(removed[-1], removed[-1] + 1))[0]
+            sums -= row if len(active) == len(row) else row[active]
+        # the next element to be removed is the one that is closest to all
+        # remaining others. Ties are broken by the lowest index, since active
+        # is ascending.
+        pos = int(sums.argmin())
+        sums[pos] = np.inf
+        alive[pos] = False
+        num_alive -= 1
+        removed.append(int(active[pos]))
+        if (checkpointer is not None) and checkpointer.due():
+            dist_sums[active] = sums
+            checkpointer.save(removed=np.asarray(removed),
+                              dist_sums=dist_sums)
+
+    if checkpointer is not None:
+        dist_sums[active] = sums
+        checkpointer.save(removed=np.asarray(removed), dist_sums=dist_sums)
+    # the surviving elements, i.e. the seeds and remaining candidates, are
+    # the found prototypes.
+    survivors = np.ones(dm.shape[0], dtype=bool)
+    survivors[removed] = False
+    return removed, np.flatnonzero(survivors)
+
+
+def prototype_selection_destructive_maxdist(dm, num_prototypes, seedset=None,
+                                            n_jobs=1, summary=None,
+                                            checkpoint=None, resume=False,
+                                            checkpoint_interval=60.0):
     '''Heuristically select k prototypes for given distance matrix.
 
        Prototype selection is NP-hard. This is an implementation of a greedy
@@ -557,6 +1758,21 @@ def prototype_selection_destructive_maxdist(dm, num_prototypes, seedset=None):
         A set of element IDs that are pre-selected as prototypes. Remaining
         prototypes are then recruited with the prototype selection algorithm.
         Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm, whose row sums are used instead of summing
+        up the full matrix. Default is None.
+
+    checkpoint: str
+        File to periodically store the state of the selection in. Default is
+        None, i.e. no checkpoints.
+    resume: bool
+        Continue from the state stored in checkpoint, if the file exists.
+        The result is identical to an uninterrupted run. Default is False.
+    checkpoint_interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
 
     Returns
     -------
@@ -570,6 +1786,7 @@ def prototype_selection_destructive_maxdist(dm, num_prototypes, seedset=None):
         The number of prototypes to be found should be at least 2 and at most
         one element smaller than elements in the distance matrix. Otherwise, a
         ValueError is raised.
+        If the summary does not match the distance matrix.
 
     Notes
     -----
@@ -580,41 +1797,110 @@ def prototype_selection_destructive_maxdist(dm, num_prototypes, seedset=None):
     def prototype_selection_constructive_maxdist(dm: DistanceMatrix,
     num_prototypes: int, seedset: List[str]) -> List[str]:
     '''
-    _validate_parameters(dm, num_prototypes, seedset)
+    seeds = _validate_parameters(dm, num_prototypes, seedset)
+    _, prototypes = _destructive_maxdist_order(
+        dm, num_prototypes, seeds, n_jobs, summary,
+        _seed_checkpointer(checkpoint, 'destructive_maxdist', dm, seeds,
+                           checkpoint_interval, resume))
+    # return a list of IDs of the surviving elements, which are the found
+    # prototypes.
+    return [dm.ids[idx] for idx in prototypes]
 
-    # clever bookkeeping allows for significant speed-ups!
 
-    # track the number of available elements
-    numRemain = len(dm.ids)
+# the greedy heuristics whose selections are nested for increasing k
+_PATH_ALGORITHMS = ('constructive_maxdist', 'constructive_pMedian',
+                    'destructive_maxdist')
 
-    # distances from each element to all others
-    currDists = dm.data.sum(axis=1)
 
-    # a dirty hack to ensure that all elements of the seedset will be selected
-    # last and thus make it into the resulting set
-    maxVal = currDists.max()
-    if seedset is not None:
-        for e in seedset:
-            currDists[dm.index(e)] = maxVal*2
+def prototype_selection_path(dm, ks, algorithm='constructive_maxdist',
+                             seedset=None, n_jobs=1, summary=None,
+                             checkpoint=None, resume=False,
+                             checkpoint_interval=60.0):
+    '''Select prototypes for several k with a single run of a heuristic.
 
-    # the element to remove first is the one that has smallest distance to all
-    # other. "Removing" works by tagging its distance-sum as infinity. Plus, we
-    # decrease the number of available elements by one.
-    minElmIdx = currDists.argmin()
-    currDists[minElmIdx], numRemain = np.infty, numRemain-1
+       Constructive maxdist and constructive p-median select prototypes
+       greedily one after the other, independent of k, i.e. the prototypes
+       for k are the first k selected elements. Destructive maxdist removes
+       elements in an order that is independent of k. Thus, one run up to the
+       largest k, or down to the smallest k, yields the prototypes for all k,
+       which are identical to separate runs of the heuristic.
 
-    # continue until only num_prototype elements are left
-    while (numRemain > num_prototypes):
-        # substract the distance to the removed element for all remaining
-        # elements
-        currDists -= dm.data[minElmIdx]
-        # find the next element to be removed, again as the one that is
-        # closest to all others
-        minElmIdx = currDists.argmin()
-        currDists[minElmIdx], numRemain = np.infty, numRemain-1
+    Parameters
+    ----------
+    dm: skbio.stats.distance.DistanceMatrix
+        Pairwise distances for all elements in the full set S.
+    ks: iterable of int
+        Numbers of prototypes to select. Each must be >= 2, larger than the
+        seedset and smaller than the number of elements in the distance
+        matrix.
+    algorithm: str
+        One of 'constructive_maxdist', 'constructive_pMedian' or
+        'destructive_maxdist'. Default is 'constructive_maxdist'.
+    seedset: iterable of str
+        A set of element IDs that are pre-selected as prototypes. Remaining
+        prototypes are then recruited with the prototype selection algorithm.
+        Warning: It will most likely violate the global objective function.
+    n_jobs: int
+        Number of threads that process blocks of the distance matrix in
+        parallel. Results are identical to serial execution. Default is 1.
+    summary: MatrixSummary
+        Precomputed summary of dm. Default is None.
+    checkpoint: str
+        File to periodically store the state of the heuristic in. Checkpoints
+        are compatible with those of the heuristic itself. Default is None,
+        i.e. no checkpoints.
+    resume: bool
+        Continue from the state stored in checkpoint, if the file exists.
+        The result is identical to an uninterrupted run. Default is False.
+    checkpoint_interval: float
+        Minimal number of seconds between two checkpoints. Default is 60.
 
-    # return a list of IDs of the surviving elements, which are the found
-    # prototypes.
-    return [dm.ids[idx]
-            for idx, dist in enumerate(currDists)
-            if dist != np.infty]
+    Returns
+    -------
+    (dict of int: list of str, list of str, dict of int: float)
+        For every k, the prototypes as returned by the heuristic for k. The
+        order of the elements, such that the first k elements are the
+        prototypes for k, i.e. the selection order for the constructive
+        heuristics, or the survivors for the smallest k followed by the
+        removed elements in reverse order of removal for destructive maxdist.
+        For every k, the objective of its prototypes, which counts repeated
+        elements, selected by p-median on degenerate matrices, repeatedly.
+
+    Raises
+    ------
+    ValueError
+        If the algorithm is unknown, ks is empty, or any k is invalid, see
+        _validate_parameters.
+    '''
+    if algorithm not in _PATH_ALGORITHMS:
+        raise ValueError("Unknown algorithm '%s'. Choose from: %s."
+                         % (algorithm, ', '.join(_PATH_ALGORITHMS)))
+    ks = sorted(set(ks))
+    if len(ks) == 0:
+        raise ValueError("'ks' must not be empty.")
+    seeds = _validate_parameters(dm, ks[0], seedset)
+    _validate_parameters(dm, ks[-1])
+    checkpointer = _seed_checkpointer(checkpoint, algorithm, dm, seeds,
+                                      checkpoint_interval, resume)
+
+    if algorithm == 'constructive_maxdist':
+        order = _constructive_maxdist_order(dm, ks[-1], seeds, n_jobs,
+                                            summary, checkpointer)
+    elif algorithm == 'constructive_pMedian':
+        order = _constructive_pMedian_order(dm, ks[-1], seeds, n_jobs,
+                                            summary, checkpointer)
+    else:
+        removed, survivors = _destructive_maxdist_order(
+            dm, ks[0], seeds, n_jobs, summary, checkpointer)
+        order = list(survivors) + removed[::-1][:ks[-1] - ks[0]]
+
+    subsets = {}
+    for k in ks:
+        if algorithm == 'constructive_pMedian':
+            subsets[k] = [dm.ids[idx] for idx in order[:k]]
+        else:
+            subsets[k] = [dm.ids[idx] for idx in sorted(order[:k])]
+    # the prefixes of the order hold the prototypes for every k
+    objectives = _prefix_distance_sums(dm, order)
+    return (subsets, [dm.ids[idx] for idx in order],
+            {k: objectives[k - 1] for k in ks})
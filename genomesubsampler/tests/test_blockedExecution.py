@@ -0,0 +1,50 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import os
+from threading import get_ident
+from unittest import TestCase, main
+
+from genomesubsampler.blockedExecution import (effective_n_jobs,
+                                               block_ranges,
+                                               map_blocks)
+
+
+class blockedExecution(TestCase):
+    def test_effective_n_jobs(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "'n_jobs' must not be 0.",
+            effective_n_jobs,
+            0)
+        self.assertEqual(1, effective_n_jobs(1))
+        self.assertEqual(7, effective_n_jobs(7))
+        cpus = os.cpu_count() or 1
+        self.assertEqual(cpus, effective_n_jobs(-1))
+        self.assertEqual(max(1, cpus - 1), effective_n_jobs(-2))
+        self.assertEqual(1, effective_n_jobs(-cpus - 10))
+
+    def test_block_ranges(self):
+        self.assertListEqual([], block_ranges(0, 3))
+        self.assertListEqual([(0, 3), (3, 6), (6, 7)], block_ranges(7, 3))
+        self.assertListEqual([(0, 7)], block_ranges(7, 10))
+
+    def test_map_blocks(self):
+        exp = [(0, 3), (3, 6), (6, 9), (9, 10)]
+        for n_jobs in [1, 2, 4, -1]:
+            self.assertListEqual(
+                exp, map_blocks(lambda start, stop: (start, stop), 10, 3,
+                                n_jobs))
+
+        # serial execution stays in the calling thread
+        threads = map_blocks(lambda start, stop: get_ident(), 10, 3, 1)
+        self.assertSetEqual({get_ident()}, set(threads))
+
+
+if __name__ == '__main__':
+    main()
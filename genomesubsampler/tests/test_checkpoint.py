@@ -0,0 +1,195 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from os import listdir, remove
+from os.path import join, exists
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+from unittest.mock import patch
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import numpy as np
+import numpy.testing as npt
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.checkpoint import (Checkpointer, checkpointer,
+                                         save_checkpoint, load_checkpoint)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    prototype_selection_destructive_maxdist,
+    prototype_selection_constructive_protoclass,
+    prototype_selection_constructive_pMedian,
+    prototype_selection_path)
+
+
+class Preempted(Exception):
+    pass
+
+
+class PreemptedDistanceMatrix(object):
+    '''Matrix adapter that fails after a number of requests.'''
+    def __init__(self, dm, max_requests):
+        self.ids, self.shape, self.index = dm.ids, dm.shape, dm.index
+        self._data = dm.data
+        self.max_requests = max_requests
+
+    def _request(self):
+        self.max_requests -= 1
+        if self.max_requests < 0:
+            raise Preempted()
+
+    def rows(self, indices):
+        self._request()
+        return self._data[indices]
+
+    def entries(self, rows, cols):
+        self._request()
+        return self._data[rows, cols]
+
+
+class checkpoint(TestCase):
+    def setUp(self):
+        self.wkdir = mkdtemp()
+        self.fp = join(self.wkdir, 'state.npz')
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def tearDown(self):
+        rmtree(self.wkdir)
+
+    def test_save_load_checkpoint(self):
+        save_checkpoint(self.fp, a=np.arange(3), b=np.array('foo'))
+        obs = load_checkpoint(self.fp)
+        npt.assert_array_equal(np.arange(3), obs['a'])
+        self.assertEqual('foo', obs['b'])
+        # the temporary file is replaced
+        self.assertEqual(['state.npz'], listdir(self.wkdir))
+        # arrays are compressed
+        with ZipFile(self.fp) as f:
+            self.assertTrue(all(info.compress_type == ZIP_DEFLATED
+                                for info in f.infolist()))
+
+    def test_Checkpointer(self):
+        self.assertIsNone(checkpointer(None, 'foo', self.dm20))
+        self.assertRaisesRegex(ValueError, "'resume' requires a 'checkpoint'",
+                               checkpointer, None, 'foo', self.dm20,
+                               resume=True)
+
+        cp = Checkpointer(self.fp, 'foo', self.dm20, interval=3600,
+                          params={'k': 5})
+        self.assertFalse(cp.due())
+        cp.update(x=np.arange(2))
+        self.assertFalse(exists(self.fp))
+        cp.save(x=np.arange(2))
+        # without resume, runs start from scratch
+        self.assertIsNone(cp.load())
+
+        cp = Checkpointer(self.fp, 'foo', self.dm20, resume=True,
+                          params={'k': 5})
+        npt.assert_array_equal(np.arange(2), cp.load()['x'])
+        for algorithm, dm, params in [('bar', self.dm20, {'k': 5}),
+                                      ('foo', self.dm100, {'k': 5}),
+                                      ('foo', self.dm20, {'k': 6}),
+                                      ('foo', self.dm20, {}),
+                                      ('foo', self.dm20, {'k': 5, 'x': 1})]:
+            cp = Checkpointer(self.fp, algorithm, dm, resume=True,
+                              params=params)
+            self.assertRaisesRegex(ValueError, "does not match", cp.load)
+        # missing files start from scratch
+        cp = Checkpointer(join(self.wkdir, 'foo.npz'), 'foo', self.dm20,
+                          resume=True)
+        self.assertIsNone(cp.load())
+
+    def _assertResumes(self, func, dm, *args, **kwargs):
+        exp = func(dm, *args, **kwargs)
+        for max_requests in [5, 9, 16]:
+            if exists(self.fp):
+                remove(self.fp)
+            with self.assertRaises(Preempted):
+                func(PreemptedDistanceMatrix(dm, max_requests), *args,
+                     checkpoint=self.fp, checkpoint_interval=0, **kwargs)
+            self.assertTrue(exists(self.fp))
+            obs = func(dm, *args, checkpoint=self.fp, resume=True, **kwargs)
+            self.assertEqual(exp, obs)
+            # resuming a finished run returns its result
+            obs = func(PreemptedDistanceMatrix(dm, 0), *args,
+                       checkpoint=self.fp, resume=True, **kwargs)
+            self.assertEqual(exp, obs)
+
+    def test_resume(self):
+        seedset = ['550.L1S1.s.1.sequence', '550.L1S18.s.1.sequence']
+        for func in [prototype_selection_constructive_maxdist,
+                     prototype_selection_destructive_maxdist,
+                     prototype_selection_constructive_pMedian]:
+            self._assertResumes(func, self.dm100, 20)
+            self._assertResumes(func, self.dm100, 20, seedset)
+            # a checkpoint of other seeds is not resumed
+            self.assertRaisesRegex(ValueError, "does not match the seeds",
+                                   func, self.dm100, 20, checkpoint=self.fp,
+                                   resume=True)
+
+        # destructive maxdist compacts its candidates after 50 and 75 of the
+        # 100 elements are removed, checkpoints in between resume
+        func = prototype_selection_destructive_maxdist
+        exp = func(self.dm100, 20)
+        for max_requests in [60, 78]:
+            with self.assertRaises(Preempted):
+                func(PreemptedDistanceMatrix(self.dm100, max_requests), 20,
+                     checkpoint=self.fp, checkpoint_interval=0)
+            self.assertEqual(exp, func(self.dm100, 20, checkpoint=self.fp,
+                                       resume=True))
+
+    def test_resume_protoclass(self):
+        # protoclass requests one block of rows per epsilon of dm100, the
+        # preemption strikes in the third bisection step
+        func = prototype_selection_constructive_protoclass
+        exp = func(self.dm100, 10)
+        with self.assertRaises(Preempted):
+            func(PreemptedDistanceMatrix(self.dm100, 4), 10,
+                 checkpoint=self.fp, checkpoint_interval=0)
+        state = load_checkpoint(self.fp)
+        self.assertGreater(state['step'], 0)
+        self.assertEqual(exp, func(self.dm100, 10, checkpoint=self.fp,
+                                   resume=True))
+        self.assertRaisesRegex(ValueError, "does not match the "
+                               "num_prototypes", func, self.dm100, 11,
+                               checkpoint=self.fp, resume=True)
+
+    @patch('genomesubsampler.prototypeSelection._MAX_RADII', 16)
+    def test_resume_protoclass_rounds(self):
+        # the range of radii is narrowed down in rounds of 16 radii, i.e. 4
+        # bisection steps, checkpoints of later rounds resume
+        func = prototype_selection_constructive_protoclass
+        exp = func(self.dm100, 60)
+        for max_requests in [4, 9, 12]:
+            if exists(self.fp):
+                remove(self.fp)
+            with self.assertRaises(Preempted):
+                func(PreemptedDistanceMatrix(self.dm100, max_requests), 60,
+                     checkpoint=self.fp, checkpoint_interval=0)
+            self.assertEqual(exp, func(self.dm100, 60, checkpoint=self.fp,
+                                       resume=True))
+
+    def test_resume_path(self):
+        # checkpoints of heuristics and paths are interchangeable
+        exp = prototype_selection_path(self.dm100, [5, 30],
+                                       'constructive_pMedian')
+        with self.assertRaises(Preempted):
+            prototype_selection_constructive_pMedian(
+                PreemptedDistanceMatrix(self.dm100, 10), 30,
+                checkpoint=self.fp, checkpoint_interval=0)
+        obs = prototype_selection_path(self.dm100, [5, 30],
+                                       'constructive_pMedian',
+                                       checkpoint=self.fp, resume=True)
+        self.assertEqual(exp, obs)
+
+
+if __name__ == '__main__':
+    main()
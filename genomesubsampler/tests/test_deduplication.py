@@ -0,0 +1,161 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.deduplication import (deduplicate,
+                                            deduplicated_selection)
+from genomesubsampler.distanceMatrix import (CompactDistanceMatrix,
+                                             MemmapDistanceMatrix)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_pMedian)
+
+
+class DeduplicationTests(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+        self.dmZero = DistanceMatrix.read(
+            get_data_path('distMatrix_allZero.txt'))
+
+    def _assertPartition(self, dm, representatives, clusters):
+        self.assertListEqual(representatives, sorted(
+            representatives, key=dm.index))
+        self.assertCountEqual(representatives, clusters.keys())
+        self.assertCountEqual(dm.ids, sum(clusters.values(), []))
+        for representative, members in clusters.items():
+            self.assertIn(representative, members)
+            self.assertListEqual(members, sorted(members, key=dm.index))
+
+    def test_deduplicate_errors(self):
+        self.assertRaisesRegex(ValueError, "Either 'threshold' or 'species'",
+                               deduplicate, self.dm20)
+        self.assertRaisesRegex(ValueError, "must not be negative",
+                               deduplicate, self.dm20, -1)
+        self.assertRaisesRegex(ValueError, "'seedset' is not a subset",
+                               deduplicate, self.dm20, 0, seedset=['foo'])
+
+    def test_deduplicate_threshold(self):
+        # identical genomes form a single cluster
+        representatives, clusters = deduplicate(self.dmZero, 0)
+        self.assertListEqual(['A'], representatives)
+        self.assertDictEqual({'A': ['A', 'C', 'P', 'Q', 'T']}, clusters)
+
+        # distinct genomes are not collapsed
+        representatives, clusters = deduplicate(self.dm20, 0)
+        self.assertListEqual(list(self.dm20.ids), representatives)
+
+        # clusters are single-linkage clusters, represented by their medoid
+        for threshold in [0.3, 0.32, 0.34]:
+            representatives, clusters = deduplicate(self.dm100, threshold,
+                                                    n_jobs=2)
+            self._assertPartition(self.dm100, representatives, clusters)
+            labels = fcluster(linkage(self.dm100.condensed_form(),
+                                      'single'), threshold, 'distance')
+            self.assertEqual(len(set(labels)), len(representatives))
+            for representative, members in clusters.items():
+                self.assertEqual(1, len({labels[self.dm100.index(id_)]
+                                         for id_ in members}))
+                sums = self.dm100.filter(members).data.sum(axis=1)
+                self.assertEqual(members[sums.argmin()], representative)
+
+        # the threshold is inclusive
+        distance = self.dm20['A', 'B']
+        self.assertEqual(['A', 'B'], deduplicate(
+            self.dm20.filter(['A', 'B']), distance)[1]['A'])
+
+    def test_deduplicate_threshold_float32(self):
+        # the threshold is inclusive for float32 distances, too
+        wkdir = mkdtemp()
+        try:
+            for dm in [self.dmZero, self.dm20.filter(['A', 'B'])]:
+                threshold = dm.data[0, 1]
+                exp = deduplicate(dm, threshold)
+                self.assertEqual(1, len(exp[0]))
+                for adapter in [
+                        CompactDistanceMatrix.from_distance_matrix(
+                            dm, dtype=np.float32),
+                        MemmapDistanceMatrix.write(dm, join(wkdir, 'dm')),
+                        MemmapDistanceMatrix.write(dm, join(wkdir, 'cdm'),
+                                                   condensed=True)]:
+                    self.assertEqual(exp, deduplicate(adapter, threshold))
+        finally:
+            rmtree(wkdir)
+
+    def test_deduplicate_species(self):
+        species = pd.Series({'A': 1, 'C': 1, 'P': 1, 'Q': np.nan, 'T': 2,
+                             'X': 1}, dtype='Int64')
+        dm = self.dm20.filter(['A', 'C', 'P', 'Q', 'T', 'B'])
+        representatives, clusters = deduplicate(dm, species=species)
+        self._assertPartition(dm, representatives, clusters)
+        self.assertCountEqual([['A', 'C', 'P'], ['Q'], ['T'], ['B']],
+                              clusters.values())
+
+        # species and distances link genomes
+        representatives, clusters = deduplicate(self.dmZero, 0,
+                                                species=species)
+        self.assertListEqual(['A'], representatives)
+
+    def test_deduplicate_seedset(self):
+        representatives, clusters = deduplicate(self.dmZero, 0,
+                                                seedset=['T', 'C'])
+        self.assertListEqual(['C', 'T'], representatives)
+        self.assertDictEqual({'C': ['A', 'C', 'P', 'Q'], 'T': ['T']},
+                             clusters)
+
+    def test_deduplicated_selection(self):
+        self.assertRaisesRegex(ValueError, "Unknown algorithm 'foo'",
+                               deduplicated_selection, self.dm20, 5, 0,
+                               algorithm='foo')
+
+        # without duplicates, results do not change
+        exp = prototype_selection_constructive_pMedian(self.dm100, 10)
+        obs, clusters = deduplicated_selection(self.dm100, 10, 0)
+        self.assertListEqual(exp, obs)
+        self.assertDictEqual({id_: [id_] for id_ in exp}, clusters)
+
+        representatives, exp_clusters = deduplicate(self.dm100, 0.32)
+        wkdir = mkdtemp()
+        try:
+            mdm = MemmapDistanceMatrix.write(self.dm100, join(wkdir, 'dm'),
+                                             dtype=np.float64)
+            for dm in [self.dm100, mdm]:
+                for algorithm in ['constructive_pMedian',
+                                  'constructive_maxdist']:
+                    obs, clusters = deduplicated_selection(
+                        dm, 10, 0.32, algorithm=algorithm,
+                        seedset=[representatives[3]])
+                    self.assertEqual(10, len(obs))
+                    self.assertIn(representatives[3], obs)
+                    self.assertDictEqual(
+                        {id_: exp_clusters[id_] for id_ in obs}, clusters)
+        finally:
+            rmtree(wkdir)
+
+        # the p-median model weighs representatives by their cluster size
+        weights = [len(exp_clusters[id_]) for id_ in representatives]
+        exp = prototype_selection_constructive_pMedian(
+            self.dm100.filter(representatives), 10, weights=weights)
+        obs, _ = deduplicated_selection(self.dm100, 10, 0.32)
+        self.assertListEqual(exp, obs)
+
+        self.assertRaisesRegex(ValueError, "otherwise no reduction",
+                               deduplicated_selection, self.dmZero, 2, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import numpy as np
+import numpy.testing as npt
+from skbio.stats.distance import (DistanceMatrix, DissimilarityMatrixError,
+                                  MissingIDError)
+from skbio.util import get_data_path
+
+from genomesubsampler.distanceMatrix import (MemmapDistanceMatrix,
+                                             LazyDistanceMatrix,
+                                             CompactDistanceMatrix,
+                                             SubsetDistanceMatrix)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    prototype_selection_destructive_maxdist,
+    prototype_selection_constructive_protoclass,
+    prototype_selection_constructive_pMedian,
+    _protoclass,
+    distance_sum)
+
+
+class MemmapDistanceMatrixTests(TestCase):
+    def setUp(self):
+        self.wkdir = mkdtemp()
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def tearDown(self):
+        rmtree(self.wkdir)
+
+    def test_init(self):
+        self.assertRaisesRegex(
+            DissimilarityMatrixError,
+            'IDs must be unique.',
+            MemmapDistanceMatrix,
+            ['A', 'B', 'A'],
+            join(self.wkdir, 'dm.bin'))
+
+        # a single element does not hold any distances
+        dm = MemmapDistanceMatrix(['A'], join(self.wkdir, 'empty'),
+                                  condensed=True)
+        self.assertEqual((1, 1), dm.shape)
+        npt.assert_equal(dm.rows([0]), [[0]])
+
+    def test_write(self):
+        for condensed in [False, True]:
+            fp = join(self.wkdir, 'dm.bin')
+            dm = MemmapDistanceMatrix.write(self.dm20, fp, condensed)
+            self.assertEqual(self.dm20.ids, dm.ids)
+            self.assertEqual((20, 20), dm.shape)
+            self.assertEqual(np.float32, dm.dtype)
+            # 4 bytes per float32 distance
+            with open(fp, 'rb') as f:
+                self.assertEqual(190 * 4 if condensed else 400 * 4,
+                                 len(f.read()))
+
+            dm = MemmapDistanceMatrix.write(self.dm20, fp, condensed,
+                                            dtype=np.float64)
+            npt.assert_equal(dm.rows(slice(None)), self.dm20.data)
+
+    def test_index(self):
+        dm = MemmapDistanceMatrix.write(self.dm20,
+                                        join(self.wkdir, 'dm.bin'))
+        self.assertEqual(0, dm.index('A'))
+        self.assertEqual(19, dm.index('T'))
+        self.assertRaisesRegex(
+            MissingIDError,
+            'The ID \'X\' is not in the dissimilarity matrix.',
+            dm.index,
+            'X')
+
+    def test_rows_entries(self):
+        for condensed in [False, True]:
+            dm = MemmapDistanceMatrix.write(
+                self.dm100, join(self.wkdir, 'dm.bin'), condensed)
+            exp = self.dm100.data.astype(np.float32)
+            npt.assert_equal(dm.rows(slice(None)), exp)
+            npt.assert_equal(dm.rows(slice(10, 20)), exp[10:20])
+            npt.assert_equal(dm.rows([99, 0, 5]), exp[[99, 0, 5]])
+            npt.assert_equal(dm.rows(np.array([7, 7])), exp[[7, 7]])
+            npt.assert_equal(dm.rows(slice(90, None, 3)), exp[90::3])
+            npt.assert_equal(dm.rows([]).shape, (0, 100))
+
+            rows = np.array([0, 5, 99, 42])
+            cols = np.array([3, 5, 0, 98])
+            npt.assert_equal(dm.entries(rows, cols), exp[rows, cols])
+            npt.assert_equal(dm.entries(rows[:, None], rows[None, :]),
+                             exp[np.ix_(rows, rows)])
+
+    def test_prototype_selection(self):
+        # float32 distances must result in the same prototypes for the test
+        # matrices, which hold few significant digits.
+        for condensed in [False, True]:
+            for dm in [self.dm20, self.dm100]:
+                mm = MemmapDistanceMatrix.write(
+                    dm, join(self.wkdir, 'dm.bin'), condensed)
+                self.assertAlmostEqual(distance_sum(dm.ids, dm),
+                                       distance_sum(mm.ids, mm), places=4)
+                for func in [prototype_selection_constructive_maxdist,
+                             prototype_selection_destructive_maxdist,
+                             prototype_selection_constructive_protoclass,
+                             prototype_selection_constructive_pMedian]:
+                    for k in [3, 5, 18]:
+                        self.assertCountEqual(func(dm, k), func(mm, k))
+                self.assertCountEqual(_protoclass(dm, 0.41),
+                                      _protoclass(mm, 0.41))
+
+            mm = MemmapDistanceMatrix.write(
+                self.dm20, join(self.wkdir, 'dm.bin'), condensed)
+            seedset = ['G', 'I']
+            for func in [prototype_selection_constructive_maxdist,
+                         prototype_selection_destructive_maxdist,
+                         prototype_selection_constructive_pMedian]:
+                self.assertCountEqual(func(self.dm20, 5, seedset),
+                                      func(mm, 5, seedset))
+
+
+class LazyDistanceMatrixTests(TestCase):
+    def setUp(self):
+        self.wkdir = mkdtemp()
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.calls = []
+
+        def pairwise(i, js):
+            self.calls.append(i)
+            return self.dm100.data[i, js]
+        self.pairwise = pairwise
+
+    def tearDown(self):
+        rmtree(self.wkdir)
+
+    def test_init(self):
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "IDs must be unique.",
+                               LazyDistanceMatrix, ['a', 'a'], self.pairwise)
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise)
+        self.assertEqual((100, 100), dm.shape)
+        self.assertEqual(5, dm.index(self.dm100.ids[5]))
+        self.assertRaises(MissingIDError, dm.index, 'foo')
+        self.assertEqual([], self.calls)
+
+    def test_rows_entries(self):
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise)
+        npt.assert_allclose(self.dm100.data[[3, 1, 3]], dm.rows([3, 1, 3]))
+        npt.assert_allclose(self.dm100.data[:4], dm.rows(slice(0, 4)))
+        self.assertEqual([3, 1, 0, 2], self.calls)
+        self.assertEqual(400, dm.num_evaluated)
+        rows, cols = np.array([[1], [7]]), np.array([[0, 1, 5]])
+        npt.assert_allclose(self.dm100.data[rows, cols],
+                            dm.entries(rows, cols))
+
+    def test_cache_eviction(self):
+        # room for two rows of 100 float64 values
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise,
+                                cache_bytes=1600)
+        dm.rows([0, 1])
+        dm.rows([0])  # 0 is now the most recently used row
+        dm.rows([2])  # evicts 1
+        dm.rows([0, 2, 1])
+        self.assertEqual([0, 1, 2, 1], self.calls)
+
+        # rows larger than the cache are never cached
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise,
+                                cache_bytes=10)
+        dm.rows([0, 0])
+        self.assertEqual([0, 1, 2, 1, 0, 0], self.calls)
+
+    def test_spill(self):
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise,
+                                cache_bytes=1600, spill_dir=self.wkdir)
+        dm.rows([0, 1, 2, 3])
+        npt.assert_allclose(self.dm100.data[[0, 1, 2, 3]],
+                            dm.rows([0, 1, 2, 3]))
+        # evicted rows are read back from disk
+        self.assertEqual([0, 1, 2, 3], self.calls)
+        self.assertEqual(400, dm.num_evaluated)
+
+    def test_prototype_selection(self):
+        dm = LazyDistanceMatrix(self.dm100.ids, self.pairwise,
+                                cache_bytes=4000)
+        seeds = [self.dm100.ids[7], self.dm100.ids[42]]
+        obs = prototype_selection_constructive_maxdist(dm, 10, seeds)
+        self.assertEqual(prototype_selection_constructive_maxdist(
+            self.dm100, 10, seeds), obs)
+        # given a seedset, only the rows of the prototypes are computed
+        self.assertCountEqual(obs, [self.dm100.ids[i] for i in self.calls])
+
+        self.assertEqual(prototype_selection_constructive_pMedian(
+            self.dm100, 5), prototype_selection_constructive_pMedian(dm, 5))
+
+
+class CompactDistanceMatrixTests(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def test_init(self):
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "IDs must be unique.",
+                               CompactDistanceMatrix, ['a', 'a'],
+                               np.zeros((2, 2)))
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "Data must be a 2x2 matrix",
+                               CompactDistanceMatrix, ['a', 'b'],
+                               np.zeros((3, 3)))
+        dm = CompactDistanceMatrix(['a', 'b'], np.array([[0, 3], [3, 0]],
+                                                        dtype=np.uint16), 0.5)
+        self.assertEqual(1, dm.index('b'))
+        self.assertRaises(MissingIDError, dm.index, 'c')
+        npt.assert_equal([[0, 1.5]], dm.rows([0]))
+        npt.assert_equal([1.5, 0], dm.entries([1, 1], [0, 1]))
+
+    def test_from_distance_matrix(self):
+        # dm20 holds distances with 4 decimals, which fit into uint16
+        dm = CompactDistanceMatrix.from_distance_matrix(self.dm20)
+        self.assertEqual(np.uint16, dm.dtype)
+        self.assertAlmostEqual(1e-4, dm.scale)
+        self.assertEqual(self.dm20.data.nbytes // 4, dm.nbytes)
+        self.assertEqual(np.float32, dm.rows([0]).dtype)
+        npt.assert_allclose(self.dm20.data, dm.rows(slice(None)), atol=1e-7)
+
+        # dm100 holds full precision distances
+        dm = CompactDistanceMatrix.from_distance_matrix(self.dm100)
+        self.assertEqual(np.float32, dm.dtype)
+        self.assertIsNone(dm.scale)
+        self.assertEqual(self.dm100.data.nbytes // 2, dm.nbytes)
+        npt.assert_allclose(self.dm100.data, dm.rows(slice(None)), rtol=1e-6)
+
+        # lossy quantisation into 65536 levels
+        dm = CompactDistanceMatrix.from_distance_matrix(self.dm100, 'uint16')
+        self.assertEqual(np.uint16, dm.dtype)
+        self.assertAlmostEqual(self.dm100.data.max() / 65535, dm.scale)
+        npt.assert_allclose(self.dm100.data, dm.rows(slice(None)),
+                            atol=dm.scale / 2 + 1e-7)
+
+        self.assertRaisesRegex(ValueError, "Unsupported dtype",
+                               CompactDistanceMatrix.from_distance_matrix,
+                               self.dm20, np.float64)
+        negative = DistanceMatrix([[0, -1], [-1, 0]])
+        self.assertEqual(np.float32,
+                         CompactDistanceMatrix.from_distance_matrix(
+                             negative).dtype)
+        self.assertRaisesRegex(ValueError, "Negative distances",
+                               CompactDistanceMatrix.from_distance_matrix,
+                               negative, 'uint16')
+
+    def test_prototype_selection(self):
+        # compact distances must result in the same prototypes as float64
+        # distances, except for ties that are broken by rounding errors
+        for dm in [self.dm20, self.dm100]:
+            for dtype in ['auto', np.float32, np.uint16]:
+                cdm = CompactDistanceMatrix.from_distance_matrix(dm, dtype)
+                for func in [prototype_selection_constructive_maxdist,
+                             prototype_selection_destructive_maxdist,
+                             prototype_selection_constructive_protoclass,
+                             prototype_selection_constructive_pMedian]:
+                    for k in [3, 5, 18]:
+                        exp, obs = func(dm, k), func(cdm, k)
+                        if (func is prototype_selection_constructive_protoclass
+                                and dtype is np.uint16 and dm is self.dm100):
+                            # lossy quantisation changes the epsilon balls
+                            self.assertEqual(k, len(obs))
+                        else:
+                            self.assertCountEqual(exp, obs)
+
+        # p-median on dm20 with k=10: L and S tie for the ninth prototype,
+        # float64 rounding errors favour S, while the exact uint16
+        # representation picks the first element, i.e. L.
+        exp = prototype_selection_constructive_pMedian(self.dm20, 10)
+        obs = prototype_selection_constructive_pMedian(
+            CompactDistanceMatrix.from_distance_matrix(self.dm20), 10)
+        self.assertEqual(exp[:8], obs[:8])
+        self.assertEqual(('S', 'L'), (exp[8], obs[8]))
+
+
+class SubsetDistanceMatrixTests(TestCase):
+    def setUp(self):
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+        self.ids = ['T', 'A', 'C', 'P', 'O', 'L']
+
+    def test_init(self):
+        dm = SubsetDistanceMatrix(self.dm20, self.ids)
+        self.assertEqual(tuple(self.ids), dm.ids)
+        self.assertEqual((6, 6), dm.shape)
+        self.assertEqual(1, dm.index('A'))
+        self.assertRaises(MissingIDError, dm.index, 'B')
+        self.assertRaises(MissingIDError, SubsetDistanceMatrix, self.dm20,
+                          ['A', 'foo'])
+        self.assertRaises(DissimilarityMatrixError, SubsetDistanceMatrix,
+                          self.dm20, ['A', 'A'])
+
+    def test_rows_entries(self):
+        exp = self.dm20.filter(self.ids)
+        # a subset of a subset
+        dm = SubsetDistanceMatrix(
+            SubsetDistanceMatrix(self.dm20, self.ids + ['B']), self.ids)
+        npt.assert_equal(exp.data, dm.rows(slice(None)))
+        npt.assert_equal(exp.data[[4, 0]], dm.rows([4, 0]))
+        npt.assert_equal(exp.data[[1, 2], [5, 5]],
+                         dm.entries(np.array([1, 2]), 5))
+
+    def test_prototype_selection(self):
+        exp = self.dm20.filter(self.ids)
+        dm = SubsetDistanceMatrix(self.dm20, self.ids)
+        for func in [prototype_selection_constructive_maxdist,
+                     prototype_selection_destructive_maxdist,
+                     prototype_selection_constructive_pMedian]:
+            self.assertEqual(func(exp, 3), func(dm, 3))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,25 @@
 
 from unittest import TestCase, main
 from click.testing import CliRunner
+from os.path import join
 from shutil import rmtree
 from tempfile import mkdtemp
 
-from genomesubsampler.genomeSubsampler import _main
+import numpy as np
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.distanceMatrix import (MemmapDistanceMatrix,
+                                             SubsetDistanceMatrix)
+from genomesubsampler.genomeSubsampler import (read_seedset,
+                                               restrict_distance_matrix,
+                                               subsample, _main)
+from genomesubsampler.matrixIO import write_binary
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    prototype_selection_constructive_protoclass,
+    prototype_selection_constructive_pMedian,
+    distance_sum)
 
 
 class GenomeSubsamplerTests(TestCase):
@@ -21,19 +36,208 @@ class GenomeSubsamplerTests(TestCase):
         """Create working directory and test files.
         """
         self.wkdir = mkdtemp()
+        self.repophlan_fp = get_data_path('repophlan_microbes_wscores.txt')
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+        # distances between the genomes of the RepoPhlAn table
+        self.genomes = ['G000007525', 'G000010305', 'G000010365',
+                        'G000018865', 'G000441575', 'G000025185',
+                        'G000158275', 'G000011545', 'G000011705']
+        points = np.random.RandomState(42).rand(len(self.genomes), 3)
+        self.dm = DistanceMatrix(
+            np.sqrt(((points[:, None] - points[None, :]) ** 2).sum(axis=2)),
+            self.genomes)
+        self.dm_fp = join(self.wkdir, 'dm.txt')
+        self.dm.write(self.dm_fp)
+        self.seedset_fp = join(self.wkdir, 'seeds.txt')
+        with open(self.seedset_fp, 'w') as f:
+            f.write('# seeds\nG000010365\n\n')
 
     def tearDown(self):
         """Delete working directory and test files.
         """
         rmtree(self.wkdir)
 
+    def test_read_seedset(self):
+        """Test function read_seedset.
+        """
+        self.assertListEqual(['G000010365'], read_seedset(self.seedset_fp))
+
+    def test_restrict_distance_matrix(self):
+        """Test function restrict_distance_matrix.
+        """
+        self.assertIs(self.dm20,
+                      restrict_distance_matrix(self.dm20, self.dm20.ids))
+
+        obs = restrict_distance_matrix(self.dm20, ['T', 'A', 'foo'], ['C'])
+        self.assertIsInstance(obs, DistanceMatrix)
+        self.assertEqual(('A', 'C', 'T'), obs.ids)
+
+        mdm = MemmapDistanceMatrix.write(self.dm20, join(self.wkdir, 'dm'))
+        obs = restrict_distance_matrix(mdm, ['T', 'A', 'foo'], ['C'])
+        self.assertIsInstance(obs, SubsetDistanceMatrix)
+        self.assertEqual(('A', 'C', 'T'), obs.ids)
+
+    def test_subsample(self):
+        """Test function subsample.
+        """
+        # the path of maxdist selects for all k at once
+        res = list(subsample(self.dm20, [5, 3], seedset=['A']))
+        self.assertListEqual([3, 5], [k for k, _, _, _ in res])
+        for k, prototypes, objective, seconds in res:
+            self.assertListEqual(
+                prototype_selection_constructive_maxdist(self.dm20, k, ['A']),
+                prototypes)
+            self.assertAlmostEqual(distance_sum(prototypes, self.dm20),
+                                   objective)
+            self.assertGreaterEqual(seconds, 0)
+
+        res = list(subsample(self.dm20, [4, 3], 'constructive_protoclass'))
+        for k, prototypes, objective, seconds in res:
+            self.assertListEqual(
+                prototype_selection_constructive_protoclass(self.dm20, k),
+                prototypes)
+
+        # the exhaustive search can be stopped early
+        res = list(subsample(self.dm20, [4], 'exhaustive', max_nodes=0))
+        self.assertEqual(4, len(res[0][1]))
+        self.assertGreaterEqual(res[0][2], distance_sum(
+            prototype_selection_constructive_maxdist(self.dm20, 4),
+            self.dm20))
+        res = list(subsample(self.dm20, [4], 'exhaustive', time_limit=60))
+        self.assertCountEqual(('A', 'J', 'P', 'T'), res[0][1])
+
+        self.assertRaisesRegex(ValueError, "Unknown algorithm 'foo'", list,
+                               subsample(self.dm20, [3], 'foo'))
+
+        # weights are passed to the p-median model only
+        weights = np.arange(20) % 3
+        res = list(subsample(self.dm20, [3, 4], 'constructive_pMedian',
+                             weights=weights))
+        for k, prototypes, _, _ in res:
+            self.assertListEqual(
+                prototype_selection_constructive_pMedian(self.dm20, k,
+                                                         weights=weights),
+                prototypes)
+        res = list(subsample(self.dm20, [3, 4], weights=weights))
+        for k, prototypes, _, _ in res:
+            self.assertListEqual(
+                prototype_selection_constructive_maxdist(self.dm20, k),
+                prototypes)
+
     def test__main(self):
         """Test for the main process following Click.
         """
         params = []
         res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 2)
+        self.assertIn("Missing option '--distance-matrix-fp'", res.output)
+
+        output_fp = join(self.wkdir, 'out.txt')
+        params = ['--distance-matrix-fp', self.dm_fp,
+                  '--repophlan-wscores-fp', self.repophlan_fp,
+                  '--min-score-faa', '0.9', '--refseq-only',
+                  '--seedset-fp', self.seedset_fp,
+                  '-k', '3', '-k', '4', '--output-fp', output_fp]
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 0)
+        self.assertIn('Genomes in distance matrix: 9.', res.output)
+        # 7 genomes pass the filters, plus the seed
+        self.assertIn('Genomes passing filters: 8.', res.output)
+        self.assertIn('Task completed.', res.output)
+        with open(output_fp) as f:
+            lines = [line.rstrip('\n').split('\t') for line in f]
+        self.assertListEqual(
+            ['#k', 'algorithm', 'objective', 'seconds', 'genomes'], lines[0])
+        self.assertEqual(3, len(lines))
+        dm = self.dm.filter([id_ for id_ in self.genomes
+                             if id_ != 'G000441575'])
+        for line, k in zip(lines[1:], [3, 4]):
+            genomes = line[4].split(',')
+            self.assertEqual(str(k), line[0])
+            self.assertEqual('constructive_maxdist', line[1])
+            self.assertListEqual(
+                prototype_selection_constructive_maxdist(dm, k,
+                                                         ['G000010365']),
+                genomes)
+            self.assertAlmostEqual(distance_sum(genomes, dm), float(line[2]))
+
+        # one genome per species, without seeds
+        params = ['--distance-matrix-fp', self.dm_fp,
+                  '--repophlan-wscores-fp', self.repophlan_fp,
+                  '--assembly-level', 'Complete Genome',
+                  '--assembly-level', 'Chromosome', '--one-per-species',
+                  '-k', '7']
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 0)
+        self.assertIn('Genomes passing filters: 8.', res.output)
+        self.assertNotIn('G000010365', res.output)
+
+        # G000010365 and G000441575 are of the same species
+        clusters_fp = join(self.wkdir, 'clusters.txt')
+        params = ['--distance-matrix-fp', self.dm_fp,
+                  '--repophlan-wscores-fp', self.repophlan_fp,
+                  '--dedup-species', '--clusters-fp', clusters_fp,
+                  '--algorithm', 'constructive_pMedian', '-k', '3',
+                  '--output-fp', output_fp]
+        res = CliRunner().invoke(_main, params)
         self.assertEqual(res.exit_code, 0)
-        self.assertEqual(res.output, 'Task completed.\n')
+        self.assertIn('Representatives after deduplication: 8.', res.output)
+        with open(clusters_fp) as f:
+            lines = f.readlines()
+        self.assertEqual(10, len(lines))
+        self.assertIn('G000010365\tG000441575\n', lines)
+
+        params = ['--distance-matrix-fp', self.dm_fp, '--dedup-species',
+                  '-k', '3']
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 2)
+        self.assertIn("'--dedup-species' requires", res.output)
+
+        params = ['--distance-matrix-fp', self.dm_fp, '--dedup-threshold',
+                  '10', '-k', '3']
+        res = CliRunner().invoke(_main, params)
+        self.assertIn('Representatives after deduplication: 1.', res.output)
+        self.assertEqual(res.exit_code, 1)
+
+        # all backends and formats select the same genomes
+        binary_fp = join(self.wkdir, 'dm.bin')
+        write_binary(self.dm, binary_fp)
+        outputs = []
+        for fp in [self.dm_fp, binary_fp]:
+            for backend in ['dense', 'compact', 'memmap']:
+                params = ['--distance-matrix-fp', fp, '--backend', backend,
+                          '--algorithm', 'destructive_maxdist', '-k', '4',
+                          '--output-fp', output_fp]
+                res = CliRunner().invoke(_main, params)
+                self.assertEqual(res.exit_code, 0)
+                with open(output_fp) as f:
+                    outputs.append(f.readlines()[1].split('\t')[4])
+        self.assertEqual(1, len(set(outputs)))
+
+        params = ['--distance-matrix-fp', self.dm_fp, '--algorithm',
+                  'exhaustive', '--time-limit', '0', '-k', '4',
+                  '--output-fp', output_fp]
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 0)
+        with open(output_fp) as f:
+            self.assertEqual(4, len(f.readlines()[1].split('\t')[4].split(
+                ',')))
+
+        # invalid parameters are reported without a traceback
+        params = ['--distance-matrix-fp', self.dm_fp, '-k', '9']
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 1)
+        self.assertIn('Error: ', res.output)
+        self.assertIn('otherwise no reduction is necessary', res.output)
+
+        # so are selections that repeat a genome of a degenerate matrix
+        params = ['--distance-matrix-fp',
+                  get_data_path('distMatrix_allZero.txt'), '--algorithm',
+                  'constructive_pMedian', '-k', '2']
+        res = CliRunner().invoke(_main, params)
+        self.assertEqual(res.exit_code, 1)
+        self.assertIn('Error: IDs must be unique', res.output)
 
 
 if __name__ == '__main__':
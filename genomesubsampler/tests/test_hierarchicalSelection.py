@@ -0,0 +1,129 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+
+import pandas as pd
+
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.hierarchicalSelection import (
+    taxonomy_partitions,
+    allocate_prototypes,
+    hierarchical_selection)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist)
+
+
+class hierarchicalSelection(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+        self.partitions = {'x': list(self.dm100.ids[:50]),
+                           'y': list(self.dm100.ids[50:80]),
+                           'z': list(self.dm100.ids[80:])}
+
+    def test_taxonomy_partitions(self):
+        df = pd.read_table(get_data_path('repophlan_microbes_wscores.txt'),
+                           index_col=0, header=0)
+        obs = taxonomy_partitions(df['taxonomy'], 'p')
+        self.assertEqual(6, len(obs))
+        self.assertEqual(['G000010365', 'G000441575', 'G000011545',
+                          'G000011705'], obs['p__Proteobacteria'])
+        self.assertEqual(['G000007525'], obs['p__Actinobacteria'])
+
+        obs = taxonomy_partitions(df['taxonomy'], 'g')
+        self.assertEqual(['G000011545', 'G000011705'],
+                         obs['g__Burkholderia'])
+
+        # missing ranks
+        obs = taxonomy_partitions(
+            pd.Series(['k__Bacteria|p__A', 'k__Bacteria', None],
+                      index=['a', 'b', 'c']), 'p')
+        self.assertEqual({'p__A': ['a'], 'p__': ['b', 'c']}, obs)
+
+        self.assertRaisesRegex(ValueError, "Unknown rank 'x'",
+                               taxonomy_partitions, df['taxonomy'], 'x')
+
+    def test_allocate_prototypes(self):
+        sizes = {'a': 10, 'b': 5, 'c': 1}
+        # largest remainder: shares are 4.375, 2.1875 and 0.4375
+        self.assertEqual({'a': 4, 'b': 2, 'c': 1},
+                         allocate_prototypes(sizes, 7))
+        self.assertEqual({'a': 9, 'b': 5, 'c': 1},
+                         allocate_prototypes(sizes, 15))
+        self.assertEqual({'a': 10, 'b': 5, 'c': 1},
+                         allocate_prototypes(sizes, 16))
+        # capped partitions pass their share on
+        self.assertEqual({'a': 4, 'b': 4, 'c': 1},
+                         allocate_prototypes(sizes, 9, 'equal'))
+        self.assertEqual({'a': 1, 'b': 2, 'c': 0},
+                         allocate_prototypes(sizes, 3, 'proportional',
+                                             {'b': 2}))
+
+        self.assertRaisesRegex(ValueError, "Unknown policy 'foo'",
+                               allocate_prototypes, sizes, 3, 'foo')
+        self.assertRaisesRegex(ValueError, "must not exceed the number",
+                               allocate_prototypes, sizes, 17)
+        self.assertRaisesRegex(ValueError, "minimal numbers of prototypes",
+                               allocate_prototypes, sizes, 3, 'equal',
+                               {'c': 2})
+
+    def test_hierarchical_selection(self):
+        res, local = hierarchical_selection(self.partitions,
+                                            self.dm100.filter, 10)
+        self.assertEqual({'x': 5, 'y': 3, 'z': 2},
+                         {label: len(ids) for label, ids in local.items()})
+        self.assertEqual(local['x'] + local['y'] + local['z'], res)
+        self.assertEqual(
+            prototype_selection_constructive_maxdist(
+                self.dm100.filter(self.partitions['y']), 3),
+            local['y'])
+
+        # partitions with a single prototype or all elements
+        res, local = hierarchical_selection(
+            {'x': ['A', 'B', 'C'], 'y': ['D'], 'z': list('EFGHIJ')},
+            self.dm20.filter, 4, policy='equal', n_jobs=1)
+        self.assertEqual(2, len(local['x']))
+        self.assertEqual(['D'], local['y'])
+        # a single prototype is the element closest to all others
+        block = self.dm20.filter(list('EFGHIJ'))
+        self.assertEqual([block.ids[block.data.sum(axis=1).argmin()]],
+                         local['z'])
+
+    def test_hierarchical_selection_merge(self):
+        res, local = hierarchical_selection(self.partitions,
+                                            self.dm100.filter, 10,
+                                            merge=True)
+        self.assertEqual(20, sum(len(ids) for ids in local.values()))
+        union = local['x'] + local['y'] + local['z']
+        self.assertEqual(prototype_selection_constructive_maxdist(
+            self.dm100.filter(union), 10), res)
+
+    def test_hierarchical_selection_seedset(self):
+        seeds = [self.partitions['z'][0], self.partitions['z'][1],
+                 self.partitions['y'][0]]
+        res, local = hierarchical_selection(self.partitions,
+                                            self.dm100.filter, 6,
+                                            seedset=seeds, merge=True)
+        self.assertEqual(6, len(res))
+        for seed in seeds:
+            self.assertIn(seed, res)
+            self.assertTrue(any(seed in ids for ids in local.values()))
+
+        self.assertRaisesRegex(ValueError, "Seed 'foo' is not in any",
+                               hierarchical_selection, self.partitions,
+                               self.dm100.filter, 6, seedset=['foo'])
+        self.assertRaisesRegex(ValueError, "Unknown algorithm 'foo'",
+                               hierarchical_selection, self.partitions,
+                               self.dm100.filter, 6, algorithm='foo')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+
+import numpy as np
+
+from skbio.stats.distance import DistanceMatrix
+from skbio.stats.distance._base import (DissimilarityMatrixError,
+                                        MissingIDError)
+from skbio.util import get_data_path
+
+from genomesubsampler.landmarkSelection import (
+    LandmarkDistanceMatrix,
+    prototype_selection_landmark_maxdist,
+    prototype_selection_landmark_pMedian)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    prototype_selection_constructive_pMedian,
+    distance_sum)
+
+
+class landmarkSelection(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.calls = []
+
+        def pairwise(i, js):
+            self.calls.append(i)
+            return self.dm100.data[i, js]
+        self.pairwise = pairwise
+        # every 10th element is a landmark
+        self.ldm = LandmarkDistanceMatrix(
+            self.dm100.ids, self.dm100.data[:, ::10], pairwise)
+
+    def test_init(self):
+        self.assertEqual((100, 100), self.ldm.shape)
+        self.assertEqual(3, self.ldm.index(self.dm100.ids[3]))
+        self.assertRaises(MissingIDError, self.ldm.index, 'foo')
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "IDs must be unique.",
+                               LandmarkDistanceMatrix, ['a', 'a'],
+                               np.zeros((2, 1)), self.pairwise)
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "one row per ID",
+                               LandmarkDistanceMatrix, ['a', 'b'],
+                               np.zeros((3, 1)), self.pairwise)
+
+    def test_rows_entries(self):
+        np.testing.assert_allclose(self.dm100.data[[4, 2]],
+                                   self.ldm.rows([4, 2]))
+        self.assertEqual(200, self.ldm.num_evaluated)
+        # rows are cached
+        np.testing.assert_allclose(self.dm100.data[:5], self.ldm.rows(
+            slice(0, 5)))
+        self.assertEqual([4, 2, 0, 1, 3], self.calls)
+        self.assertEqual(500, self.ldm.num_evaluated)
+
+        rows, cols = np.array([[1], [7]]), np.array([[0, 1, 5]])
+        np.testing.assert_allclose(self.dm100.data[rows, cols],
+                                   self.ldm.entries(rows, cols))
+
+    def test_landmark_maxdist(self):
+        res, num_evaluated = prototype_selection_landmark_maxdist(
+            self.ldm, 10)
+        self.assertEqual(10, len(res))
+        # only the rows of the prototypes are computed
+        self.assertEqual(10 * 100, num_evaluated)
+        self.assertEqual(10, len(self.calls))
+        self.assertCountEqual(res, [self.dm100.ids[i] for i in self.calls])
+        self.assertGreater(distance_sum(res, self.dm100), 25)
+
+        # given seeds, selection is identical to the exact heuristic
+        seeds = [self.dm100.ids[7], self.dm100.ids[42]]
+        res, num_evaluated = prototype_selection_landmark_maxdist(
+            self.ldm, 10, seedset=seeds)
+        self.assertEqual(prototype_selection_constructive_maxdist(
+            self.dm100, 10, seedset=seeds), res)
+        # rows of earlier prototypes are cached
+        self.assertLess(num_evaluated, 10 * 100)
+
+        # prototypes are never selected twice, even if all distances are zero
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        ldm = LandmarkDistanceMatrix(
+            dmZero.ids, dmZero.data[:, :2],
+            lambda i, js: dmZero.data[i, js])
+        res, _ = prototype_selection_landmark_maxdist(ldm, 3)
+        self.assertEqual(
+            prototype_selection_constructive_maxdist(dmZero, 3), res)
+        self.assertEqual(3, len(set(res)))
+
+        self.assertRaisesRegex(ValueError, "must be >= 2",
+                               prototype_selection_landmark_maxdist,
+                               self.ldm, 1)
+
+    def test_landmark_pMedian(self):
+        res, num_evaluated = prototype_selection_landmark_pMedian(
+            self.ldm, 10)
+        self.assertEqual(10, len(set(res)))
+        self.assertEqual(0, num_evaluated)
+
+        # with all elements as landmarks, selection is exact
+        ldm = LandmarkDistanceMatrix(self.dm100.ids, self.dm100.data,
+                                     self.pairwise)
+        for seeds in (None, [self.dm100.ids[3], self.dm100.ids[9]]):
+            res, num_evaluated = prototype_selection_landmark_pMedian(
+                ldm, 10, seedset=seeds)
+            self.assertEqual(prototype_selection_constructive_pMedian(
+                self.dm100, 10, seedset=seeds), res)
+
+
+if __name__ == '__main__':
+    main()
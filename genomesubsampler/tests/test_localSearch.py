@@ -0,0 +1,112 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+
+from skbio.stats.distance import DistanceMatrix
+from skbio.stats.distance._base import MissingIDError
+from skbio.util import get_data_path
+
+from genomesubsampler.localSearch import local_search_swap
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_pMedian,
+    prototype_selection_exhaustive,
+    distance_sum)
+
+
+class localSearch(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def _assertLocalOptimum(self, dm, prototypes, seedset=()):
+        # brute force: no single swap improves the objective
+        objective = distance_sum(prototypes, dm)
+        for p in set(prototypes) - set(seedset):
+            for q in set(dm.ids) - set(prototypes):
+                swapped = [q if x == p else x for x in prototypes]
+                self.assertLessEqual(distance_sum(swapped, dm),
+                                     objective + 1e-9)
+
+    def test_local_search_swap_errors(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "Unknown strategy 'foo'",
+            local_search_swap,
+            self.dm20,
+            ['A', 'B'],
+            strategy='foo')
+
+        self.assertRaisesRegex(
+            ValueError,
+            "'seedset' is not a subset of 'prototypes'.",
+            local_search_swap,
+            self.dm20,
+            ['A', 'B'],
+            seedset=['C'])
+
+        self.assertRaises(MissingIDError, local_search_swap, self.dm20,
+                          ['A', 'X'])
+
+    def test_local_search_swap(self):
+        init = prototype_selection_constructive_pMedian(self.dm20, 5)
+        for strategy in ('best', 'first'):
+            res, trajectory = local_search_swap(self.dm20, init,
+                                                strategy=strategy)
+            self.assertEqual(5, len(set(res)))
+            self.assertAlmostEqual(distance_sum(init, self.dm20),
+                                   trajectory[0])
+            self.assertAlmostEqual(distance_sum(res, self.dm20),
+                                   trajectory[-1])
+            self.assertTrue(np.all(np.diff(trajectory) > 0))
+            self._assertLocalOptimum(self.dm20, res)
+            # cannot beat the exact solution
+            exact = prototype_selection_exhaustive(self.dm20, 5)
+            self.assertLessEqual(trajectory[-1],
+                                 distance_sum(exact, self.dm20) + 1e-9)
+
+    def test_local_search_swap_seedset(self):
+        init = self.dm20.ids[:4]
+        res, trajectory = local_search_swap(self.dm20, init,
+                                            seedset=['A', 'B'])
+        self.assertEqual(['A', 'B'], res[:2])
+        self._assertLocalOptimum(self.dm20, res, ['A', 'B'])
+
+        # nothing to swap
+        res, trajectory = local_search_swap(self.dm20, init, seedset=init)
+        self.assertEqual(list(init), res)
+        self.assertEqual(1, len(trajectory))
+
+    def test_local_search_swap_budget(self):
+        init = self.dm100.ids[:10]
+        res, trajectory = local_search_swap(self.dm100, init,
+                                            max_iterations=2)
+        self.assertEqual(3, len(trajectory))
+        self.assertAlmostEqual(distance_sum(res, self.dm100), trajectory[-1])
+
+        res, trajectory = local_search_swap(self.dm100, init, time_limit=0)
+        self.assertEqual(list(init), res)
+        self.assertEqual(1, len(trajectory))
+
+    @patch('genomesubsampler.localSearch._BLOCK_ELEMENTS', 250)
+    def test_local_search_swap_blocks(self):
+        init = self.dm100.ids[:10]
+        for strategy in ('best', 'first'):
+            exp = local_search_swap(self.dm100, init, strategy=strategy)
+            with patch('genomesubsampler.localSearch._BLOCK_ELEMENTS',
+                       2**20):
+                obs = local_search_swap(self.dm100, init, strategy=strategy)
+            self.assertEqual(exp[0], obs[0])
+            np.testing.assert_allclose(exp[1], obs[1])
+
+
+if __name__ == '__main__':
+    main()
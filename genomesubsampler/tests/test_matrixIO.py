@@ -0,0 +1,203 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase, main
+
+import numpy as np
+import numpy.testing as npt
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.distanceMatrix import (MemmapDistanceMatrix,
+                                             CompactDistanceMatrix)
+from genomesubsampler.matrixIO import (write_binary, read_binary,
+                                       convert_tsv_to_binary, is_binary,
+                                       load_distance_matrix)
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    prototype_selection_destructive_maxdist)
+
+
+class MatrixIOTests(TestCase):
+    def setUp(self):
+        self.wkdir = mkdtemp()
+        self.fp = join(self.wkdir, 'dm.bin')
+        self.dm100_fp = get_data_path('distMatrix_100.txt')
+        self.dm100 = DistanceMatrix.read(self.dm100_fp)
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def tearDown(self):
+        rmtree(self.wkdir)
+
+    def test_write_read_binary(self):
+        write_binary(self.dm20, self.fp, dtype=np.float64)
+        dm = read_binary(self.fp, verify_checksum=True)
+        self.assertEqual(self.dm20.ids, dm.ids)
+        self.assertEqual(np.float64, dm.dtype)
+        self.assertTrue(dm.condensed)
+        npt.assert_equal(dm.rows(slice(None)), self.dm20.data)
+
+        write_binary(self.dm100, self.fp)
+        dm = read_binary(self.fp)
+        self.assertEqual(np.float32, dm.dtype)
+        npt.assert_equal(dm.rows(slice(None)),
+                         self.dm100.data.astype(np.float32))
+        self.assertCountEqual(
+            prototype_selection_constructive_maxdist(self.dm100, 10),
+            prototype_selection_constructive_maxdist(dm, 10))
+        self.assertCountEqual(
+            prototype_selection_destructive_maxdist(self.dm100, 10),
+            prototype_selection_destructive_maxdist(dm, 10))
+
+        # payload is aligned and holds the upper triangle only
+        with open(self.fp, 'rb') as f:
+            size = len(f.read())
+        self.assertEqual(0, (size - 100 * 99 // 2 * 4) % 64)
+
+        # the square payload is read without gathering cells
+        write_binary(self.dm100, self.fp, square=True)
+        dm = read_binary(self.fp, verify_checksum=True)
+        self.assertFalse(dm.condensed)
+        npt.assert_equal(dm.rows(slice(None)),
+                         self.dm100.data.astype(np.float32))
+        with open(self.fp, 'rb') as f:
+            size = len(f.read())
+        self.assertEqual(0, (size - 100 * 100 * 4) % 64)
+
+    def test_read_binary_errors(self):
+        with open(self.fp, 'w') as f:
+            f.write('\tA\tB\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'is not a binary distance matrix',
+            read_binary,
+            self.fp)
+
+        # flip the very last byte of the payload
+        write_binary(self.dm20, self.fp)
+        with open(self.fp, 'r+b') as f:
+            f.seek(-1, 2)
+            last = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([last[0] ^ 1]))
+        self.assertRaisesRegex(
+            ValueError,
+            'Checksum mismatch',
+            read_binary,
+            self.fp,
+            verify_checksum=True)
+        # without verification, the matrix can still be opened
+        read_binary(self.fp)
+
+        # no checksum, no verification
+        write_binary(self.dm20, self.fp, checksum=False)
+        with open(self.fp, 'r+b') as f:
+            f.seek(-1, 2)
+            f.write(b'\x01')
+        read_binary(self.fp, verify_checksum=True)
+
+    def test_convert_tsv_to_binary(self):
+        convert_tsv_to_binary(self.dm100_fp, self.fp, dtype=np.float64)
+        dm = read_binary(self.fp, verify_checksum=True)
+        self.assertEqual(self.dm100.ids, dm.ids)
+        npt.assert_equal(dm.rows(slice(None)), self.dm100.data)
+
+        convert_tsv_to_binary(self.dm100_fp, self.fp, dtype=np.float64,
+                              square=True)
+        dm = read_binary(self.fp, verify_checksum=True)
+        self.assertFalse(dm.condensed)
+        npt.assert_equal(dm.rows(slice(None)), self.dm100.data)
+
+        convert_tsv_to_binary(get_data_path('distMatrix_allZero.txt'),
+                              self.fp)
+        dm = read_binary(self.fp, verify_checksum=True)
+        self.assertEqual(('A', 'C', 'P', 'Q', 'T'), dm.ids)
+        npt.assert_equal(dm.rows(slice(None)), np.zeros((5, 5)))
+
+    def test_convert_tsv_to_binary_errors(self):
+        tsv_fp = join(self.wkdir, 'dm.txt')
+        with open(tsv_fp, 'w') as f:
+            f.write('\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'is empty',
+            convert_tsv_to_binary,
+            tsv_fp,
+            self.fp)
+
+        with open(tsv_fp, 'w') as f:
+            f.write('\tA\tB\nB\t0\t1\nA\t1\t0\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'Row 1 of .* does not match the IDs of the header.',
+            convert_tsv_to_binary,
+            tsv_fp,
+            self.fp)
+
+        with open(tsv_fp, 'w') as f:
+            f.write('\tA\tB\nA\t0\t1\nB\t1\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'Row 2 of .* holds 1 instead of 2 distances.',
+            convert_tsv_to_binary,
+            tsv_fp,
+            self.fp)
+
+        with open(tsv_fp, 'w') as f:
+            f.write('\tA\tB\tC\nA\t0\t1\t1\nB\t1\t0\t1\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'Fewer distance rows than IDs.',
+            convert_tsv_to_binary,
+            tsv_fp,
+            self.fp)
+
+        with open(tsv_fp, 'w') as f:
+            f.write('\tA\tB\nA\t0\t1\nB\t1\t0\nC\t1\t1\n')
+        self.assertRaisesRegex(
+            ValueError,
+            'does not match the IDs of the header.',
+            convert_tsv_to_binary,
+            tsv_fp,
+            self.fp)
+
+    def test_load_distance_matrix(self):
+        self.assertFalse(is_binary(self.dm100_fp))
+        write_binary(self.dm100, self.fp)
+        self.assertTrue(is_binary(self.fp))
+
+        for fp in [self.dm100_fp, self.fp]:
+            dm = load_distance_matrix(fp)
+            self.assertIsInstance(dm, DistanceMatrix)
+            self.assertEqual(self.dm100.ids, dm.ids)
+            npt.assert_allclose(self.dm100.data, dm.data, rtol=1e-6)
+
+            dm = load_distance_matrix(fp, 'compact')
+            self.assertIsInstance(dm, CompactDistanceMatrix)
+            npt.assert_allclose(self.dm100.data, dm.rows(slice(None)),
+                                rtol=1e-6)
+
+            dm = load_distance_matrix(fp, 'memmap', self.wkdir)
+            self.assertIsInstance(dm, MemmapDistanceMatrix)
+            # text files are converted to the square form
+            self.assertEqual(fp == self.fp, dm.condensed)
+            npt.assert_allclose(self.dm100.data, dm.rows(slice(None)),
+                                rtol=1e-6)
+
+    def test_load_distance_matrix_errors(self):
+        self.assertRaisesRegex(ValueError, "Unknown backend 'foo'",
+                               load_distance_matrix, self.dm100_fp, 'foo')
+        self.assertRaisesRegex(ValueError, "requires a 'workdir'",
+                               load_distance_matrix, self.dm100_fp, 'memmap')
+
+
+if __name__ == '__main__':
+    main()
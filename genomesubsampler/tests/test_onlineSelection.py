@@ -0,0 +1,125 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from skbio.stats.distance import DistanceMatrix
+from skbio.stats.distance._base import (DissimilarityMatrixError,
+                                        MissingIDError)
+from skbio.util import get_data_path
+
+from genomesubsampler.onlineSelection import OnlinePrototypeSelector
+from genomesubsampler.prototypeSelection import (
+    prototype_selection_constructive_maxdist,
+    distance_sum)
+
+
+class onlineSelection(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def test_init_errors(self):
+        self.assertRaisesRegex(
+            DissimilarityMatrixError,
+            "Distances must be a 2x2 matrix",
+            OnlinePrototypeSelector,
+            ['A', 'B'],
+            np.zeros((3, 3)))
+        self.assertRaisesRegex(
+            DissimilarityMatrixError,
+            "IDs must be unique.",
+            OnlinePrototypeSelector,
+            ['A', 'A'],
+            np.zeros((2, 2)))
+        self.assertRaisesRegex(
+            ValueError,
+            "'seedset' is not a subset",
+            OnlinePrototypeSelector,
+            ['A', 'B'],
+            np.zeros((2, 2)),
+            ['C'])
+
+    def test_from_distance_matrix(self):
+        selector = OnlinePrototypeSelector.from_distance_matrix(
+            self.dm20, ['A', 'C', 'F'])
+        self.assertEqual(['A', 'C', 'F'], selector.ids)
+        self.assertAlmostEqual(distance_sum(['A', 'C', 'F'], self.dm20),
+                               selector.objective)
+        np.testing.assert_allclose(
+            self.dm20.filter(['A', 'C', 'F']).data, selector.distances)
+
+    def test_offer(self):
+        selector = OnlinePrototypeSelector.from_distance_matrix(
+            self.dm20, ['A', 'B', 'C'])
+        # a genome close to all prototypes is rejected
+        self.assertIsNone(selector.offer('X', [0, 0, 0]))
+        # a distant genome replaces the prototype with the best swap gain
+        distances = [self.dm20['A', x] for x in ('A', 'B', 'C')]
+        self.assertEqual('C', selector.offer('X', [100, 100, 0]))
+        self.assertEqual(['A', 'B', 'X'], selector.ids)
+        self.assertAlmostEqual(200 + self.dm20['A', 'B'], selector.objective)
+        self.assertRaisesRegex(DissimilarityMatrixError,
+                               "'X' is already a prototype.",
+                               selector.offer, 'X', distances)
+
+        # seeds are never swapped out
+        selector = OnlinePrototypeSelector.from_distance_matrix(
+            self.dm20, ['A', 'B'], seedset=['A', 'B'])
+        self.assertIsNone(selector.offer('X', [100, 100]))
+
+    def test_update(self):
+        # stream the elements of dm100 into a selector initialised with the
+        # prototypes of the first 50 elements
+        first = self.dm100.ids[:50]
+        init = prototype_selection_constructive_maxdist(
+            self.dm100.filter(first), 10)
+        selector = OnlinePrototypeSelector.from_distance_matrix(
+            self.dm100, init)
+        objectives = [selector.objective]
+        for start in range(50, 100, 10):
+            batch = self.dm100.ids[start:start + 10]
+            seen = self.dm100.ids[:start + 10]
+            rows = self.dm100.filter(seen).data[start:start + 10]
+            swaps = selector.update(batch, rows, seen)
+            for new_id, replaced in swaps:
+                self.assertIn(new_id, batch)
+                self.assertNotIn(replaced, selector.ids)
+            objectives.append(selector.objective)
+            self.assertAlmostEqual(distance_sum(selector.ids, self.dm100),
+                                   selector.objective)
+        self.assertTrue(np.all(np.diff(objectives) >= 0))
+        self.assertGreater(objectives[-1], objectives[0])
+
+        self.assertRaisesRegex(ValueError, "Distances must be a 1x2 matrix",
+                               selector.update, ['X'], np.zeros((1, 3)),
+                               ['A', 'B'])
+        self.assertRaises(MissingIDError, selector.update, ['X'],
+                          np.zeros((1, 1)), [selector.ids[0]])
+
+    def test_save_load(self):
+        selector = OnlinePrototypeSelector.from_distance_matrix(
+            self.dm20, ['A', 'C', 'F'], seedset=['C'])
+        with TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, 'state.npz')
+            selector.save(filepath)
+            loaded = OnlinePrototypeSelector.load(filepath)
+        self.assertEqual(selector.ids, loaded.ids)
+        np.testing.assert_array_equal(selector.distances, loaded.distances)
+        np.testing.assert_array_equal(selector.fixed, loaded.fixed)
+        self.assertAlmostEqual(selector.objective, loaded.objective)
+        self.assertEqual(selector.offer('X', [100, 100, 100]),
+                         loaded.offer('X', [100, 100, 100]))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,21 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 # ----------------------------------------------------------------------------
 
+import os
 from unittest import TestCase, main
+from unittest.mock import patch
 from click.testing import CliRunner
-from shutil import rmtree
+from os.path import join, exists
+from shutil import rmtree, copyfile
 from tempfile import mkdtemp
 from skbio.util import get_data_path
+import pandas as pd
 
 from genomesubsampler.parseRepophlan import (parse_repophlan,
+                                             read_repophlan,
+                                             filter_genomes,
+                                             genome_mask,
+                                             _cache_paths,
                                              _main)
 
 
@@ -37,6 +45,118 @@ class ParseRepophlanTests(TestCase):
         exp = BASIC_STATS.split('\n')
         self.assertListEqual(obs, exp)
 
+    def test_read_repophlan(self):
+        """Test function read_repophlan.
+        """
+        df = read_repophlan(self.repophlan_fp)
+        self.assertEqual((9, 14), df.shape)
+        self.assertEqual('G000007525', df.index[0])
+        self.assertNotIn('ftp_path', df.columns)
+        for col in ['assembly_level', 'refseq_category', 'genome_rep']:
+            self.assertEqual('category', df[col].dtype)
+        self.assertEqual('Int64', df['species_taxid'].dtype)
+        self.assertEqual(114186, df.loc['G000441575', 'species_taxid'])
+        self.assertEqual(0.996, df.loc['G000007525', 'score_fna'])
+
+    def test_read_repophlan_cache(self):
+        """Test the cache of function read_repophlan.
+        """
+        fp = join(self.wkdir, 'table.txt')
+        copyfile(self.repophlan_fp, fp)
+        data_fp, meta_fp = _cache_paths(fp)
+        exp = read_repophlan(fp)
+        self.assertFalse(exists(data_fp))
+
+        obs = read_repophlan(fp, cache=True)
+        self.assertTrue(exists(data_fp) and exists(meta_fp))
+        pd.testing.assert_frame_equal(exp, obs)
+
+        # the cache is a Feather file, which keeps the column types
+        self.assertTrue(data_fp.endswith('.cache.feather'))
+        with patch('genomesubsampler.parseRepophlan.pd.read_table') as read:
+            obs = read_repophlan(fp, cache=True)
+            self.assertFalse(read.called)
+        pd.testing.assert_frame_equal(exp, obs)
+        pd.testing.assert_frame_equal(
+            exp.reset_index(), pd.read_feather(data_fp))
+        for col in ['assembly_level', 'refseq_category', 'genome_rep']:
+            self.assertEqual('category', obs[col].dtype)
+        self.assertEqual('Int64', obs['species_taxid'].dtype)
+        self.assertEqual(exp.index.name, obs.index.name)
+
+        # the cache is used, as long as the table does not change
+        with patch('genomesubsampler.parseRepophlan.pd.read_table') as read:
+            obs = read_repophlan(fp, cache=True)
+            pd.testing.assert_frame_equal(exp, obs)
+            # a new modification time with the same content
+            os.utime(fp, ns=(0, 0))
+            obs = read_repophlan(fp, cache=True)
+            pd.testing.assert_frame_equal(exp, obs)
+            self.assertFalse(read.called)
+
+        # a changed table invalidates the cache
+        with open(fp, 'r') as f:
+            lines = [line for line in f if line.strip()]
+        with open(fp, 'w') as f:
+            f.writelines(lines[:-1])
+        obs = read_repophlan(fp, cache=True)
+        self.assertEqual(8, obs.shape[0])
+        pd.testing.assert_frame_equal(read_repophlan(fp, cache=True), obs)
+
+        # a corrupt cache is ignored
+        with open(meta_fp, 'w') as f:
+            f.write('{')
+        pd.testing.assert_frame_equal(read_repophlan(fp, cache=True), obs)
+
+    def test_filter_genomes(self):
+        """Test function filter_genomes.
+        """
+        df = read_repophlan(self.repophlan_fp)
+        self.assertListEqual(list(filter_genomes(df)), list(df.index))
+
+        obs = filter_genomes(df, {'score_faa': 0.96, 'score_rrna': None})
+        self.assertListEqual(list(obs), ['G000007525', 'G000010305',
+                                         'G000018865', 'G000025185',
+                                         'G000158275', 'G000011545',
+                                         'G000011705'])
+        obs = filter_genomes(df, {'score_faa': 0.96, 'score_rrna': 1})
+        self.assertListEqual(list(obs), ['G000010305', 'G000018865',
+                                         'G000158275'])
+        obs = filter_genomes(df, refseq_only=True)
+        self.assertNotIn('G000010365', obs)
+        self.assertNotIn('G000441575', obs)
+        self.assertEqual(7, len(obs))
+
+        self.assertRaisesRegex(ValueError, "Unknown score 'foo'",
+                               filter_genomes, df, {'foo': 1})
+
+        obs = filter_genomes(df, assembly_levels=['Complete Genome'])
+        self.assertEqual(9, len(obs))
+        obs = filter_genomes(df, assembly_levels=['Contig', 'Scaffold'])
+        self.assertEqual(0, len(obs))
+
+        # G000010365 and G000441575 are both Candidatus Carsonella ruddii,
+        # the latter has the better faa score
+        obs = filter_genomes(df, one_per_species=True)
+        self.assertEqual(8, len(obs))
+        self.assertNotIn('G000010365', obs)
+        self.assertIn('G000441575', obs)
+        # only the best genome that passes the other filters is kept
+        df.loc['G000441575', 'score_faa'] = 0.5
+        obs = filter_genomes(df, {'score_faa': 0.6}, one_per_species=True)
+        self.assertIn('G000010365', obs)
+        self.assertNotIn('G000441575', obs)
+        # genomes without species are kept
+        df.loc[:, 'species_taxid'] = pd.NA
+        self.assertEqual(9, len(filter_genomes(df, one_per_species=True)))
+
+    def test_genome_mask(self):
+        """Test function genome_mask.
+        """
+        obs = genome_mask(['A', 'B', 'C', 'D'], pd.Index(['D', 'B', 'E']))
+        self.assertListEqual([False, True, False, True], list(obs))
+        self.assertFalse(genome_mask(['A', 'B'], []).any())
+
     def test__main(self):
         """Test for the main process following Click.
         """
@@ -0,0 +1,152 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017--, genome-subsampler development team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+import threading
+import time
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from skbio.stats.distance import DistanceMatrix
+from skbio.util import get_data_path
+
+from genomesubsampler.portfolio import select_prototypes, HEURISTICS
+from genomesubsampler.prototypeSelection import distance_sum
+
+
+class portfolio(TestCase):
+    def setUp(self):
+        self.dm100 = DistanceMatrix.read(get_data_path('distMatrix_100.txt'))
+        self.dm20 = DistanceMatrix.read(get_data_path('distMatrix_20_f5.txt'))
+
+    def test_select_prototypes_errors(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "Unknown algorithm 'foo'",
+            select_prototypes,
+            self.dm20,
+            5,
+            ['constructive_maxdist', 'foo'])
+
+        self.assertRaisesRegex(
+            ValueError,
+            "must be >= 2, since a single",
+            select_prototypes,
+            self.dm20,
+            1)
+
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        self.assertRaisesRegex(
+            RuntimeError,
+            "None of the algorithms found prototypes.",
+            select_prototypes,
+            dmZero,
+            2,
+            ['constructive_protoclass'])
+
+    def test_select_prototypes(self):
+        res, algorithm, results = select_prototypes(self.dm100, 10)
+        self.assertCountEqual(HEURISTICS, results.keys())
+        # constructive maxdist has the largest objective, see
+        # test_prototypeSelection.py
+        self.assertEqual('constructive_maxdist', algorithm)
+        self.assertAlmostEqual(26.88492051, distance_sum(res, self.dm100))
+        for name, result in results.items():
+            self.assertIsNone(result['error'])
+            self.assertEqual(10, len(result['prototypes']))
+            self.assertAlmostEqual(
+                distance_sum(result['prototypes'], self.dm100),
+                result['objective'])
+            self.assertGreaterEqual(result['seconds'], 0)
+            self.assertLessEqual(result['objective'],
+                                 results[algorithm]['objective'])
+
+        # ties are broken by order of algorithms
+        res, algorithm, results = select_prototypes(
+            self.dm20, 19, ['destructive_maxdist', 'constructive_maxdist'],
+            max_workers=1)
+        self.assertEqual('destructive_maxdist', algorithm)
+
+        # the exact algorithm cannot be beaten
+        res, algorithm, results = select_prototypes(
+            self.dm20, 4, ['constructive_maxdist', 'exhaustive'],
+            seedset=['A'])
+        self.assertEqual('exhaustive', algorithm)
+        self.assertCountEqual(('A', 'J', 'P', 'T'), res)
+
+        # failing algorithms are reported but do not hide other results
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        res, algorithm, results = select_prototypes(
+            dmZero, 2, ['constructive_protoclass', 'constructive_maxdist'])
+        self.assertEqual('constructive_maxdist', algorithm)
+        self.assertRegex(results['constructive_protoclass']['error'],
+                         'Even the smallest epsilon')
+        self.assertIsNone(results['constructive_protoclass']['prototypes'])
+
+        # so are algorithms that select an element twice
+        res, algorithm, results = select_prototypes(dmZero, 2)
+        self.assertEqual('constructive_maxdist', algorithm)
+        self.assertRegex(results['constructive_pMedian']['error'],
+                         'IDs must be unique')
+
+    def test_select_prototypes_time_budget(self):
+        def _slow(dm, num_prototypes, seedset=None):
+            time.sleep(1)
+            return dm.ids[:num_prototypes]
+
+        with patch.dict('genomesubsampler.portfolio.ALGORITHMS',
+                        {'slow': _slow}):
+            res, algorithm, results = select_prototypes(
+                self.dm20, 5, ['slow', 'constructive_maxdist'],
+                time_budget=0.2)
+        self.assertEqual('constructive_maxdist', algorithm)
+        self.assertRegex(results['slow']['error'],
+                         'Time budget of 0.2 seconds exceeded.')
+        # the algorithm still running does not block the interpreter exit
+        self.assertTrue(all(thread.daemon for thread in threading.enumerate()
+                            if thread is not threading.main_thread()))
+
+        # algorithms that accept a time limit get the remaining budget
+        limits = []
+
+        def _limited(dm, num_prototypes, seedset=None, time_limit=None):
+            limits.append(time_limit)
+            return dm.ids[:num_prototypes]
+
+        with patch.dict('genomesubsampler.portfolio.ALGORITHMS',
+                        {'limited': _limited, 'slow': _slow}):
+            res, algorithm, results = select_prototypes(
+                self.dm20, 5, ['slow', 'limited'], time_budget=3,
+                max_workers=1)
+            self.assertIsNone(results['slow']['error'])
+            self.assertEqual(1, len(limits))
+            self.assertTrue(0 < limits[0] <= 2)
+
+            # algorithms that did not start within the budget are not run
+            self.assertRaisesRegex(
+                RuntimeError,
+                "None of the algorithms found prototypes.",
+                select_prototypes,
+                self.dm20,
+                5,
+                ['slow', 'limited'],
+                time_budget=0.2,
+                max_workers=1)
+            time.sleep(1)
+            self.assertEqual(1, len(limits))
+
+        # the exhaustive search stops at the deadline with its best result
+        start = time.time()
+        res, algorithm, results = select_prototypes(
+            self.dm100, 20, ['exhaustive'], time_budget=0.5)
+        self.assertLess(time.time() - start, 5)
+        self.assertIsNone(results['exhaustive']['error'])
+        self.assertEqual(20, len(res))
+
+
+if __name__ == '__main__':
+    main()
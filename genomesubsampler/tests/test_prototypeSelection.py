@@ -7,21 +7,37 @@
 # ----------------------------------------------------------------------------
 
 from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+import numpy.testing as npt
 
 from skbio.stats.distance import DistanceMatrix
 from skbio.stats.distance._base import (DissimilarityMatrixError,
                                         MissingIDError)
 from skbio.util import get_data_path
 
+from genomesubsampler.distanceMatrix import CompactDistanceMatrix
 from genomesubsampler.prototypeSelection import (
     _validate_parameters,
+    _seed_indices,
+    MatrixSummary,
     prototype_selection_exhaustive,
+    prototype_selection_branch_and_bound,
     prototype_selection_constructive_maxdist,
     prototype_selection_destructive_maxdist,
     prototype_selection_constructive_protoclass,
     prototype_selection_constructive_pMedian,
     _protoclass,
-    distance_sum)
+    _pMedian_scores,
+    _distinct_distances,
+    _epsilon_neighbourhood,
+    _neighbourhood_blocks,
+    _dense_neighbourhood,
+    _neighbours,
+    prototype_selection_path,
+    distance_sum,
+    distance_sums)
 
 
 class prototypeSelection(TestCase):
@@ -87,6 +103,62 @@ class prototypeSelection(TestCase):
             3,
             ['A', 'B', 'C', 'D'])
 
+        # valid parameters resolve the seeds to their indices
+        self.assertIsNone(_validate_parameters(self.dm20, 5))
+        np.testing.assert_array_equal(
+            [19, 0, 2], _validate_parameters(self.dm20, 5, ['T', 'A', 'C']))
+
+    def test__seed_indices(self):
+        np.testing.assert_array_equal(
+            [3, 1], _seed_indices(self.dm20, ['D', 'B']))
+        # any iterable is accepted
+        np.testing.assert_array_equal(
+            [3, 1], _seed_indices(self.dm20, (x for x in 'DB')))
+        self.assertEqual(0, len(_seed_indices(self.dm20, [])))
+        self.assertRaisesRegex(
+            ValueError,
+            "'seedset' is not a subset",
+            _seed_indices,
+            self.dm20,
+            ['A', 'foo'])
+
+    def test_MatrixSummary(self):
+        for dm in [self.dm20, self.dm100]:
+            obs = MatrixSummary(dm)
+            self.assertEqual(dm.shape, obs.shape)
+            np.testing.assert_array_equal(dm.data.max(axis=1), obs.row_max)
+            np.testing.assert_array_equal(dm.data.argmax(axis=1),
+                                          obs.row_argmax)
+            np.testing.assert_allclose(dm.data.sum(axis=1), obs.row_sums)
+            self.assertEqual(
+                np.unravel_index(dm.data.argmax(), dm.shape), obs.max_pair)
+
+    @patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS', 250)
+    def test_MatrixSummary_heuristics(self):
+        summary = MatrixSummary(self.dm100, n_jobs=3)
+        self.assertEqual(
+            np.unravel_index(self.dm100.data.argmax(), self.dm100.shape),
+            summary.max_pair)
+        for func in [prototype_selection_constructive_maxdist,
+                     prototype_selection_destructive_maxdist,
+                     prototype_selection_constructive_pMedian]:
+            for k in [2, 5, 30]:
+                self.assertEqual(func(self.dm100, k),
+                                 func(self.dm100, k, summary=summary))
+            self.assertEqual(func(self.dm100, 5, ['550.L1S1.s.1.sequence']),
+                             func(self.dm100, 5, ['550.L1S1.s.1.sequence'],
+                                  summary=summary))
+            self.assertRaisesRegex(
+                ValueError,
+                "The summary of a 100x100 matrix does not match the 20x20",
+                func,
+                self.dm20,
+                5,
+                summary=summary)
+        # the shared summary is not modified
+        np.testing.assert_allclose(self.dm100.data.sum(axis=1),
+                                   summary.row_sums)
+
     def test_distance_sum(self):
         # test that no missing IDs can be used
         self.assertRaisesRegex(
@@ -130,6 +202,45 @@ class prototypeSelection(TestCase):
             ['A', 'C', 'F', 'G', 'M', 'N', 'P', 'T'],
             self.dm20))
 
+    @patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS', 250)
+    def test_distance_sum_blocks(self):
+        # sub-matrices are summed in blocks of rows, of matrices and adapters
+        cdm = CompactDistanceMatrix(self.dm100.ids, self.dm100.data)
+        for elements in [self.dm100.ids, self.dm100.ids[::3],
+                         self.dm100.ids[:2]]:
+            exp = self.dm100.filter(elements).data.sum() / 2
+            self.assertAlmostEqual(exp, distance_sum(elements, self.dm100))
+            self.assertAlmostEqual(exp, distance_sum(elements, cdm))
+        self.assertEqual(0, distance_sum(['A'], self.dm20))
+
+    def test_distance_sums(self):
+        self.assertRaisesRegex(
+            MissingIDError,
+            'The ID \'X\' is not in the dissimilarity matrix.',
+            distance_sums,
+            [['A', 'B'], ['A', 'B', 'X']],
+            self.dm20)
+
+        self.assertRaisesRegex(
+            DissimilarityMatrixError,
+            'IDs must be unique. Found the following duplicate IDs',
+            distance_sums,
+            [['A', 'B', 'C', 'D', 'B']],
+            self.dm20)
+
+        subsets = [self.dm20.ids, ['A', 'C', 'F', 'G', 'M', 'N', 'P', 'T'],
+                   ['A', 'P', 'Q'], ['A'], ('A', 'J', 'P', 'T'),
+                   ['T', 'P', 'Q']]
+        obs = distance_sums(subsets, self.dm20)
+        self.assertEqual(len(subsets), len(obs))
+        for subset, ob in zip(subsets, obs):
+            self.assertAlmostEqual(distance_sum(subset, self.dm20), ob)
+        self.assertAlmostEqual(81.6313, obs[0])
+        self.assertAlmostEqual(13.3887, obs[1])
+        self.assertAlmostEqual(0, obs[3])
+
+        self.assertEqual(0, len(distance_sums([], self.dm20)))
+
     def test_exhaustive(self):
         # check if execution is rejected if number of combination is too high
         self.assertRaisesRegex(
@@ -180,6 +291,51 @@ class prototypeSelection(TestCase):
             res)
         self.assertAlmostEqual(74.1234, distance_sum(res, self.dm20))
 
+        # a stopped search returns the best prototypes found so far
+        res = prototype_selection_exhaustive(self.dm100, 20, time_limit=0)
+        self.assertEqual(20, len(res))
+        self.assertAlmostEqual(107.02463381, distance_sum(res, self.dm100))
+        res = prototype_selection_exhaustive(self.dm100, 20, max_nodes=10)
+        self.assertListEqual(
+            prototype_selection_branch_and_bound(self.dm100, 20,
+                                                 max_nodes=10)[0], res)
+
+    def test_prototype_selection_branch_and_bound(self):
+        self.assertRaisesRegex(
+            ValueError,
+            "must be >= 2, since a single",
+            prototype_selection_branch_and_bound,
+            self.dm20,
+            1)
+
+        res, obj, gap = prototype_selection_branch_and_bound(self.dm20, 4)
+        self.assertCountEqual(('A', 'J', 'P', 'T'), res)
+        self.assertAlmostEqual(3.4347, obj)
+        self.assertEqual(0, gap)
+
+        res, obj, gap = prototype_selection_branch_and_bound(
+            self.dm20, 5, seedset=['G', 'I'])
+        self.assertCountEqual(('A', 'G', 'I', 'C', 'T'), res)
+        self.assertAlmostEqual(5.3091, obj)
+        self.assertEqual(0, gap)
+
+        # the optimum must be at least as good as any heuristic
+        res, obj, gap = prototype_selection_branch_and_bound(self.dm100, 5)
+        self.assertAlmostEqual(obj, distance_sum(res, self.dm100))
+        self.assertEqual(0, gap)
+        self.assertGreater(obj, 6.51661889263)
+
+        # a stopped search reports its best incumbent and a positive gap
+        res, obj, gap = prototype_selection_branch_and_bound(
+            self.dm100, 20, max_nodes=10)
+        self.assertEqual(20, len(res))
+        self.assertAlmostEqual(obj, distance_sum(res, self.dm100))
+        self.assertGreater(gap, 0)
+        res, obj, gap = prototype_selection_branch_and_bound(
+            self.dm100, 20, time_limit=0)
+        self.assertAlmostEqual(107.02463381, obj)
+        self.assertGreater(gap, 0)
+
     def test_prototype_selection_constructive_maxdist(self):
         self.assertRaisesRegex(
             ValueError,
@@ -328,14 +484,21 @@ class prototypeSelection(TestCase):
             res)
         self.assertAlmostEqual(106.991415187, distance_sum(res, self.dm100))
 
+        # seeds survive, even if all distance sums are equal
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        res = prototype_selection_destructive_maxdist(dmZero, 2, ['A'])
+        self.assertCountEqual(('A', 'T'), res)
+
     def test_prototype_selection_constructive_protoclass(self):
+        # if elements cannot be separated, no epsilon results in enough
+        # prototypes
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
         self.assertRaisesRegex(
             RuntimeError,
-            "Number of iterations exceeded before",
+            "Even the smallest epsilon results in less than 2 prototypes.",
             prototype_selection_constructive_protoclass,
-            self.dm20,
-            5,
-            steps=1
+            dmZero,
+            2
         )
 
         self.assertRaisesRegex(
@@ -352,17 +515,22 @@ class prototypeSelection(TestCase):
             self.dm20,
             len(self.dm20.ids)+1)
 
+        # a single step returns the prototypes for the smallest epsilon
+        res = prototype_selection_constructive_protoclass(self.dm20, 5,
+                                                          steps=1)
+        self.assertEqual(5, len(res))
+
         res = prototype_selection_constructive_protoclass(self.dm20, 3)
-        self.assertCountEqual(('A', 'H', 'Q'), res)
-        self.assertAlmostEqual(1.7387, distance_sum(res, self.dm20))
+        self.assertCountEqual(('A', 'D', 'Q'), res)
+        self.assertAlmostEqual(1.7409, distance_sum(res, self.dm20))
 
         res = prototype_selection_constructive_protoclass(self.dm20, 4)
-        self.assertCountEqual(('A', 'B', 'Q', 'G'), res)
-        self.assertAlmostEqual(3.278799999, distance_sum(res, self.dm20))
+        self.assertCountEqual(('A', 'B', 'Q', 'S'), res)
+        self.assertAlmostEqual(3.1509, distance_sum(res, self.dm20))
 
         res = prototype_selection_constructive_protoclass(self.dm20, 5)
-        self.assertCountEqual(('H', 'C', 'G', 'Q', 'A'), res)
-        self.assertAlmostEqual(5.2747, distance_sum(res, self.dm20))
+        self.assertCountEqual(('A', 'B', 'F', 'G', 'Q'), res)
+        self.assertAlmostEqual(5.1588, distance_sum(res, self.dm20))
 
         res = prototype_selection_constructive_protoclass(self.dm20, 18)
         self.assertCountEqual(
@@ -380,36 +548,130 @@ class prototypeSelection(TestCase):
 
         res = prototype_selection_constructive_protoclass(self.dm100, 5)
         self.assertCountEqual(
-            ('550.L1S156.s.1.sequence', '550.L1S105.s.1.sequence',
-             '550.L1S18.s.1.sequence', '550.L1S1.s.1.sequence',
-             '550.L1S165.s.1.sequence'),
+            ('550.L1S1.s.1.sequence', '550.L1S105.s.1.sequence',
+             '550.L1S117.s.1.sequence', '550.L1S165.s.1.sequence',
+             '550.L1S167.s.1.sequence'),
             res)
-        self.assertAlmostEqual(5.72452336845315, distance_sum(res, self.dm100))
+        self.assertAlmostEqual(5.38708502529887, distance_sum(res, self.dm100))
 
         res = prototype_selection_constructive_protoclass(self.dm100, 10)
         self.assertCountEqual(
-            ('550.L1S156.s.1.sequence', '550.L1S117.s.1.sequence',
-             '550.L1S14.s.1.sequence', '550.L1S182.s.1.sequence',
-             '550.L1S135.s.1.sequence', '550.L1S144.s.1.sequence',
-             '550.L1S1.s.1.sequence', '550.L1S146.s.1.sequence',
-             '550.L1S136.s.1.sequence', '550.L1S176.s.1.sequence'),
+            ('550.L1S1.s.1.sequence', '550.L1S117.s.1.sequence',
+             '550.L1S133.s.1.sequence', '550.L1S136.s.1.sequence',
+             '550.L1S14.s.1.sequence', '550.L1S146.s.1.sequence',
+             '550.L1S149.s.1.sequence', '550.L1S163.s.1.sequence',
+             '550.L1S176.s.1.sequence', '550.L1S183.s.1.sequence'),
             res)
-        self.assertAlmostEqual(24.9367079851425, distance_sum(res, self.dm100))
+        self.assertAlmostEqual(25.0901634594939, distance_sum(res, self.dm100))
 
         res = prototype_selection_constructive_protoclass(self.dm100, 20)
         self.assertCountEqual(
-            ('550.L1S163.s.1.sequence', '550.L1S117.s.1.sequence',
-             '550.L1S148.s.1.sequence', '550.L1S179.s.1.sequence',
-             '550.L1S128.s.1.sequence', '550.L1S12.s.1.sequence',
-             '550.L1S182.s.1.sequence', '550.L1S133.s.1.sequence',
-             '550.L1S127.s.1.sequence', '550.L1S139.s.1.sequence',
-             '550.L1S173.s.1.sequence', '550.L1S1.s.1.sequence',
-             '550.L1S141.s.1.sequence', '550.L1S165.s.1.sequence',
-             '550.L1S18.s.1.sequence', '550.L1S103.s.1.sequence',
-             '550.L1S16.s.1.sequence', '550.L1S136.s.1.sequence',
-             '550.L1S132.s.1.sequence', '550.L1S176.s.1.sequence'),
+            ('550.L1S1.s.1.sequence', '550.L1S103.s.1.sequence',
+             '550.L1S117.s.1.sequence', '550.L1S12.s.1.sequence',
+             '550.L1S127.s.1.sequence', '550.L1S128.s.1.sequence',
+             '550.L1S132.s.1.sequence', '550.L1S133.s.1.sequence',
+             '550.L1S136.s.1.sequence', '550.L1S139.s.1.sequence',
+             '550.L1S141.s.1.sequence', '550.L1S148.s.1.sequence',
+             '550.L1S16.s.1.sequence', '550.L1S163.s.1.sequence',
+             '550.L1S173.s.1.sequence', '550.L1S175.s.1.sequence',
+             '550.L1S176.s.1.sequence', '550.L1S18.s.1.sequence',
+             '550.L1S180.s.1.sequence', '550.L1S187.s.1.sequence'),
             res)
-        self.assertAlmostEqual(101.104980832350, distance_sum(res, self.dm100))
+        self.assertAlmostEqual(101.91549799314, distance_sum(res, self.dm100))
+
+    def test__distinct_distances(self):
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        obs, smallest, largest = _distinct_distances(dmZero)
+        self.assertListEqual([0], list(obs))
+        self.assertEqual((0, 0), (smallest, largest))
+
+        exp = np.unique(self.dm20.condensed_form())
+        obs, smallest, largest = _distinct_distances(self.dm20)
+        self.assertListEqual([0] + list(exp), list(obs))
+        self.assertEqual((0, exp[-1]), (smallest, largest))
+
+        # a range of distances
+        obs, smallest, largest = _distinct_distances(self.dm20, exp[3],
+                                                     exp[10])
+        self.assertListEqual(list(exp[3:10]), list(obs))
+        self.assertEqual((exp[3], exp[9]), (smallest, largest))
+        obs, smallest, largest = _distinct_distances(self.dm20, 2, 3)
+        self.assertListEqual([], list(obs))
+        self.assertEqual((np.infty, -1 * np.infty), (smallest, largest))
+
+        # too many distances to hold, also if blocks are merged
+        for block_elements in [2 ** 20, 40]:
+            with patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS',
+                       block_elements):
+                for max_values in [len(exp), 20, 3]:
+                    obs, smallest, largest = _distinct_distances(
+                        self.dm20, 0.1, max_values=max_values, n_jobs=2)
+                    if max_values >= len(exp):
+                        self.assertListEqual(list(exp), list(obs))
+                    else:
+                        self.assertIsNone(obs)
+                    self.assertEqual((exp[0], exp[-1]), (smallest, largest))
+
+    @patch('genomesubsampler.prototypeSelection._MAX_RADII', 16)
+    def test_prototype_selection_constructive_protoclass_rounds(self):
+        # with at most 16 radii in memory, the search narrows the range of
+        # radii down in rounds, until it finds a radius with exactly k
+        # prototypes
+        for k in [3, 10, 40, 60]:
+            with patch('genomesubsampler.prototypeSelection._protoclass',
+                       wraps=_protoclass) as spy:
+                obs = prototype_selection_constructive_protoclass(
+                    self.dm100, k)
+            epsilon = spy.call_args[0][1]
+            self.assertListEqual(list(_protoclass(self.dm100, epsilon)), obs)
+            self.assertEqual(k, len(obs))
+
+    def test__epsilon_neighbourhood(self):
+        for epsilon in [0, 0.31, 0.42, 1]:
+            indptr, indices = _epsilon_neighbourhood(self.dm20, epsilon)
+            B = self.dm20.data < epsilon
+            self.assertEqual(B.sum(), len(indices))
+            for i in range(self.dm20.shape[0]):
+                self.assertListEqual(list(np.flatnonzero(B[i])),
+                                     list(indices[indptr[i]:indptr[i + 1]]))
+
+    @patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS', 100)
+    def test__neighbourhood_blocks(self):
+        # blocks of five rows are either dense or sparse, depending on their
+        # density. Both formats result in the same neighbourhood.
+        for epsilon in [0, 0.31, 0.42, 1]:
+            B = self.dm20.data < epsilon
+            for density in [-1, 0.3, 2]:
+                with patch('genomesubsampler.prototypeSelection.'
+                           '_DENSE_NEIGHBOURHOOD', density):
+                    blocks = _neighbourhood_blocks(self.dm20, epsilon)
+                self.assertEqual(4, len(blocks))
+                npt.assert_array_equal(B, _dense_neighbourhood(20, blocks))
+                indptr, indices = _epsilon_neighbourhood(self.dm20, epsilon,
+                                                         blocks=blocks)
+                for i in range(self.dm20.shape[0]):
+                    self.assertListEqual(
+                        list(np.flatnonzero(B[i])),
+                        list(indices[indptr[i]:indptr[i + 1]]))
+
+    def test__neighbours(self):
+        indptr, indices = _epsilon_neighbourhood(self.dm20, 0.35)
+        B = self.dm20.data < 0.35
+        for elements in [[], [0], [3, 1, 3], list(range(20))]:
+            exp = np.nonzero(B[elements])[1]
+            obs = _neighbours(indptr, indices, np.array(elements, dtype=int))
+            self.assertListEqual(list(exp), list(obs))
+
+    def test__protoclass_dense(self):
+        # the sparse and the dense neighbourhood select identical prototypes
+        for epsilon in [0.2, 0.3, 0.4, 0.5]:
+            exp = {}
+            for density in [-1, 2]:
+                with patch('genomesubsampler.prototypeSelection.'
+                           '_DENSE_NEIGHBOURHOOD', density):
+                    exp[density] = list(_protoclass(
+                        self.dm100, epsilon, ['550.L1S18.s.1.sequence']))
+            self.assertListEqual(exp[-1], exp[2])
 
     def test__protoclass(self):
         res = _protoclass(self.dm20, 0.42)
@@ -553,6 +815,84 @@ class prototypeSelection(TestCase):
             res)
         self.assertAlmostEqual(100.32727028, distance_sum(res, self.dm100))
 
+    def test_prototype_selection_constructive_pMedian_weights(self):
+        self.assertRaisesRegex(
+            ValueError, "one value per element, found 3 for 20",
+            prototype_selection_constructive_pMedian, self.dm20, 3,
+            weights=[1, 2, 3])
+        self.assertRaisesRegex(
+            ValueError, "must not be negative",
+            prototype_selection_constructive_pMedian, self.dm20, 3,
+            weights=[-1] + [1] * 19)
+
+        # unit weights do not change the result
+        for dm in [self.dm20, self.dm100]:
+            for k in [3, 10]:
+                self.assertListEqual(
+                    prototype_selection_constructive_pMedian(dm, k),
+                    prototype_selection_constructive_pMedian(
+                        dm, k, weights=np.ones(dm.shape[0])))
+        # also on quantised distances, whose many ties are broken by the
+        # last bit of the scores
+        points = np.random.RandomState(0).rand(200, 2)
+        dm = DistanceMatrix(np.round(np.sqrt(
+            ((points[:, None] - points[None, :]) ** 2).sum(axis=2)), 1),
+            [str(i) for i in range(200)])
+        for k in [5, 20, 50]:
+            self.assertListEqual(
+                prototype_selection_constructive_pMedian(dm, k),
+                prototype_selection_constructive_pMedian(
+                    dm, k, weights=np.ones(200)))
+
+        # a heavy element is the first prototype, and elements without
+        # weight are only selected if they are close to heavy elements
+        weights = np.ones(20)
+        weights[self.dm20.index('K')] = 100
+        res = prototype_selection_constructive_pMedian(self.dm20, 3,
+                                                       weights=weights)
+        self.assertEqual('K', res[0])
+        weights = np.zeros(20)
+        weights[[self.dm20.index(id_) for id_ in 'AKT']] = 1
+        res = prototype_selection_constructive_pMedian(self.dm20, 3,
+                                                       weights=weights)
+        self.assertCountEqual('AKT', res)
+
+    def test__pMedian_scores(self):
+        prototypes = [0, 7]
+        nearest = self.dm20.data[prototypes, :].min(axis=0)
+        exp = [self.dm20.data[prototypes + [i], :].min(axis=0).sum()
+               for i in range(self.dm20.shape[0])]
+        # results must not depend on the number of rows scored at once
+        for block_size in [None, 1, 3, 20]:
+            obs = _pMedian_scores(self.dm20, nearest, block_size)
+            self.assertListEqual(list(obs), exp)
+            obs = _pMedian_scores(self.dm20, nearest, block_size, n_jobs=4)
+            self.assertListEqual(list(obs), exp)
+
+        weights = np.arange(20.0)
+        exp = [self.dm20.data[prototypes + [i], :].min(axis=0).dot(weights)
+               for i in range(self.dm20.shape[0])]
+        npt.assert_allclose(
+            _pMedian_scores(self.dm20, nearest, 3, weights=weights), exp)
+
+    @patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS', 250)
+    def test_n_jobs(self):
+        # blocks of two rows are processed by different threads, results must
+        # be identical to serial execution
+        seedset = ['550.L1S18.s.1.sequence', '550.L1S142.s.1.sequence']
+        for func in [prototype_selection_constructive_maxdist,
+                     prototype_selection_destructive_maxdist,
+                     prototype_selection_constructive_protoclass,
+                     prototype_selection_constructive_pMedian]:
+            for k in [5, 20]:
+                self.assertListEqual(list(func(self.dm100, k)),
+                                     list(func(self.dm100, k, n_jobs=4)))
+                self.assertListEqual(
+                    list(func(self.dm100, k, seedset=seedset)),
+                    list(func(self.dm100, k, seedset=seedset, n_jobs=-1)))
+        self.assertListEqual(list(_protoclass(self.dm100, 0.41)),
+                             list(_protoclass(self.dm100, 0.41, n_jobs=3)))
+
     def test_seedset(self):
         # test seedset function, first include elements that are supposed to
         # be selected, to see if result is identical
@@ -644,6 +984,62 @@ class prototypeSelection(TestCase):
             res)
         self.assertAlmostEqual(26.7457727563, distance_sum(res, self.dm100))
 
+    def test_prototype_selection_path(self):
+        funcs = {'constructive_maxdist':
+                 prototype_selection_constructive_maxdist,
+                 'constructive_pMedian':
+                 prototype_selection_constructive_pMedian,
+                 'destructive_maxdist':
+                 prototype_selection_destructive_maxdist}
+        ks = [30, 2, 10, 60, 10]
+        for algorithm, func in funcs.items():
+            for seedset in [None, ['550.L1S1.s.1.sequence']]:
+                subsets, order, objectives = prototype_selection_path(
+                    self.dm100, ks, algorithm, seedset)
+                self.assertEqual([2, 10, 30, 60], sorted(subsets))
+                self.assertEqual(60, len(order))
+                self.assertEqual(60, len(set(order)))
+                for k in subsets:
+                    # identical to separate runs of the heuristic
+                    self.assertEqual(func(self.dm100, k, seedset),
+                                     subsets[k])
+                    self.assertCountEqual(order[:k], subsets[k])
+                    self.assertAlmostEqual(
+                        distance_sum(subsets[k], self.dm100), objectives[k])
+
+        # objectives are summed in blocks of rows
+        with patch('genomesubsampler.prototypeSelection._BLOCK_ELEMENTS',
+                   250):
+            subsets, _, objectives = prototype_selection_path(
+                self.dm100, [2, 10, 30], 'constructive_pMedian')
+        for k in subsets:
+            self.assertAlmostEqual(distance_sum(subsets[k], self.dm100),
+                                   objectives[k])
+
+        # p-median repeats elements of degenerate matrices, as separate runs
+        dmZero = DistanceMatrix.read(get_data_path('distMatrix_allZero.txt'))
+        subsets, _, objectives = prototype_selection_path(
+            dmZero, [2, 3], 'constructive_pMedian')
+        for k in [2, 3]:
+            self.assertEqual(
+                prototype_selection_constructive_pMedian(dmZero, k),
+                subsets[k])
+            self.assertEqual(0, objectives[k])
+
+        self.assertRaisesRegex(ValueError,
+                               "Unknown algorithm 'constructive_protoclass'",
+                               prototype_selection_path, self.dm20, [3],
+                               'constructive_protoclass')
+        self.assertRaisesRegex(ValueError, "'ks' must not be empty.",
+                               prototype_selection_path, self.dm20, [])
+        self.assertRaisesRegex(ValueError, "must be >= 2",
+                               prototype_selection_path, self.dm20, [1, 5])
+        self.assertRaisesRegex(ValueError, "must be smaller than the number",
+                               prototype_selection_path, self.dm20, [5, 20])
+        self.assertRaisesRegex(ValueError, "Size of 'seedset' must be",
+                               prototype_selection_path, self.dm20, [2, 5],
+                               seedset=['A', 'B'])
+
 
 if __name__ == '__main__':
     main()
@@ -59,6 +59,7 @@ setup(name='genome-subsampler',
       install_requires=[
           'click >= 6.0',
           'scikit-bio >= 0.5.1',
+          'pyarrow',
       ],
       extras_require={'test': ["nose", "pep8", "flake8"],
                       'coverage': ["coverage"]})